@@ -39,6 +39,7 @@ static const char* const S_RATE = "rate";
 static const char* const S_DELAY = "delay";
 static const char* const S_MODE = "mode";
 static const char* const S_RANDOMSTART = "random-start";
+static const char* const S_FRAME = "frame-";
 
 
 Mask::Resource::Sequence::Sequence(Mask::MaskData* parent, std::string name, 
@@ -105,6 +106,16 @@ Mask::Resource::Sequence::Sequence(Mask::MaskData* parent, std::string name,
 		std::string modeName = obs_data_get_string(data, S_MODE);
 		m_mode = StringToMode(modeName);
 	}
+
+	// atlas frames, if there are any
+	for (int i = 0; ; i++) {
+		std::string key = S_FRAME + std::to_string(i);
+		if (!obs_data_has_user_value(data, key.c_str()))
+			break;
+		vec4 frame;
+		obs_data_get_vec4(data, key.c_str(), &frame);
+		m_frames.push_back(frame);
+	}
 }
 
 Mask::Resource::Sequence::~Sequence() {}
@@ -222,7 +233,16 @@ void Mask::Resource::Sequence::SetTextureMatrix(Mask::Part* part, matrix4* texma
 	if (curr < 0)
 		curr = 0;
 
-	if (IsMultiFrameMode()) {
+	if (IsMultiFrameMode() && m_frames.size() > 0) {
+		if (curr >= (int)m_frames.size())
+			curr = (int)m_frames.size() - 1;
+		const vec4& frame = m_frames[curr];
+		texmat->x.x = frame.z - frame.x;
+		texmat->y.y = frame.w - frame.y;
+		texmat->x.w = frame.x;
+		texmat->y.w = frame.y;
+	}
+	else if (IsMultiFrameMode()) {
 		int row = curr / m_cols;
 		int col = curr % m_cols;
 		texmat->x.x = 1.0f / (float)m_cols;
@@ -21,6 +21,8 @@
 #include "mask-resource.h"
 #include "mask-resource-image.h"
 #include "mask.h"
+#include <vector>
+#include <libobs/graphics/vec4.h>
 
 namespace Mask {
 	namespace Resource {
@@ -83,6 +85,8 @@ namespace Mask {
 			float					m_delay;
 			Mode					m_mode;
 			bool					m_randomStart;
+			// atlas frames (u0, v0, u1, v1), instead of a rows x cols grid
+			std::vector<vec4>		m_frames;
 
 			Mode StringToMode(std::string m);
 			bool IsMultiFrameMode() {
@@ -187,6 +187,12 @@ void command_addres(Args& args) {
 		o["delay"] = args.floatValue("delay");
 		o["mode"] = args.value("mode");
 		o["random-start"] = args.boolValue("random-start");
+
+		// atlas frames, "u0,v0,u1,v1" each
+		for (int i = 0; args.haveValue("frame-" + to_string(i)); i++) {
+			string k = "frame-" + to_string(i);
+			o[k] = args.makeFloatArray(args.value(k));
+		}
 	}
 
 	// Models
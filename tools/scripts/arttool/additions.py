@@ -21,7 +21,7 @@
 # IMPORTS
 # ==============================================================================
 from copy import deepcopy
-import os, subprocess, json, uuid
+import os, json, uuid
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QListWidget, QVBoxLayout, QTabWidget
 from PyQt5.QtWidgets import QPushButton, QComboBox, QDateTimeEdit, QDialogButtonBox, QMessageBox
 from PyQt5.QtWidgets import QScrollArea, QMainWindow, QCheckBox, QHBoxLayout, QTextEdit
@@ -29,81 +29,10 @@ from PyQt5.QtWidgets import QLineEdit, QFrame, QDialog, QFrame, QSplitter, QFile
 from PyQt5.QtGui import QIcon, QBrush, QColor, QFont, QPixmap, QMovie
 from PyQt5.QtCore import QDateTime, Qt
 
+from .additionsteps import *
 
 
 
-ADDITION_TYPES = ["Image", "Sequence", "Material", "Model", "Emitter", "Tweak"]
-
-ADDITION_IMAGE = {"type": "image",
-                  "name": "",
-                  "file": ""}
-
-ADDITION_SEQUENCE = {"type": "sequence",
-                     "name": "",
-                     "image": "",
-                     "rows": 1,
-                     "cols": 1,
-                     "first": 0,
-                     "last": 0,
-                     "rate": 1.0,
-                     "delay": 0.0,
-                     "random-start": False,
-                     "mode": "repeat"}
-
-ADDITION_MATERIAL = {"type": "material",
-                     "name": "",
-                     "image": "texture,diffuse-0",
-                     "culling": "back",
-                     "depth-test": "less",
-                     "depth-only": False,
-                     "opaque": True}
-
-ADDITION_MODEL = {"type": "model",
-                  "name": "",
-                  "mesh": "",
-                  "material": ""}
-
-ADDITION_EMITTER = {"type": "emitter",
-                    "name": "",
-                    "model": "",
-                    "part": "",
-                    "lifetime": 1.0,
-                    "scale-start": 1.0,
-                    "scale-end": 2.0,
-                    "alpha-start": 1.0,
-                    "alpha-end": 0.0,
-                    "num-particles": 100,
-                    "world-space": True,
-                    "inverse-rate": False,
-                    "z-sort-offset": 0.0,
-                    "rate-min": 1.0,
-                    "rate-max": 1.0,
-                    "friction-min": 1.0,
-                    "friction-max": 1.0,
-                    "force-min": [0.0, 10.0, 0.0],
-                    "force-max": [0.0, 10.0, 0.0],
-                    "initial-velocity-min": [0.0, -40.0, 0.0],
-                    "initial-velocity-max": [0.0, -40.0, 0.0]}
-
-ADDITION_TWEAK = {"type": "tweak",
-                  "name": "tweak",
-                  "tweak1": "",
-                  "tweak2": "",
-                  "tweak3": "",
-                  "tweak4": "",
-                  "tweak5": "",
-                  "tweak6": "",
-                  "tweak7": "",
-                  "tweak8": "",
-                  "tweak9": "",
-                  "tweak10": ""}
-
-ADDITIONS = {"image": ADDITION_IMAGE,
-             "sequence": ADDITION_SEQUENCE,
-             "material": ADDITION_MATERIAL,
-             "model": ADDITION_MODEL,
-             "emitter": ADDITION_EMITTER,
-             "tweak": ADDITION_TWEAK}
 
 DROP_DOWNS = {("sequence", "mode"): ["once", "bounce", "repeat", "bounce-delay", "repeat-delay",
                                      "scroll-left", "scroll-right", "scroll-up", "scroll-down",
@@ -113,150 +42,6 @@ DROP_DOWNS = {("sequence", "mode"): ["once", "bounce", "repeat", "bounce-delay",
                                            "greater", "not-equal", "never"]}
 
 
-# ==============================================================================
-# MASKMAKER
-# ==============================================================================
-
-# Executes a shell command
-# usage:
-#
-# for line in execute(cmd):
-#   print(line)
-#
-def execute(cmd):
-    popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True, shell=True)
-    for stdout_line in iter(popen.stdout.readline, ""):
-        yield stdout_line
-    popen.stdout.close()
-    return_code = popen.wait()
-    if return_code:
-        # raise subprocess.CalledProcessError(return_code, cmd)
-        yield "ERROR " + cmd.split()[0] + " FAILED EXECUTION."
-
-def fixpath(p):
-    p = p.replace("\\", "/")
-    b = p.split("/")
-    for i in range(0, len(b)):
-        if " " in b[i]:
-            b[i] = '"' + b[i] + '"'
-    return "\\".join(b)
-
-MASKMAKERBIN = fixpath(os.path.abspath("./maskmaker/maskmaker.exe"))
-def maskmaker(command, kvpairs, files):
-    cmd = MASKMAKERBIN + " " + command
-    for k, v in kvpairs.items():
-        if command == "tweak":
-            cmd += ' "' + k + '=' + v + '"'
-        elif type(v) is str:
-            cmd += " " + k + '="' + v + '"'
-        else:
-            cmd += " " + k + '=' + str(v)
-
-    for f in files:
-        cmd += " " + f
-
-    print("---maskmaker-------")
-    print(cmd)
-    for line in execute(cmd):
-        yield line[:-1]
-    print(" ")
-
-
-def str_is_float(x):
-    try:
-        a = float(x)
-    except ValueError:
-        return False
-    else:
-        return True
-
-
-def str_is_int(x):
-    try:
-        a = int(x)
-    except ValueError:
-        return False
-    else:
-        return True
-
-def perform_image_addition(addition, jsonfile, outputWindow):
-    kvp = dict()
-    for i in ["name", "file"]:
-        kvp[i] = addition[i]
-    kvp["file"] = os.path.abspath(kvp["file"])
-    for line in maskmaker("addres", kvp, [jsonfile]):
-        outputWindow.append(line)
-
-
-def perform_general_addition(addition, jsonfile, outputWindow):
-    for line in maskmaker("addres", addition, [jsonfile]):
-        outputWindow.append(line)
-
-
-def perform_material_addition(addition, jsonfile, outputWindow):
-    kvp = addition.copy()
-    kvp["effect"] = "effectDefault"
-    for line in maskmaker("addres", kvp, [jsonfile]):
-        outputWindow.append(line)
-
-
-def perform_emitter_addition(addition, jsonfile, outputWindow):
-    kvp = addition.copy()
-    for k, v in kvp.items():
-        if type(v) is list:
-            kvp[k] = str(v[0]) + "," + str(v[1]) + "," + str(v[2])
-
-    if kvp["rate-min"] == kvp["rate-max"]:
-        kvp["rate"] = kvp["rate-min"]
-        del kvp["rate-min"]
-        del kvp["rate-max"]
-    if kvp["friction-min"] == kvp["friction-max"]:
-        kvp["friction"] = kvp["friction-min"]
-        del kvp["friction-min"]
-        del kvp["friction-max"]
-    if kvp["force-min"] == kvp["force-max"]:
-        kvp["force"] = kvp["force-min"]
-        del kvp["force-min"]
-        del kvp["force-max"]
-    if kvp["initial-velocity-min"] == kvp["initial-velocity-max"]:
-        kvp["initial-velocity"] = kvp["initial-velocity-min"]
-        del kvp["initial-velocity-min"]
-        del kvp["initial-velocity-max"]
-
-    for line in maskmaker("addres", kvp, [jsonfile]):
-        outputWindow.append(line)
-
-
-def perform_tweak_addition(addition, jsonfile, outputWindow):
-    kvp = dict()
-    for i in range(1, 11):
-        k = "tweak" + str(i)
-        if k in addition and len(addition[k]) > 0:
-            bits = addition[k].split("=")
-            if str_is_int(bits[1]):
-                kvp[bits[0]] = int(bits[1])
-            elif str_is_float(bits[1]):
-                kvp[bits[0]] = float(bits[1])
-            else:
-                kvp[bits[0]] = bits[1]
-
-    for line in maskmaker("tweak", kvp, [jsonfile]):
-        outputWindow.append(line)
-
-
-def perform_addition(addition, jsonfile, outputWindow):
-    if addition["type"] == "image":
-        perform_image_addition(addition, jsonfile, outputWindow)
-    elif addition["type"] == "material":
-        perform_material_addition(addition, jsonfile, outputWindow)
-    elif addition["type"] == "emitter":
-        perform_emitter_addition(addition, jsonfile, outputWindow)
-    elif addition["type"] == "tweak":
-        perform_tweak_addition(addition, jsonfile, outputWindow)
-    elif addition["type"] in ["sequence", "model"]:
-        perform_general_addition(addition, jsonfile, outputWindow)
-
-
 # ==============================================================================
 # NEW ADDITION DIALOG
 # ==============================================================================
@@ -306,6 +91,11 @@ class AdditionDialog(QDialog):
         self.addition = addition
         self.widgets = dict()
 
+        # fields added since the addition was made
+        for field, value in ADDITIONS.get(addition["type"], dict()).items():
+            if field not in self.addition:
+                self.addition[field] = deepcopy(value)
+
         numitems = len(self.addition)
 
         x = 10
@@ -0,0 +1,350 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, shlex, shutil
+
+from .maskjson import load_mask_json, write_mask_json, MASKMAKER_COMMANDS
+from .procrunner import execute
+
+
+# ==============================================================================
+# ADDITIONS
+#
+# Additions are extra resources and parts added to a mask's json after it's
+# built: images, sequences, materials... This is the part that applies them,
+# with no Qt, the dialogs that edit them are in additions.py.
+# ==============================================================================
+
+ADDITION_TYPES = ["Image", "Sequence", "Material", "Model", "Emitter", "Tweak"]
+
+ADDITION_IMAGE = {"type": "image",
+                  "name": "",
+                  "file": ""}
+
+ADDITION_SEQUENCE = {"type": "sequence",
+                     "name": "",
+                     "image": "",
+                     "rows": 1,
+                     "cols": 1,
+                     "first": 0,
+                     "last": 0,
+                     "rate": 1.0,
+                     "delay": 0.0,
+                     "random-start": False,
+                     "mode": "repeat",
+                     "atlas": ""}
+
+ADDITION_MATERIAL = {"type": "material",
+                     "name": "",
+                     "image": "texture,diffuse-0",
+                     "culling": "back",
+                     "depth-test": "less",
+                     "depth-only": False,
+                     "opaque": True}
+
+ADDITION_MODEL = {"type": "model",
+                  "name": "",
+                  "mesh": "",
+                  "material": ""}
+
+ADDITION_EMITTER = {"type": "emitter",
+                    "name": "",
+                    "model": "",
+                    "part": "",
+                    "lifetime": 1.0,
+                    "scale-start": 1.0,
+                    "scale-end": 2.0,
+                    "alpha-start": 1.0,
+                    "alpha-end": 0.0,
+                    "num-particles": 100,
+                    "world-space": True,
+                    "inverse-rate": False,
+                    "z-sort-offset": 0.0,
+                    "rate-min": 1.0,
+                    "rate-max": 1.0,
+                    "friction-min": 1.0,
+                    "friction-max": 1.0,
+                    "force-min": [0.0, 10.0, 0.0],
+                    "force-max": [0.0, 10.0, 0.0],
+                    "initial-velocity-min": [0.0, -40.0, 0.0],
+                    "initial-velocity-max": [0.0, -40.0, 0.0]}
+
+ADDITION_TWEAK = {"type": "tweak",
+                  "name": "tweak",
+                  "tweak1": "",
+                  "tweak2": "",
+                  "tweak3": "",
+                  "tweak4": "",
+                  "tweak5": "",
+                  "tweak6": "",
+                  "tweak7": "",
+                  "tweak8": "",
+                  "tweak9": "",
+                  "tweak10": ""}
+
+ADDITIONS = {"image": ADDITION_IMAGE,
+             "sequence": ADDITION_SEQUENCE,
+             "material": ADDITION_MATERIAL,
+             "model": ADDITION_MODEL,
+             "emitter": ADDITION_EMITTER,
+             "tweak": ADDITION_TWEAK}
+
+
+# ==============================================================================
+# MASKMAKER
+# ==============================================================================
+
+ART_MASKMAKER_ENV = "ART_MASKMAKER"
+
+
+# A file path, with this os's separators
+def fixpath(p):
+    return p.replace("\\", "/").replace("/", os.sep)
+
+
+# A path for a command line, quoted if it needs to be
+def shellpath(p):
+    if os.name == "nt":
+        return '"' + p + '"' if " " in p else p
+    return shlex.quote(p)
+
+
+# maskmaker, $ART_MASKMAKER (a path or a command), or the one in the art folder
+def get_maskmaker_bin():
+    mm = os.environ.get(ART_MASKMAKER_ENV)
+    if mm:
+        return shutil.which(mm) or os.path.abspath(mm)
+    exe = "maskmaker.exe" if os.name == "nt" else "maskmaker"
+    return fixpath(os.path.abspath(os.path.join("maskmaker", exe)))
+
+
+# The command line for a maskmaker run
+def maskmaker_command(command, kvpairs, files):
+    cmd = shellpath(get_maskmaker_bin()) + " " + command
+    for k, v in kvpairs.items():
+        if command == "tweak":
+            cmd += ' "' + k + '=' + str(v) + '"'
+        elif type(v) is str:
+            cmd += " " + k + '="' + v + '"'
+        else:
+            cmd += " " + k + '=' + str(v)
+
+    for f in files:
+        cmd += " " + f
+    return cmd
+
+
+def maskmaker(command, kvpairs, files):
+    cmd = maskmaker_command(command, kvpairs, files)
+    print("---maskmaker-------")
+    print(cmd)
+    for line in execute(cmd):
+        yield line[:-1]
+    print(" ")
+
+
+def str_is_float(x):
+    try:
+        a = float(x)
+    except ValueError:
+        return False
+    else:
+        return True
+
+
+def str_is_int(x):
+    try:
+        a = int(x)
+    except ValueError:
+        return False
+    else:
+        return True
+
+
+# ==============================================================================
+# ADDITION STEPS
+#
+# An addition turns into one or more maskmaker steps, (command, kvpairs).
+# ==============================================================================
+
+def image_addition_steps(addition):
+    kvp = dict()
+    for i in ["name", "file"]:
+        kvp[i] = addition[i]
+    kvp["file"] = os.path.abspath(kvp["file"])
+    return [("addres", kvp)]
+
+
+def general_addition_steps(addition):
+    return [("addres", addition)]
+
+
+# A sequence with an atlas uv table (see atlas.py) plays the atlas frames,
+# passed on as frame-0, frame-1... "u0,v0,u1,v1" rather than a grid
+#
+def sequence_addition_steps(addition):
+    kvp = addition.copy()
+    atlas = kvp.pop("atlas", "")
+    if len(atlas) > 0:
+        from .atlas import loadAtlasTable, getAtlasFrameUVs
+        uvs = getAtlasFrameUVs(loadAtlasTable(atlas))
+        kvp["rows"] = 1
+        kvp["cols"] = 1
+        kvp["first"] = 0
+        kvp["last"] = len(uvs) - 1
+        for i, uv in enumerate(uvs):
+            kvp["frame-" + str(i)] = ",".join([str(v) for v in uv])
+    return [("addres", kvp)]
+
+
+def material_addition_steps(addition):
+    kvp = addition.copy()
+    kvp["effect"] = "effectDefault"
+    return [("addres", kvp)]
+
+
+def emitter_addition_steps(addition):
+    kvp = addition.copy()
+    for k, v in kvp.items():
+        if type(v) is list:
+            kvp[k] = str(v[0]) + "," + str(v[1]) + "," + str(v[2])
+
+    if kvp["rate-min"] == kvp["rate-max"]:
+        kvp["rate"] = kvp["rate-min"]
+        del kvp["rate-min"]
+        del kvp["rate-max"]
+    if kvp["friction-min"] == kvp["friction-max"]:
+        kvp["friction"] = kvp["friction-min"]
+        del kvp["friction-min"]
+        del kvp["friction-max"]
+    if kvp["force-min"] == kvp["force-max"]:
+        kvp["force"] = kvp["force-min"]
+        del kvp["force-min"]
+        del kvp["force-max"]
+    if kvp["initial-velocity-min"] == kvp["initial-velocity-max"]:
+        kvp["initial-velocity"] = kvp["initial-velocity-min"]
+        del kvp["initial-velocity-min"]
+        del kvp["initial-velocity-max"]
+
+    return [("addres", kvp)]
+
+
+def tweak_addition_steps(addition):
+    kvp = dict()
+    for i in range(1, 11):
+        k = "tweak" + str(i)
+        if k in addition and len(addition[k]) > 0:
+            bits = addition[k].split("=")
+            if str_is_int(bits[1]):
+                kvp[bits[0]] = int(bits[1])
+            elif str_is_float(bits[1]):
+                kvp[bits[0]] = float(bits[1])
+            else:
+                kvp[bits[0]] = bits[1]
+    return [("tweak", kvp)]
+
+
+def get_addition_steps(addition):
+    if addition["type"] == "image":
+        return image_addition_steps(addition)
+    elif addition["type"] == "material":
+        return material_addition_steps(addition)
+    elif addition["type"] == "emitter":
+        return emitter_addition_steps(addition)
+    elif addition["type"] == "tweak":
+        return tweak_addition_steps(addition)
+    elif addition["type"] == "sequence":
+        return sequence_addition_steps(addition)
+    elif addition["type"] == "model":
+        return general_addition_steps(addition)
+    return []
+
+
+# the invisible head that hides things behind the face
+def get_depth_head_steps():
+    return [("addres", {"type": "material",
+                        "name": "depth_head_mat",
+                        "effect": "effectDefault",
+                        "depth-only": True}),
+            ("addres", {"type": "model",
+                        "name": "depth_head_mdl",
+                        "mesh": "meshHead",
+                        "material": "depth_head_mat"}),
+            ("addpart", {"type": "model",
+                         "name": "depth_head",
+                         "resource": "depth_head_mdl"})]
+
+
+# ==============================================================================
+# PERFORM ADDITIONS
+# ==============================================================================
+
+# One maskmaker process per step
+#
+def perform_steps_maskmaker(steps, jsonfile, outputWindow):
+    for command, kvp in steps:
+        for line in maskmaker(command, kvp, [jsonfile]):
+            outputWindow.append(line)
+
+
+# All the steps in one go
+# - the json is read once, every step is applied in process, and it's
+#   written once, giving the same json maskmaker would have
+# - passes are more functions of the json dict, run after the steps and
+#   before the write. They return lines for the output.
+# - falls back to running maskmaker if something unexpected happens
+#
+def perform_steps(steps, jsonfile, outputWindow, passes=None):
+    if passes is None:
+        passes = list()
+    if len(steps) == 0 and (len(passes) == 0 or not os.path.exists(jsonfile)):
+        return
+    lines = list()
+    try:
+        j = load_mask_json(jsonfile)
+        for command, kvp in steps:
+            lines += MASKMAKER_COMMANDS[command](j, kvp)
+    except Exception as e:
+        outputWindow.append("batch additions failed (" + str(e) + "), running maskmaker")
+        perform_steps_maskmaker(steps, jsonfile, outputWindow)
+        if len(passes) == 0 or not os.path.exists(jsonfile):
+            return
+        j = load_mask_json(jsonfile)
+        lines = list()
+    for p in passes:
+        lines += p(j)
+    write_mask_json(jsonfile, j)
+    for line in lines:
+        outputWindow.append(line)
+
+
+def perform_addition(addition, jsonfile, outputWindow):
+    perform_steps_maskmaker(get_addition_steps(addition), jsonfile, outputWindow)
+
+
+def perform_additions(additions, jsonfile, outputWindow, depth_head=False, passes=None):
+    steps = list()
+    if depth_head:
+        steps += get_depth_head_steps()
+    for addn in additions:
+        steps += get_addition_steps(addn)
+    perform_steps(steps, jsonfile, outputWindow, passes)
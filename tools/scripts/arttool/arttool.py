@@ -21,15 +21,15 @@
 # IMPORTS
 # ==============================================================================
 import sys, subprocess, os, json, uuid, time
-from shutil import copyfile
+from shutil import copyfile, which
 from copy import deepcopy
 import tempfile
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QListWidget, QVBoxLayout, QTabWidget
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QListWidget, QListView, QVBoxLayout, QTabWidget
 from PyQt5.QtWidgets import QPushButton, QComboBox, QDateTimeEdit, QDialogButtonBox, QMessageBox
 from PyQt5.QtWidgets import QScrollArea, QMainWindow, QCheckBox, QHBoxLayout, QTextEdit, QFileDialog
-from PyQt5.QtWidgets import QLineEdit, QFrame, QDialog, QFrame, QSplitter
+from PyQt5.QtWidgets import QLineEdit, QFrame, QDialog, QFrame, QSplitter, QProgressBar
 from PyQt5.QtGui import QIcon, QBrush, QColor, QFont, QPixmap, QMovie
-from PyQt5.QtCore import QDateTime, Qt
+from PyQt5.QtCore import QDateTime, Qt, QTimer
 
 """
 from PIL import Image as PILImage
@@ -42,10 +42,22 @@ from openpyxl.styles import Alignment, Font
 from .utils import *
 from .releases import *
 from .additions import *
-
-# don't check svn more often than this
+from .fileindex import *
+from .builder import *
+from .buildgraph import *
+from .s3upload import *
+from .blobstore import *
+from .buildrunner import *
+from .svnwatcher import *
+from .filelist import *
+from .searchindex import *
+
+# don't ask to sync svn more often than this
 SVN_CHECK_TIME = (60 * 5)  # 5 minutes is lots
 
+# filter again this often while the search index is being built
+SEARCH_RETRY_TIME = 100  # ms
+
 # ==============================================================================
 # MAIN WINDOW : ArtToolWindow class
 # ==============================================================================
@@ -68,6 +80,7 @@ MASK_UI_NAMES = {"name": "Pretty Name",
                  "release_with_plugin": "Release With Plugin",
                  "do_not_release": "DO NOT RELEASE",
                  "texture_max": "Max Texture Size",
+                 "quantize_meshes": "Quantize Meshes",
                  "intro_fade_time": "Intro Fade Time",
                  "intro_duration": "Intro Duration",
                  "license": "License",
@@ -75,7 +88,7 @@ MASK_UI_NAMES = {"name": "Pretty Name",
 
 MASK_UI_FIELDS = ["name", "description", "author", "tags", "category", "tier", "depth_head",
                   "is_morph", "is_vip", "is_intro", "release_with_plugin", "do_not_release",
-                  "texture_max", "intro_fade_time", "intro_duration", "license", "website"]
+                  "texture_max", "quantize_meshes", "intro_fade_time", "intro_duration", "license", "website"]
 COMBO_UI_FIELDS = ["name", "description", "author", "tags", "tier", "is_vip", "is_intro",
                    "release_with_plugin", "do_not_release", "texture_max", "intro_fade_time",
                    "intro_duration", "license", "website"]
@@ -87,6 +100,7 @@ MASK_FIELD_TOOLTIPS = {"tier": "The tier of the mask.\nTier 1 is most expensive,
                        "category": "The area of the face the mask covers.",
                        "depth_head": "Whether this mask needs a depth occlusion head added.",
                        "is_morph": "This FBX is a morph FBX",
+                       "quantize_meshes": "Snap mesh points, normals and uvs to a grid.\nSmaller download, very slightly less precise.",
                        "is_vip": "VIP mask for a specific streamer.",
                        "is_intro": "This mask is used as an intro or outro animation.",
                        "do_not_release": "Check this box if the public should never see this."}
@@ -95,8 +109,6 @@ DROP_DOWNS = {"texture_max": TEXTURE_SIZES,
               "category": CATEGORIES,
               "tier" : TIERS}
 
-RELEASE_FIELDS = ["name", "uuid", "description", "author", "tags", "category", "tier", "is_vip", "is_intro"]
-
 
 class ArtToolWindow(QMainWindow):
 
@@ -116,13 +128,20 @@ class ArtToolWindow(QMainWindow):
         self.cancelledSVN = False
         self.editPane = None
         self.currentFilter = None
+        self.searchRetry = False
         self.lastSVNCheck = 0
         self.dialogUp = False
         self.mainLayout = None
+        self.buildRunner = None
+        self.svnWatcher = None
 
         # Load our config
         self.config = createGetConfig()
 
+        # Index of the fbx/combo files in the depot
+        self.fileIndex = FileIndex(".")
+        self.searchIndex = SearchIndex()
+
         # Left Pane
         leftPane = QWidget()
         leftLayout = QVBoxLayout(leftPane)
@@ -138,12 +157,16 @@ class ArtToolWindow(QMainWindow):
 
         # Filter box
         self.fbxfilter = QLineEdit()
-        self.fbxfilter.editingFinished.connect(lambda: self.onFbxFilterChanged())
+        self.fbxfilter.setPlaceholderText("Search : dragon, tag:xmas, author:bob")
+        self.fbxfilter.textChanged.connect(lambda t: self.onFbxFilterChanged())
         leftLayout.addWidget(self.fbxfilter)
 
         # make a list widget for fbx's
-        self.fbxlist = QListWidget()
-        self.fbxlist.itemSelectionChanged.connect(lambda: self.onFbxClicked())
+        self.fbxlist = QListView()
+        self.fbxlistModel = FileListModel(getMaskIconName, self)
+        self.fbxlist.setModel(self.fbxlistModel)
+        self.fbxlist.setUniformItemSizes(True)
+        self.fbxlist.selectionModel().selectionChanged.connect(lambda s, d: self.onFbxClicked())
         self.fbxlist.setMinimumHeight(640)
 
         # make the combo tab
@@ -161,8 +184,11 @@ class ArtToolWindow(QMainWindow):
         b.pressed.connect(lambda: self.onDelCombo())
 
         # make alist widget for combos
-        self.combolist = QListWidget()
-        self.combolist.itemSelectionChanged.connect(lambda: self.onComboClicked())
+        self.combolist = QListView()
+        self.combolistModel = FileListModel(getComboIconName, self)
+        self.combolist.setModel(self.combolistModel)
+        self.combolist.setUniformItemSizes(True)
+        self.combolist.selectionModel().selectionChanged.connect(lambda s, d: self.onComboClicked())
         self.combolist.setParent(combotab)
         self.combolist.setGeometry(0, 40, 294, 600)
 
@@ -196,10 +222,29 @@ class ArtToolWindow(QMainWindow):
         bottomPane = QWidget()
         bottomArea = QHBoxLayout(bottomPane)
 
-        # output window
+        # output window, with the build progress under it
+        outputPane = QWidget()
+        outputArea = QVBoxLayout(outputPane)
+        outputArea.setContentsMargins(0, 0, 0, 0)
         self.outputWindow = QTextEdit()
         self.outputWindow.setMinimumHeight(90)
-        bottomArea.addWidget(self.outputWindow)
+        outputArea.addWidget(self.outputWindow)
+        progressArea = QHBoxLayout()
+        self.buildProgress = QProgressBar()
+        self.buildProgress.setTextVisible(True)
+        progressArea.addWidget(self.buildProgress)
+        self.buildCancel = QPushButton("Cancel")
+        progressArea.addWidget(self.buildCancel)
+        outputArea.addLayout(progressArea)
+        bottomArea.addWidget(outputPane)
+
+        # runs builds in the background
+        self.buildRunner = BuildRunner(self.outputWindow, self.buildProgress, self.buildCancel, self)
+
+        # checks svn in the background
+        self.svnWatcher = SvnWatcher(parent=self)
+        self.svnWatcher.outOfDate.connect(lambda: self.onSvnOutOfDate())
+        self.svnWatcher.start()
 
         # buttons area
         buttonArea = QWidget()
@@ -232,34 +277,14 @@ class ArtToolWindow(QMainWindow):
     # --------------------------------------------------
     def fillFbxList(self):
         # Get list of fbx files
-        self.fbxfiles = getFbxFileList(".")
-
-        # Clear list
-        while self.fbxlist.count() > 0:
-            i = self.fbxlist.takeItem(0)
-            i = None
-
-        # Get filter
-        filt = self.fbxfilter.text().lower()
-        if not filt or len(filt) < 1:
-            filt = None
-
-        # Fill list
-        self.fbxlistMap = dict()
-        self.fbxlistRevMap = dict()
-        fbxidx = 0
-        listidx = 0
-        for fbx in self.fbxfiles:
-            if not filt or filt in fbx.lower():
-                self.fbxlist.addItem(fbx[2:])
-                self.fbxlistMap[listidx] = fbxidx
-                self.fbxlistRevMap[fbxidx] = listidx
-                listidx += 1
-            fbxidx += 1
+        self.fileIndex.refresh()
+        self.fbxfiles = self.fileIndex.getFbxFileList()
 
-        # color fbxlist items
-        for idx in range(0, len(self.fbxfiles)):
-            self.setFbxColorIcon(idx)
+        # Fill list, colors and icons are filled in as rows are shown
+        self.fbxlistModel.setFiles(self.fbxfiles)
+        self.searchIndex.setFiles(self.fbxfiles)
+        self.currentFilter = None
+        self.filterFbxList()
 
         self.resetEditPane()
 
@@ -268,22 +293,12 @@ class ArtToolWindow(QMainWindow):
     # Fill(refill) in the combos list
     # --------------------------------------------------
     def fillComboList(self):
-        # Get list of fbx files
-        self.combofiles = getComboFileList(".")
-
-        # Clear list
-        while self.combolist.count() > 0:
-            i = self.combolist.takeItem(0)
-            i = None
+        # Get list of combo files
+        self.fileIndex.refresh()
+        self.combofiles = self.fileIndex.getComboFileList()
 
         # Fill list
-        for combo in self.combofiles:
-            self.combolist.addItem(combo[2:])
-            idx = self.combolist.count() - 1
-
-        # color list items
-        for idx in range(0, len(self.combofiles)):
-            self.setComboColorIcon(idx)
+        self.combolistModel.setFiles(self.combofiles)
 
         self.resetEditPane()
 
@@ -301,14 +316,14 @@ class ArtToolWindow(QMainWindow):
     # Check binaries
     # --------------------------------------------------
     def checkBinaries(self):
-        gotSVN = os.path.exists(SVNBIN.replace('"', ''))
-        gotMM = os.path.exists(MASKMAKERBIN)
-        gotRP = os.path.exists(MORPHRESTFILE)
+        gotSVN = which(SVNPATH) is not None
+        gotMM = os.path.exists(getMaskmakerBin())
+        gotRP = os.path.exists(getMorphRestFile())
 
         if not gotSVN:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Warning)
-            msg.setText("You seem to be missing " + os.path.basename(SVNBIN))
+            msg.setText("You seem to be missing " + os.path.basename(SVNPATH))
             msg.setInformativeText("You should (re)install tortoiseSVN, and be sure to install the command line tools.")
             msg.setWindowTitle("Missing Binary File")
             msg.setStandardButtons(QMessageBox.Ok)
@@ -319,7 +334,7 @@ class ArtToolWindow(QMainWindow):
         if not gotMM:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Warning)
-            msg.setText("You seem to be missing " + os.path.basename(MASKMAKERBIN))
+            msg.setText("You seem to be missing " + os.path.basename(getMaskmakerBin()))
             msg.setWindowTitle("Missing Binary File")
             msg.setStandardButtons(QMessageBox.Ok)
             self.ignoreSVN += 1
@@ -329,7 +344,7 @@ class ArtToolWindow(QMainWindow):
         if not gotRP:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Warning)
-            msg.setText("You seem to be missing " + os.path.basename(MORPHRESTFILE))
+            msg.setText("You seem to be missing " + os.path.basename(getMorphRestFile()))
             msg.setWindowTitle("Missing Binary File")
             msg.setStandardButtons(QMessageBox.Ok)
             self.ignoreSVN += 1
@@ -398,70 +413,15 @@ class ArtToolWindow(QMainWindow):
         return q
 
     # --------------------------------------------------
-    # Colors and Icons for main FBX list
+    # Colors and Icons for the lists, see filelist.py
     # --------------------------------------------------
-    def setFbxColorIconInternal(self, mdc, mt, nb, idx):
-        self.fbxlist.item(idx).setFont(QFont("Arial", 12, QFont.Bold))
-        if mdc == CHECKMETA_GOOD:
-            self.fbxlist.item(idx).setForeground(QBrush(QColor("#32CD32")))
-        elif mdc == CHECKMETA_ERROR:
-            self.fbxlist.item(idx).setForeground(QBrush(QColor("#FF0000")))
-        elif mdc == CHECKMETA_WARNING:
-            self.fbxlist.item(idx).setForeground(QBrush(QColor("#FF7F50")))
-        elif mdc == CHECKMETA_NORELEASE:
-            self.fbxlist.item(idx).setForeground(QBrush(QColor("#000000")))
-        elif mdc == CHECKMETA_WITHPLUGIN:
-            self.fbxlist.item(idx).setForeground(QBrush(QColor("#5070FF")))
-        if mt == MASK_UNKNOWN:
-            self.fbxlist.item(idx).setIcon(QIcon("arttool/unknownicon.png"))
-        else:
-            if nb:
-                if mt == MASK_NORMAL:
-                    self.fbxlist.item(idx).setIcon(QIcon("arttool/maskicon_build.png"))
-                elif mt == MASK_MORPH:
-                    self.fbxlist.item(idx).setIcon(QIcon("arttool/morphicon_build.png"))
-            else:
-                if mt == MASK_NORMAL:
-                    self.fbxlist.item(idx).setIcon(QIcon("arttool/maskicon.png"))
-                elif mt == MASK_MORPH:
-                    self.fbxlist.item(idx).setIcon(QIcon("arttool/morphicon.png"))
-
-    def setFbxColorIcon(self, idx):
-        if idx in self.fbxlistRevMap:
-            mdc, mt = checkMetaDataFile(self.fbxfiles[idx])
-            nb = doesFileNeedRebuilding(self.fbxfiles[idx])
-            self.setFbxColorIconInternal(mdc, mt, nb, self.fbxlistRevMap[idx])
-
-    def setComboColorIconInternal(self, mdc, mt, nb, idx):
-        self.combolist.item(idx).setFont(QFont("Arial", 12, QFont.Bold))
-        if mdc == CHECKMETA_GOOD:
-            self.combolist.item(idx).setForeground(QBrush(QColor("#32CD32")))
-        elif mdc == CHECKMETA_ERROR:
-            self.combolist.item(idx).setForeground(QBrush(QColor("#FF0000")))
-        elif mdc == CHECKMETA_WARNING:
-            self.combolist.item(idx).setForeground(QBrush(QColor("#FF7F50")))
-        elif mdc == CHECKMETA_NORELEASE:
-            self.combolist.item(idx).setForeground(QBrush(QColor("#000000")))
-        elif mdc == CHECKMETA_WITHPLUGIN:
-            self.combolist.item(idx).setForeground(QBrush(QColor("#5070FF")))
-        if nb:
-            self.combolist.item(idx).setIcon(QIcon("arttool/comboicon_build.png"))
-        else:
-            self.combolist.item(idx).setIcon(QIcon("arttool/comboicon.png"))
-
-    def setComboColorIcon(self, idx):
-        mdc, mt = checkMetaDataFile(self.combofiles[idx])
-        nb = doesFileNeedRebuilding(self.combofiles[idx])
-        self.setComboColorIconInternal(mdc, mt, nb, idx)
-
-
     def updateListColorIcon(self):
         mdc, mt = checkMetaData(self.metadata)
-        nb = doesFileNeedRebuilding(self.metadata["fbx"], self.metadata)
+        nb = BuildGraph().needsRebuilding(self.metadata["fbx"])
         if self.comboTabIdx == 0:
-            self.setFbxColorIconInternal(mdc, mt, nb, self.fbxlistRevMap[self.currentFbx])
+            self.fbxlistModel.setStatus(self.currentFbx, mdc, mt, nb)
         else:
-            self.setComboColorIconInternal(mdc, mt, nb, self.currentCombo)
+            self.combolistModel.setStatus(self.currentCombo, mdc, mt, nb)
 
 
 
@@ -667,10 +627,16 @@ class ArtToolWindow(QMainWindow):
 
             if fbxfile:
                 metafile = getMetaFileName(fbxfile)
-                oldmetadata = loadMetadataFile(fbxfile)
+                oldmetadata = peekMetadataFile(fbxfile)
+                # builds own the dependencies, and one may have written new
+                # ones since this was loaded
+                if oldmetadata and "dependencies" in oldmetadata:
+                    self.metadata["dependencies"] = deepcopy(oldmetadata["dependencies"])
                 if oldmetadata != self.metadata:
                     writeMetaData(metafile, self.metadata, True)
                     print("saving", metafile)
+                    if self.currentFbx >= 0:
+                        self.searchIndex.update(fbxfile, self.metadata)
 
     # --------------------------------------------------
     # WIDGET SIGNALS CALLBACKS
@@ -734,11 +700,11 @@ class ArtToolWindow(QMainWindow):
     def onFbxClicked(self):
         if self.comboTabIdx != 0:
             return
-        k = self.fbxlist.currentRow()
-        if k >= 0 and k < self.fbxlist.count():
+        k = self.fbxlistModel.getFileIndex(self.fbxlist.currentIndex().row())
+        if k >= 0 and self.fbxlist.selectionModel().hasSelection():
             self.saveCurrentMetadata()
             self.currentCombo = -1
-            self.currentFbx = self.fbxlistMap[k]
+            self.currentFbx = k
             fbxfile = self.fbxfiles[self.currentFbx]
             self.metadata = createGetMetaData(fbxfile)
             self.updateListColorIcon()
@@ -747,20 +713,56 @@ class ArtToolWindow(QMainWindow):
 
     # FBX Filter box changed
     def onFbxFilterChanged(self):
-        filt = self.fbxfilter.text().lower()
+        self.filterFbxList()
+
+        # keep the current mask selected if it's still there
+        row = self.fbxlistModel.getRow(self.currentFbx)
+        if self.currentFbx >= 0 and row >= 0:
+            selection = self.fbxlist.selectionModel()
+            selection.blockSignals(True)
+            self.fbxlist.setCurrentIndex(self.fbxlistModel.index(row))
+            selection.blockSignals(False)
+
+
+    # Shows the fbx files matching the filter box, best matches first. See
+    # searchindex.py
+    #
+    def filterFbxList(self):
+        filt = self.fbxfilter.text().strip()
         if not filt or len(filt) < 1:
             filt = None
         if filt != self.currentFilter:
-            self.fillFbxList()
             self.currentFilter = filt
+            self.fbxlistModel.setRows(self.searchIndex.search(filt) if filt else None)
+            if filt:
+                self.startSearchRetry()
+
+
+    # Until the search index is ready the filter only matches paths, so
+    # filter again when it is
+    #
+    def startSearchRetry(self):
+        if not self.searchRetry and not self.searchIndex.isReady():
+            self.searchRetry = True
+            QTimer.singleShot(SEARCH_RETRY_TIME, lambda: self.onSearchRetry())
+
+    def onSearchRetry(self):
+        self.searchRetry = False
+        if not self.currentFilter:
+            return
+        if self.searchIndex.isReady():
+            self.currentFilter = None
+            self.onFbxFilterChanged()
+        else:
+            self.startSearchRetry()
 
 
     # FBX file clicked in list
     def onComboClicked(self):
         if self.comboTabIdx != 1:
             return
-        k = self.combolist.currentRow()
-        if k >= 0 and k < self.combolist.count():
+        k = self.combolistModel.getFileIndex(self.combolist.currentIndex().row())
+        if k >= 0 and self.combolist.selectionModel().hasSelection():
             self.saveCurrentMetadata()
             self.currentCombo = k
             self.currentFbx = -1
@@ -784,7 +786,7 @@ class ArtToolWindow(QMainWindow):
                     self.currentCombo = idx
                     break
             if self.currentCombo >= 0:
-                self.combolist.setCurrentRow(self.currentCombo)
+                self.combolist.setCurrentIndex(self.combolistModel.index(self.currentCombo))
 
 
     def onDelCombo(self):
@@ -835,6 +837,11 @@ class ArtToolWindow(QMainWindow):
     # called before exit
     def finalCleanup(self):
         self.cancelledSVN = True
+        self.svnWatcher.stop()
+        self.fbxlistModel.stop()
+        self.combolistModel.stop()
+        if self.isBuilding():
+            self.buildRunner.stop()
         self.saveCurrentMetadata()
 
         # This is just getting annoying
@@ -863,28 +870,95 @@ class ArtToolWindow(QMainWindow):
         writeMetaData(getConfigFile(), self.config)
 
 
+    # --------------------------------------------------
+    # BUILDING
+    #
+    # Builds run in the background (see buildrunner.py), so the metadata can
+    # still be edited while they go. Only one runs at a time.
+    # --------------------------------------------------
+    def isBuilding(self):
+        return self.buildRunner is not None and self.buildRunner.isRunning()
+
+    def checkNotBuilding(self):
+        if self.isBuilding():
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Warning)
+            msg.setText("A build is already running.")
+            msg.setInformativeText("Wait for it to finish, or cancel it.")
+            msg.setWindowTitle("Build Running")
+            msg.setStandardButtons(QMessageBox.Ok)
+            self.ignoreSVN += 1
+            self.dialogUp = True
+            msg.exec_()
+            self.dialogUp = False
+            return False
+        return True
+
+    def getCurrentFile(self):
+        if self.currentFbx >= 0:
+            return self.fbxfiles[self.currentFbx]
+        elif self.currentCombo >= 0:
+            return self.combofiles[self.currentCombo]
+        return None
+
+    # A build writes the meta file with new dependencies. Take them into the
+    # metadata being edited, so saving it doesn't put the old ones back.
+    #
+    def refreshCurrentDependencies(self):
+        filename = self.getCurrentFile()
+        if self.metadata and filename:
+            md = peekMetadataFile(filename)
+            if md and "dependencies" in md:
+                self.metadata["dependencies"] = deepcopy(md["dependencies"])
+
+    # colors and icons of everything, after a build
+    def recolorLists(self):
+        self.fbxlistModel.refreshStatus()
+        self.combolistModel.refreshStatus()
+
     # build
     def onBuild(self):
-
-        QApplication.setOverrideCursor(Qt.WaitCursor)
+        if not self.checkNotBuilding():
+            return
 
         if self.currentCombo >= 0:
             # build combo
-            combofile = self.combofiles[self.currentCombo]
-            buildCombo(combofile, self.outputWindow, self.metadata)
+            filename = self.combofiles[self.currentCombo]
+            build = buildCombo
             filetype = "Combo Json"
 
         else:
             # build mask
-            fbxfile = self.fbxfiles[self.currentFbx]
-            svnAddFile(fbxfile)
-            buildMask(fbxfile, self.outputWindow, self.metadata)
+            filename = self.fbxfiles[self.currentFbx]
+            build = buildMask
             filetype = "FBX"
 
-        deps, missing = getDependencies(self.metadata)
-
-        for d in deps:
-            svnAddFile(d["file"])
+        # build from a copy, the one in the edit pane can change meanwhile
+        metadata = deepcopy(self.metadata)
+
+        # svn adds are queued and done in one go at the end
+        def work(output, progress, cancel):
+            svnBeginBatch()
+            try:
+                if build is buildMask:
+                    svnAddFile(filename)
+                r = build(filename, output, metadata)
+                if r is not None:
+                    for d in r[0]:
+                        svnAddFile(d["file"])
+            finally:
+                svnEndBatch(output)
+            progress(1, 1, filename)
+            return r
+
+        self.buildRunner.start(work, lambda r: self.onBuildDone(filename, filetype, r))
+
+
+    def onBuildDone(self, filename, filetype, result):
+        self.refreshCurrentDependencies()
+        if result is None:
+            return
+        deps, missing = result
 
         for m in missing:
             msg = QMessageBox()
@@ -897,9 +971,8 @@ class ArtToolWindow(QMainWindow):
             msg.exec_()
             self.dialogUp = False
 
-        QApplication.restoreOverrideCursor()
-
-        self.updateListColorIcon()
+        if self.metadata and self.getCurrentFile() == filename:
+            self.updateListColorIcon()
 
 
     def onAddAddition(self):
@@ -986,30 +1059,50 @@ class ArtToolWindow(QMainWindow):
                 self.ignoreSVN -= 1
                 return
 
-            if (time.time() - self.lastSVNCheck) < SVN_CHECK_TIME:
-                return
+            self.checkSVNUpdate()
 
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            needsup = svnNeedsUpdate()
-            QApplication.restoreOverrideCursor()
-            self.lastSVNCheck = time.time()
-            if needsup:
-                msg = QMessageBox()
-                msg.setIcon(QMessageBox.Warning)
-                msg.setText("Your SVN repository is out of date.")
-                msg.setInformativeText("Would you like to sync up now?")
-                msg.setWindowTitle("SVN Repository out of date")
-                msg.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
-                msg.buttonClicked.connect(lambda i: self.onSyncOk(i))
-                self.ignoreSVN += 1
-                self.dialogUp = True
-                msg.exec_()
-                self.dialogUp = False
+
+    # the svn watcher found we need a sync
+    def onSvnOutOfDate(self):
+        if self.isActiveWindow():
+            self.checkSVNUpdate()
+
+
+    # Asks to sync if the svn watcher's last check says we're out of date.
+    # Never runs svn itself.
+    #
+    def checkSVNUpdate(self):
+        if self.cancelledSVN or self.dialogUp:
+            return
+
+        # don't update files out from under a build
+        if self.isBuilding():
+            return
+
+        if not self.svnWatcher.isOutOfDate():
+            return
+
+        if (time.time() - self.lastSVNCheck) < SVN_CHECK_TIME:
+            return
+
+        self.lastSVNCheck = time.time()
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Warning)
+        msg.setText("Your SVN repository is out of date.")
+        msg.setInformativeText("Would you like to sync up now?")
+        msg.setWindowTitle("SVN Repository out of date")
+        msg.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
+        msg.buttonClicked.connect(lambda i: self.onSyncOk(i))
+        self.ignoreSVN += 1
+        self.dialogUp = True
+        msg.exec_()
+        self.dialogUp = False
 
 
     def doSVNUpdate(self):
         QApplication.setOverrideCursor(Qt.WaitCursor)
         arttoolUpdated = svnUpdate(self.outputWindow)
+        self.svnWatcher.checkNow()
         self.fillFbxList()
         QApplication.restoreOverrideCursor()
 
@@ -1032,22 +1125,31 @@ class ArtToolWindow(QMainWindow):
             self.cancelledSVN = True
 
     def doAutobuild(self):
+        if not self.checkNotBuilding():
+            return
+        self.startBuildAll(True)
 
-        QApplication.setOverrideCursor(Qt.WaitCursor)
 
-        all_missing = dict()
+    # Builds all the masks and combos in the background
+    # - onlyIfNeeded builds just the ones that need it, otherwise everything
+    #   is built by maskmaker, not restored from the build cache
+    #
+    def startBuildAll(self, onlyIfNeeded):
+        fbxfiles = list(self.fbxfiles)
+        combofiles = list(self.combofiles)
+        workers = getBuildWorkers(self.config)
+        binary = getBuildBinary(self.config)
+
+        def work(output, progress, cancel):
+            return buildMasksAndCombos(fbxfiles, combofiles, output, onlyIfNeeded, workers,
+                                       binary, True, progress, cancel, None, onlyIfNeeded)
+
+        self.buildRunner.start(work, lambda r: self.onBuildAllDone(r))
 
-        for f in self.fbxfiles:
-            if doesFileNeedRebuilding(f):
-                deps, missing = buildMask(f, self.outputWindow)
-                if len(missing) > 0:
-                    all_missing[f] = missing
 
-        for f in self.combofiles:
-            if doesFileNeedRebuilding(f):
-                deps, missing = buildCombo(f, self.outputWindow)
-                if len(missing) > 0:
-                    all_missing[f] = missing
+    def onBuildAllDone(self, all_missing):
+        if all_missing is None:
+            all_missing = dict()
 
         for file, missing in all_missing.items():
             for m in missing:
@@ -1061,12 +1163,13 @@ class ArtToolWindow(QMainWindow):
                 msg.exec_()
                 self.dialogUp = False
 
-        QApplication.restoreOverrideCursor()
-        self.fillComboList()
-        self.fillFbxList()
+        self.refreshCurrentDependencies()
+        self.recolorLists()
 
 
     def doRebuildAll(self):
+        if not self.checkNotBuilding():
+            return
         msg = QMessageBox()
         msg.setIcon(QMessageBox.Warning)
         msg.setText("WARNING!! This will rebuild ALL THE MASKS!!")
@@ -1082,36 +1185,7 @@ class ArtToolWindow(QMainWindow):
 
     def onRebuildAllOk(self, i):
         if i.text() == "OK":
-
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-
-            all_missing = dict()
-
-            for f in self.fbxfiles:
-                deps, missing = buildMask(f, self.outputWindow)
-                if len(missing) > 0:
-                    all_missing[f] = missing
-
-            for f in self.combofiles:
-                deps, missing = buildCombo(f, self.outputWindow)
-                if len(missing) > 0:
-                    all_missing[f] = missing
-
-            for file, missing in all_missing.items():
-                for m in missing:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Warning)
-                    msg.setText(file + " depends on " + m + ", which cannot be found.")
-                    msg.setWindowTitle("Missing PNG File")
-                    msg.setStandardButtons(QMessageBox.Ok)
-                    self.ignoreSVN += 1
-                    self.dialogUp = True
-                    msg.exec_()
-                    self.dialogUp = False
-
-            QApplication.restoreOverrideCursor()
-            self.fillComboList()
-            self.fillFbxList()
+            self.startBuildAll(False)
 
         else:
             # dont check anymore
@@ -1121,6 +1195,8 @@ class ArtToolWindow(QMainWindow):
         print("todo release masks")
 
     def uploadToS3(self):
+        if not self.checkNotBuilding():
+            return
 
         # what now
         msg = QMessageBox()
@@ -1139,60 +1215,9 @@ class ArtToolWindow(QMainWindow):
 
         do_upload = item.text() == "OK"
 
-        metalist = list()
-        jsonlist = list()
-        for fbxfile in self.fbxfiles:
-            mdc, mt = checkMetaDataFile(fbxfile)
-            if mdc == CHECKMETA_GOOD:
-                metadata = loadMetadataFile(fbxfile)
-                d = dict()
-                for k in RELEASE_FIELDS:
-                    d[k] = metadata[k]
-                    if type(d[k]) is str:
-                        d[k] = d[k].replace("\n", "").replace("\r", "")
-                metalist.append(d)
-                jsonlist.append(jsonFromFbx(fbxfile))
-
-        for combofile in self.combofiles:
-            mdc, mt = checkMetaDataFile(combofile)
-            if mdc == CHECKMETA_GOOD:
-                metadata = loadMetadataFile(combofile)
-                d = dict()
-                for k in RELEASE_FIELDS:
-                    d[k] = metadata[k]
-                    if type(d[k]) is str:
-                        d[k] = d[k].replace("\n", "").replace("\r", "")
-                md = getCombinedComboMeta(metadata)
-                d["tags"] = md["tags"]
-                d["author"] = md["author"]
-
-                metalist.append(d)
-                jsonlist.append(combofile)
-
-        for i in range(0,len(metalist)):
-            metalist[i]["category"] = metalist[i]["category"].lower()
-            metalist[i]["tags"] = metalist[i]["tags"].lower().replace(", ",",")
-            metalist[i]["modtime"] = int(os.path.getmtime(jsonlist[i]))
-            metalist[i]["author"] = metalist[i]["author"].replace(", ",",")
-
-            if metalist[i]["tags"].endswith(" "):
-                metalist[i]["tags"] = metalist[i]["tags"][:-1]
-            metalist[i]["name"] = metalist[i]["name"].strip()
-            metalist[i]["author"] = metalist[i]["author"].strip()
-
-            if do_upload:
-                print("Uploading",jsonlist[i])
-
-                uuid = metalist[i]["uuid"]
-                print("  json...")
-                s3_upload(jsonlist[i], uuid + ".json")
-                print("  png...")
-                s3_upload(jsonlist[i].replace(".json",".png"), uuid + ".png")
-                print("  gif...")
-                s3_upload(jsonlist[i].replace(".json",".gif"), uuid + ".gif")
-                print("  mp4...")
-                s3_upload(jsonlist[i].replace(".json",".mp4"), uuid + ".mp4")
-
+        metalist, jsonlist = getReleaseIndex(self.fbxfiles, self.combofiles)
+        if do_upload:
+            uploadRelease(metalist, jsonlist)
 
         file, filter = QFileDialog.getSaveFileName(self, 'Save file', os.path.abspath("."),
                                                    "Mask files (*.json)")
@@ -0,0 +1,330 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, json, time
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# ==============================================================================
+# TEXTURE ATLAS
+#
+# Packs the numbered frames of a sequence into as small a texture as we can,
+# rather than a fixed rows x cols grid (see tilesheet.py):
+#
+# - the transparent border around the frames is trimmed off
+# - the trimmed frames are packed with max-rects (best short side fit)
+# - the atlas is the smallest power of two size, up to texture_max, that they
+#   all fit in
+#
+# Next to the atlas png goes <atlas>.atlas.json, the uv table: where each
+# frame ended up, in pixels and as uvs (u0, v0, u1, v1, v down). A sequence
+# addition with "atlas" set to the table plays its frames from there, see
+# additions.py.
+#
+# A sequence draws each frame over its whole quad, so by default every frame
+# is trimmed the same, to the bounds of the whole sequence, and the animation
+# doesn't jump around. ATLAS_TRIM_FRAME trims each frame to its own bounds,
+# for things that place frames themselves using the table's "trim".
+# ==============================================================================
+
+ATLAS_MAX = 2048
+# transparent pixels between frames, so filtering doesn't pick up neighbours
+ATLAS_PADDING = 2
+ATLAS_TABLE_EXT = ".atlas.json"
+
+ATLAS_TRIM_SEQUENCE = "sequence"
+ATLAS_TRIM_FRAME = "frame"
+ATLAS_TRIM_NONE = "none"
+ATLAS_TRIMS = [ATLAS_TRIM_SEQUENCE, ATLAS_TRIM_FRAME, ATLAS_TRIM_NONE]
+
+
+def getAtlasTableFile(atlasfile):
+    return os.path.splitext(atlasfile)[0] + ATLAS_TABLE_EXT
+
+
+def loadAtlasTable(filename):
+    f = open(filename, "r")
+    try:
+        return json.loads(f.read())
+    finally:
+        f.close()
+
+
+def writeAtlasTable(filename, table):
+    f = open(filename, "w")
+    f.write(json.dumps(table, indent=4))
+    f.close()
+
+
+# (u0, v0, u1, v1) of each frame in a uv table, in order
+def getAtlasFrameUVs(table):
+    return [tuple(f["uv"]) for f in table["frames"]]
+
+
+# --------------------------------------------------
+# max-rects packer
+# --------------------------------------------------
+
+def rectsOverlap(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and \
+           a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def rectContains(a, b):
+    return b[0] >= a[0] and b[1] >= a[1] and \
+           b[0] + b[2] <= a[0] + a[2] and b[1] + b[3] <= a[1] + a[3]
+
+
+class MaxRectsPacker(object):
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # free rects, (x, y, w, h). They overlap.
+        self.free = [(0, 0, width, height)]
+
+    # Finds room for a w x h rect
+    # - returns its (x, y), None if it doesn't fit
+    #
+    def insert(self, w, h):
+        best = None
+        bestfit = None
+        for fx, fy, fw, fh in self.free:
+            if w <= fw and h <= fh:
+                fit = (min(fw - w, fh - h), max(fw - w, fh - h))
+                if bestfit is None or fit < bestfit:
+                    best = (fx, fy)
+                    bestfit = fit
+        if best is None:
+            return None
+        self.place((best[0], best[1], w, h))
+        return best
+
+    def place(self, rect):
+        x, y, w, h = rect
+        free = list()
+        for f in self.free:
+            if not rectsOverlap(f, rect):
+                free.append(f)
+                continue
+            fx, fy, fw, fh = f
+            # what's left of f on each side of rect
+            if x > fx:
+                free.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                free.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                free.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                free.append((fx, y + h, fw, fy + fh - y - h))
+        # drop free rects inside other ones
+        self.free = [f for i, f in enumerate(free)
+                     if not any(j != i and rectContains(g, f) and (g != f or j < i)
+                                for j, g in enumerate(free))]
+
+
+# Power of two sizes up to texmax, smallest first
+def getAtlasSizes(texmax):
+    sides = list()
+    s = 1
+    while s <= texmax:
+        sides.append(s)
+        s *= 2
+    sizes = [(w, h) for w in sides for h in sides]
+    return sorted(sizes, key=lambda wh: (wh[0] * wh[1], max(wh), wh[1]))
+
+
+# Packs rects into the smallest power of two atlas that holds them
+# - sizes is a list of (w, h)
+# - returns (atlas width, atlas height, [(x, y)...] in the same order)
+# - raises ValueError if they don't fit in texmax
+#
+def packAtlas(sizes, texmax=ATLAS_MAX, padding=ATLAS_PADDING):
+    # packing with padding on the right and bottom of each rect, in an atlas
+    # that much bigger, leaves padding between rects but not at the edges
+    padded = [(w + padding, h + padding) for w, h in sizes]
+    order = sorted(range(0, len(sizes)), key=lambda i: (-max(padded[i]), -padded[i][0] * padded[i][1]))
+    area = sum(w * h for w, h in sizes)
+    maxw = max([w for w, h in sizes] + [1])
+    maxh = max([h for w, h in sizes] + [1])
+    for aw, ah in getAtlasSizes(texmax):
+        if aw * ah < area or aw < maxw or ah < maxh:
+            continue
+        packer = MaxRectsPacker(aw + padding, ah + padding)
+        placed = [None] * len(sizes)
+        for i in order:
+            placed[i] = packer.insert(padded[i][0], padded[i][1])
+            if placed[i] is None:
+                break
+        else:
+            return aw, ah, placed
+    raise ValueError("%d frames won't fit in a %dx%d atlas" % (len(sizes), texmax, texmax))
+
+
+# --------------------------------------------------
+# frames
+# --------------------------------------------------
+
+# Opens a frame, resized to width x height unless they're None
+# - returns (w, h, RGBA bytes, alpha bounds (l, t, r, b) or None if it's all
+#   transparent), None if the file doesn't exist
+#
+def loadAtlasFrame(fname, width, height):
+    if not os.path.exists(fname):
+        return None
+    frame = Image.open(fname).convert("RGBA")
+    if width is not None and height is not None:
+        frame = frame.resize((width, height), Image.LANCZOS)
+    return frame.size[0], frame.size[1], frame.tobytes(), frame.getchannel("A").getbbox()
+
+
+def loadAtlasFrameArgs(args):
+    return loadAtlasFrame(*args)
+
+
+def loadAtlasFrames(fnames, width, height, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    args = [(f, width, height) for f in fnames]
+    if workers <= 1 or len(args) <= 1:
+        return [loadAtlasFrameArgs(a) for a in args]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(loadAtlasFrameArgs, args, chunksize=1))
+
+
+# The (l, t, r, b) to crop each frame to
+def getTrimBounds(frames, trim):
+    full = [(0, 0, w, h) for w, h, data, bbox in frames]
+    if trim == ATLAS_TRIM_NONE:
+        return full
+    # all transparent frames keep a pixel
+    bounds = [bbox if bbox is not None else (0, 0, 1, 1) for w, h, data, bbox in frames]
+    if trim == ATLAS_TRIM_FRAME:
+        return bounds
+    boxes = [bbox for w, h, data, bbox in frames if bbox is not None]
+    if len(boxes) == 0:
+        return bounds
+    union = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+             max(b[2] for b in boxes), max(b[3] for b in boxes))
+    return [union] * len(frames)
+
+
+# Makes an atlas and its uv table out of src % frame, for each frame from
+# startFrame to endFrame
+# - frames are resized to width x height first, unless they're None
+# - log(line) is called with what's happening
+# - returns a report dict, see getAtlasReportLine
+# - raises ValueError if the frames don't fit in texmax
+#
+def buildAtlas(src, dst, startFrame, endFrame, width=None, height=None, texmax=ATLAS_MAX,
+               trim=ATLAS_TRIM_SEQUENCE, workers=None, log=print):
+    start = time.time()
+    fnames = [(n, src % n) for n in range(startFrame, endFrame + 1)]
+    loaded = loadAtlasFrames([f for n, f in fnames], width, height, workers)
+
+    frames = list()
+    names = list()
+    missing = list()
+    for (n, fname), frame in zip(fnames, loaded):
+        if frame is None:
+            log(fname + " does not exist!")
+            missing.append(fname)
+        else:
+            frames.append(frame)
+            names.append((n, fname))
+    if len(frames) == 0:
+        raise ValueError("no frames found for " + src)
+
+    bounds = getTrimBounds(frames, trim)
+    sizes = [(r - l, b - t) for l, t, r, b in bounds]
+    aw, ah, placed = packAtlas(sizes, texmax)
+    log("atlas size %d %d" % (aw, ah))
+
+    atlas = Image.new("RGBA", (aw, ah))
+    table = {"image": os.path.basename(dst), "width": aw, "height": ah,
+             "frame-width": frames[0][0], "frame-height": frames[0][1],
+             "trim": trim, "frames": list()}
+    for (n, fname), (w, h, data, bbox), box, (x, y) in zip(names, frames, bounds, placed):
+        img = Image.frombytes("RGBA", (w, h), data).crop(box)
+        atlas.paste(img, (x, y))
+        fw, fh = img.size
+        table["frames"].append({"frame": n,
+                                "file": os.path.basename(fname),
+                                "rect": [x, y, fw, fh],
+                                "trim": [box[0], box[1], fw, fh],
+                                "uv": [float(x) / aw, float(y) / ah,
+                                       float(x + fw) / aw, float(y + fh) / ah]})
+
+    atlas.save(dst)
+    tablefile = getAtlasTableFile(dst)
+    writeAtlasTable(tablefile, table)
+    return {"file": dst, "table": tablefile, "width": aw, "height": ah,
+            "frames": len(frames), "missing": missing,
+            "used": sum(w * h for w, h in sizes), "seconds": time.time() - start}
+
+
+def getAtlasReportLine(report):
+    line = "Atlas : %s %dx%d, %d frames, %.1f%% used, in %.2fs" % \
+           (report["file"], report["width"], report["height"], report["frames"],
+            100.0 * report["used"] / (report["width"] * report["height"]), report["seconds"])
+    if len(report["missing"]) > 0:
+        line += ", %d missing" % len(report["missing"])
+    return line
+
+
+# python -m arttool.atlas [--start=1] [--end=60] [--width=W --height=H] [--max=2048]
+#                         [--trim=sequence|frame|none] [-jN] src%02d.png atlas.png
+#
+if __name__ == "__main__":
+    args = {"startFrame": 1, "endFrame": 60, "width": None, "height": None,
+            "texmax": ATLAS_MAX, "trim": ATLAS_TRIM_SEQUENCE}
+    options = {"--start=": "startFrame", "--end=": "endFrame", "--width=": "width",
+               "--height=": "height", "--max=": "texmax"}
+    workers = None
+    files = list()
+    for a in sys.argv[1:]:
+        opt = [o for o in options if a.startswith(o)]
+        if len(opt) > 0:
+            args[options[opt[0]]] = int(a[len(opt[0]):])
+        elif a.startswith("--trim="):
+            args["trim"] = a[7:]
+        elif a.startswith("-j"):
+            workers = int(a[2:])
+        else:
+            files.append(a)
+    if len(files) != 2 or Image is None or args["trim"] not in ATLAS_TRIMS:
+        print("usage: python -m arttool.atlas [--start=1] [--end=60] [--width=W --height=H] [--max=2048]")
+        print("                               [--trim=sequence|frame|none] [-jN] src%02d.png atlas.png")
+        if Image is None:
+            print("needs Pillow")
+        sys.exit(1)
+    try:
+        report = buildAtlas(files[0], files[1], workers=workers, **args)
+    except ValueError as e:
+        print("ERROR : " + str(e))
+        sys.exit(1)
+    print(getAtlasReportLine(report))
+    sys.exit(1 if len(report["missing"]) > 0 else 0)
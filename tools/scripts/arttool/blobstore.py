@@ -0,0 +1,351 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, gzip, zlib, base64, struct, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import *
+from .maskjson import load_mask_json, write_mask_json, base64_encodeZ, ZLIB_HEADER
+from .maskbin import isBlobKey
+
+
+# ==============================================================================
+# BLOB STORE
+#
+# Content addressed store for the buffers in release masks. Each buffer is
+# decoded (base64, then zlib if it's zlib'd) and stored once under the
+# sha256 of the data, however many masks and combos have it.
+#
+# For each release json we also write <uuid>.blobs.json: the mask with each
+# buffer replaced by a reference to its blob,
+#
+#   "blob:<sha256>"     the json had the data zlib'd (base64_encodeZ)
+#   "blob64:<sha256>"   the json had the data as plain base64
+#
+# Neither ':' is base64, so a reference can't be mistaken for a buffer.
+#
+# Blobs are stored gzip'd, and uploaded as is with Content-Encoding gzip
+# to blobs/<sha256>. A blob never changes, so clients can cache them for
+# good and only fetch the ones they don't have. The full jsons are still
+# released for clients that don't know about the store.
+# ==============================================================================
+
+BLOB_REF_ZLIB = "blob:"
+BLOB_REF_BASE64 = "blob64:"
+BLOBSTORE_GZIP_LEVEL = 9
+BLOBSTORE_KEY_PREFIX = "blobs/"
+BLOBSTORE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+BLOBREF_EXT = ".blobs.json"
+
+
+def getBlobStoreFolder():
+    fldr = getConfigFolder()
+    return os.path.join(fldr, "blobstore")
+
+
+def getBlobRefKey(key):
+    return os.path.splitext(key)[0] + BLOBREF_EXT
+
+
+def isBlobRef(s):
+    return s.startswith(BLOB_REF_ZLIB) or s.startswith(BLOB_REF_BASE64)
+
+
+class BlobStore(object):
+
+    def __init__(self, folder=None):
+        if folder is None:
+            folder = getBlobStoreFolder()
+        self.folder = folder
+        self.lock = threading.Lock()
+        # blobs we've seen this session
+        self.known = set()
+
+    def getBlobFile(self, h):
+        return os.path.join(self.folder, h[:2], h)
+
+    def has(self, h):
+        with self.lock:
+            if h in self.known:
+                return True
+        if os.path.exists(self.getBlobFile(h)):
+            with self.lock:
+                self.known.add(h)
+            return True
+        return False
+
+    # Stores some data
+    # - returns its hash
+    #
+    def put(self, data):
+        h = hashlib.sha256(data).hexdigest()
+        if self.has(h):
+            return h
+        blobfile = self.getBlobFile(h)
+        os.makedirs(os.path.dirname(blobfile), exist_ok=True)
+        tmp = blobfile + "." + str(threading.get_ident()) + ".tmp"
+        f = open(tmp, "wb")
+        f.write(gzip.compress(data, BLOBSTORE_GZIP_LEVEL, mtime=0))
+        f.close()
+        os.replace(tmp, blobfile)
+        with self.lock:
+            self.known.add(h)
+        return h
+
+    # - raises OSError if it isn't there
+    #
+    def get(self, h):
+        f = open(self.getBlobFile(h), "rb")
+        try:
+            return gzip.decompress(f.read())
+        finally:
+            f.close()
+
+    # Size of a blob, from the end of the gzip file
+    # - raises OSError if it isn't there
+    #
+    def size(self, h):
+        f = open(self.getBlobFile(h), "rb")
+        try:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack("<I", f.read(4))[0]
+        finally:
+            f.close()
+
+
+# --------------------------------------------------
+# masks <-> blob references
+# --------------------------------------------------
+
+# (data, is zlib'd) of a buffer
+# - raises ValueError if it isn't base64
+#
+def decodeBuffer(s):
+    data = base64.b64decode(s, validate=True)
+    if data[:2] == ZLIB_HEADER:
+        try:
+            return zlib.decompress(data[:-8]), True
+        except zlib.error:
+            # plain data that happens to start like zlib
+            pass
+    return data, False
+
+
+def walkBuffers(o, fn):
+    if isinstance(o, dict):
+        for k, v in o.items():
+            if isinstance(v, str) and isBlobKey(k) and len(v) > 0:
+                o[k] = fn(v)
+            else:
+                walkBuffers(v, fn)
+    elif isinstance(o, list):
+        for v in o:
+            walkBuffers(v, fn)
+
+
+# Puts a mask's buffers in the store, and replaces them with references
+# - returns { hash : size } of the blobs it uses
+#
+def storeMaskBlobs(j, store):
+    blobs = dict()
+
+    def store_buffer(s):
+        try:
+            data, zlibbed = decodeBuffer(s)
+        except ValueError:
+            # not a buffer after all, leave it
+            return s
+        h = store.put(data)
+        blobs[h] = len(data)
+        return (BLOB_REF_ZLIB if zlibbed else BLOB_REF_BASE64) + h
+
+    walkBuffers(j.get("resources"), store_buffer)
+    return blobs
+
+
+# Puts the buffers back in a mask from storeMaskBlobs
+def loadMaskBlobs(j, store):
+
+    def load_buffer(s):
+        if s.startswith(BLOB_REF_ZLIB):
+            return base64_encodeZ(store.get(s[len(BLOB_REF_ZLIB):]))
+        if s.startswith(BLOB_REF_BASE64):
+            return base64.b64encode(store.get(s[len(BLOB_REF_BASE64):])).decode("ascii")
+        return s
+
+    walkBuffers(j.get("resources"), load_buffer)
+    return j
+
+
+# { hash : size } of the blobs a mask with references uses
+def getMaskBlobRefs(j, store):
+    blobs = dict()
+
+    def ref(s):
+        if isBlobRef(s):
+            h = s.split(":", 1)[1]
+            if h not in blobs:
+                blobs[h] = store.size(h)
+        return s
+
+    walkBuffers(j.get("resources"), ref)
+    return blobs
+
+
+# ==============================================================================
+# RELEASES
+# ==============================================================================
+
+def getBlobRefFileName(key):
+    fldr = getConfigFolder()
+    return os.path.join(fldr, "release", getBlobRefKey(key))
+
+
+# Makes the blob reference version of a release json, and stores its blobs
+# - returns (reference file, { hash : size })
+#
+def storeReleaseFile(filename, key, store):
+    reffile = getBlobRefFileName(key)
+    if os.path.exists(reffile) and os.path.getmtime(reffile) >= os.path.getmtime(filename):
+        j = load_mask_json(reffile)
+        try:
+            return reffile, getMaskBlobRefs(j, store)
+        except OSError:
+            # blob store was cleared, make it again
+            pass
+    j = load_mask_json(filename)
+    blobs = storeMaskBlobs(j, store)
+    os.makedirs(os.path.dirname(reffile), exist_ok=True)
+    write_mask_json(reffile, j)
+    return reffile, blobs
+
+
+# Runs storeReleaseFile on a list of (jsonfile, key), in parallel
+# - returns a list of (jsonfile, key, reference file, { hash : size }), missing
+#   jsons left out
+#
+def storeReleaseFiles(files, store=None, workers=None):
+    if store is None:
+        store = BlobStore()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    files = [(f, k) for f, k in files if os.path.exists(f)]
+
+    def work(fk):
+        return storeReleaseFile(fk[0], fk[1], store)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        stored = list(pool.map(work, files))
+    return [(f, k, r, b) for (f, k), (r, b) in zip(files, stored)]
+
+
+# The blobs used by storeReleaseFiles() results
+# - returns { hash : size }
+#
+def getStoredBlobs(stored):
+    blobs = dict()
+    for f, k, reffile, b in stored:
+        blobs.update(b)
+    return blobs
+
+
+# Uploads for storeReleaseFiles() results, for S3Uploader.upload
+def getBlobStoreUploads(stored, store):
+    uploads = list()
+    for f, k, reffile, b in stored:
+        uploads.append((reffile, getBlobRefKey(k)))
+    for h in sorted(getStoredBlobs(stored)):
+        uploads.append((store.getBlobFile(h), BLOBSTORE_KEY_PREFIX + h, "gzip", BLOBSTORE_CACHE_CONTROL))
+    return uploads
+
+
+# The decoded buffers of a mask, in order
+def getMaskBuffers(j):
+    buffers = list()
+
+    def add(s):
+        try:
+            buffers.append(decodeBuffer(s))
+        except ValueError:
+            pass
+        return s
+
+    walkBuffers(j.get("resources"), add)
+    return buffers
+
+
+# Dedup report for storeReleaseFiles() results
+# - returns the lines
+#
+def getBlobStoreReport(stored):
+    # how many masks use each blob
+    users = dict()
+    for f, k, reffile, b in stored:
+        for h in b:
+            users[h] = users.get(h, 0) + 1
+    blobs = getStoredBlobs(stored)
+
+    lines = list()
+    lines.append("%-40s %6s %12s %12s" % ("mask", "blobs", "bytes", "shared"))
+    for f, k, reffile, b in stored:
+        shared = sum(size for h, size in b.items() if users[h] > 1)
+        lines.append("%-40s %6d %12d %12d" % (os.path.basename(f)[:40], len(b), sum(b.values()), shared))
+    refs = sum(len(b) for f, k, r, b in stored)
+    refbytes = sum(sum(b.values()) for f, k, r, b in stored)
+    unique = sum(blobs.values())
+    lines.append("TOTAL : %d masks, %d blob references, %d unique blobs" % (len(stored), refs, len(blobs)))
+    lines.append("        %d bytes referenced, %d bytes stored, dedup ratio %.2f" %
+                 (refbytes, unique, float(refbytes) / max(1, unique)))
+    return lines
+
+
+# python -m arttool.blobstore [--store=folder] [--check] file.json ...
+#
+# Stores the jsons' blobs and prints the dedup report. With --check, also
+# puts each mask back together from the store and checks the buffers come
+# back the same.
+#
+if __name__ == "__main__":
+    folder = None
+    check = False
+    files = list()
+    for a in sys.argv[1:]:
+        if a.startswith("--store="):
+            folder = a[8:]
+        elif a == "--check":
+            check = True
+        else:
+            files.append(a)
+    store = BlobStore(folder)
+    stored = list()
+    failed = False
+    for f in files:
+        j = load_mask_json(f)
+        blobs = storeMaskBlobs(j, store)
+        stored.append((f, os.path.basename(f), None, blobs))
+        if check:
+            ok = getMaskBuffers(loadMaskBlobs(j, store)) == getMaskBuffers(load_mask_json(f))
+            failed = failed or not ok
+            print(("OK     " if ok else "FAILED ") + f)
+    for line in getBlobStoreReport(stored):
+        print(line)
+    sys.exit(1 if failed else 0)
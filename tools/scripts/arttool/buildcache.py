@@ -0,0 +1,139 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, hashlib, shutil, threading
+
+
+# ==============================================================================
+# FILE HASHES
+#
+# Content hashes of build inputs. A hash is remembered against the file's
+# (modtime, size), so an unchanged file is only read once per session.
+# ==============================================================================
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+fileHashes = dict()
+fileHashesLock = threading.Lock()
+
+
+# sha1 of a file's contents, None if it can't be read
+def hashFile(filename):
+    key = os.path.normcase(os.path.abspath(filename))
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with fileHashesLock:
+        entry = fileHashes.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+    h = hashlib.sha1()
+    try:
+        f = open(filename, "rb")
+        try:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                h.update(block)
+        finally:
+            f.close()
+    except OSError:
+        return None
+    digest = h.hexdigest()
+
+    with fileHashesLock:
+        fileHashes[key] = (stamp, digest)
+    return digest
+
+
+# ==============================================================================
+# BUILD CACHE
+#
+# Build outputs stored by the hash of everything that went into them.
+# ==============================================================================
+
+BUILDCACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class BuildCache(object):
+
+    def __init__(self, folder, maxbytes=BUILDCACHE_MAX_BYTES):
+        self.folder = folder
+        self.maxbytes = maxbytes
+
+    def getFileName(self, inhash):
+        return os.path.join(self.folder, inhash[:2], inhash + ".json")
+
+    def contains(self, inhash):
+        return os.path.exists(self.getFileName(inhash))
+
+    # Copies the cached output for inhash to dst
+    # - returns False if there isn't one
+    #
+    def restore(self, inhash, dst):
+        src = self.getFileName(inhash)
+        if not os.path.exists(src):
+            return False
+        try:
+            tmp = dst + ".tmp"
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+            # mark it used, for trim()
+            os.utime(src)
+        except OSError:
+            return False
+        return True
+
+    def store(self, inhash, src):
+        dst = self.getFileName(inhash)
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = dst + "." + str(threading.get_ident()) + ".tmp"
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        except OSError:
+            print("WRITING", dst, "FAILED")
+
+    # Deletes the least recently used outputs until we're under maxbytes
+    #
+    def trim(self):
+        files = list()
+        total = 0
+        for root, subdirs, names in os.walk(self.folder):
+            for name in names:
+                f = os.path.join(root, name)
+                try:
+                    st = os.stat(f)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, f))
+                total += st.st_size
+        files.sort()
+        for mtime, size, f in files:
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove(f)
+            except OSError:
+                continue
+            total -= size
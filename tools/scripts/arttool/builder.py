@@ -0,0 +1,229 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .utils import *
+from .buildgraph import BuildGraph
+from .maskbin import packageMaskBin
+
+
+# ==============================================================================
+# BUILD SCHEDULER
+#
+# Runs buildMask/buildCombo jobs side by side. The heavy lifting is done by
+# the maskmaker processes each job starts, so a pool of threads is enough to
+# keep that many maskmaker chains running at once. Each job writes to its own
+# BuildOutput, and the outputs are handed to the real output window in job
+# order once everything is done. A job only starts once all the jobs it
+# depends on have finished, which is how combos wait for their masks.
+#
+# A build can be watched and stopped: progress(done, total, filename) is
+# called as each job finishes, and once the cancel event is set no more jobs
+# are started. Jobs already running are left to finish.
+# ==============================================================================
+
+BUILD_WORKERS = os.cpu_count() or 1
+
+
+def getBuildWorkers(config=None):
+    if config and config.get("build_workers", 0) > 0:
+        return config["build_workers"]
+    return BUILD_WORKERS
+
+
+# write .bmask files next to the jsons, see maskbin.py
+def getBuildBinary(config=None):
+    if config:
+        return bool(config.get("build_binary", False))
+    return False
+
+
+def buildFileKey(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+# Stands in for the output window while a job runs
+#
+# - sink, if given, gets each line as well, as it comes
+#
+class BuildOutput(object):
+
+    def __init__(self, filename, sink=None):
+        self.filename = filename
+        self.lines = list()
+        self.sink = sink
+
+    def append(self, line):
+        self.lines.append(line)
+        if self.sink is not None:
+            self.sink.append(line)
+
+
+class BuildJob(object):
+
+    # func(output) does the work. It returns (deps, missing) like
+    # buildMask/buildCombo, or None if it decided there was nothing to do.
+    #
+    def __init__(self, filename, func, depends=None, sink=None):
+        self.filename = filename
+        self.func = func
+        self.depends = list()
+        if depends:
+            self.depends = list(depends)
+        self.output = BuildOutput(filename, sink)
+        self.result = None
+        self.error = None
+        self.started = False
+        self.cancelled = False
+
+    def run(self):
+        self.started = True
+        try:
+            self.result = self.func(self.output)
+        except Exception as e:
+            self.error = e
+            self.output.append("ERROR building " + self.filename + " : " + str(e))
+            self.output.append(traceback.format_exc())
+        return self
+
+
+def runBuildJobs(jobs, workers=None, progress=None, cancel=None):
+    if workers is None:
+        workers = BUILD_WORKERS
+    workers = max(1, workers)
+
+    # dependencies on files that aren't being built are already satisfied
+    keys = set()
+    for job in jobs:
+        keys.add(buildFileKey(job.filename))
+    waiting = dict()
+    dependents = dict()
+    for job in jobs:
+        deps = set()
+        for d in job.depends:
+            k = buildFileKey(d)
+            if k in keys and k != buildFileKey(job.filename):
+                deps.add(k)
+        waiting[job] = deps
+        for k in deps:
+            dependents.setdefault(k, list()).append(job)
+
+    ready = [job for job in jobs if len(waiting[job]) == 0]
+    running = set()
+    finished = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while ready or running:
+            # only hand the pool what it can start, so a cancel stops the rest
+            if cancel is not None and cancel.is_set():
+                ready = list()
+            while ready and len(running) < workers:
+                running.add(pool.submit(ready.pop(0).run))
+            if len(running) == 0:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = future.result()
+                finished += 1
+                if progress is not None:
+                    progress(finished, len(jobs), job.filename)
+                k = buildFileKey(job.filename)
+                for dj in dependents.get(k, list()):
+                    waiting[dj].discard(k)
+                    if len(waiting[dj]) == 0:
+                        ready.append(dj)
+
+    # anything left waiting was cancelled, or is part of a dependency cycle
+    for job in jobs:
+        if cancel is not None and cancel.is_set() and not job.started:
+            job.cancelled = True
+            job.output.append("CANCELLED " + job.filename + ", not built.")
+        elif len(waiting[job]) > 0 and not job.started:
+            job.error = RuntimeError("circular dependency")
+            job.output.append("ERROR " + job.filename + " has a circular dependency, not built.")
+
+    return jobs
+
+
+# ==============================================================================
+# MASKS AND COMBOS
+# ==============================================================================
+
+def makeBuildJob(filename, depends, binary=False, sink=None, usecache=True):
+    def func(output):
+        if filename.lower().endswith(".fbx"):
+            jsonfile = jsonFromFbx(filename)
+            r = buildMask(filename, output, None, usecache)
+        else:
+            jsonfile = filename
+            r = buildCombo(filename, output, None, usecache)
+        if binary and os.path.exists(jsonfile):
+            output.append("Packaged " + packageMaskBin(jsonfile))
+        return r
+    return BuildJob(filename, func, depends, sink)
+
+
+# Builds masks and combos in parallel
+# - onlyIfNeeded builds just the files the build graph says are dirty
+# - binary also packages each json into a .bmask
+# - live sends each line to outputWindow as it comes, instead of in job order
+#   at the end. outputWindow has to be thread safe for that.
+# - progress and cancel are passed on to runBuildJobs
+# - failed, if given, gets the files that errored or weren't built
+# - usecache False runs maskmaker even when a build could come from the
+#   build cache, for Rebuild All
+# - returns a dict of file -> missing dependencies, like the build loops did
+#
+def buildMasksAndCombos(fbxfiles, combofiles, outputWindow, onlyIfNeeded=False, workers=None,
+                        binary=False, live=False, progress=None, cancel=None, failed=None,
+                        usecache=True):
+    graph = BuildGraph()
+    files = list(fbxfiles) + list(combofiles)
+    if onlyIfNeeded:
+        files = graph.getDirtyFiles(files)
+
+    jobs = list()
+    for f in graph.getBuildOrder(files):
+        jobs.append(makeBuildJob(f, graph.getDepends(f), binary, outputWindow if live else None,
+                                 usecache))
+
+    # svn adds are queued by the jobs and done in one go at the end
+    svnBeginBatch()
+    try:
+        runBuildJobs(jobs, workers, progress, cancel)
+    finally:
+        svnEndBatch(outputWindow)
+    getBuildCache().trim()
+
+    all_missing = dict()
+    for job in jobs:
+        if not live:
+            for line in job.output.lines:
+                outputWindow.append(line)
+        if failed is not None and (job.error is not None or job.cancelled):
+            failed.append(job.filename)
+        if job.result is not None:
+            deps, missing = job.result
+            if len(missing) > 0:
+                all_missing[job.filename] = missing
+    return all_missing
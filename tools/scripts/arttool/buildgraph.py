@@ -0,0 +1,160 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os
+
+from .utils import *
+
+
+# ==============================================================================
+# BUILD GRAPH
+#
+# One graph of everything a build reads. Masks (fbx files) depend on their
+# fbx, their meta file and the "dependencies" recorded in it. Combos depend
+# on their meta file, their recorded dependencies and on the masks listed in
+# their "additions", so a combo is dirty whenever one of its masks is.
+#
+# Every file is stat'ed at most once per graph, so make a new graph whenever
+# the files on disk may have changed (after a build, refresh, svn update...).
+# ==============================================================================
+
+def graphKey(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+class BuildGraph(object):
+
+    def __init__(self):
+        self.mtimes = dict()
+        self.dirty = dict()
+        self.depends = dict()
+
+    # modtime of a file, None if it doesn't exist
+    def getModTime(self, filename):
+        k = graphKey(filename)
+        if k not in self.mtimes:
+            try:
+                self.mtimes[k] = os.path.getmtime(filename)
+            except OSError:
+                self.mtimes[k] = None
+        return self.mtimes[k]
+
+    def isNewer(self, filename, modtime):
+        m = self.getModTime(filename)
+        return m is None or m > modtime
+
+    # the masks a combo merges
+    def getDepends(self, filename):
+        k = graphKey(filename)
+        if k not in self.depends:
+            deps = list()
+            if not filename.lower().endswith(".fbx"):
+                metadata = peekMetadataFile(filename)
+                if metadata is not None:
+                    for f in metadata.get("additions", list()):
+                        if len(f) > 0:
+                            deps.append(f)
+            self.depends[k] = deps
+        return self.depends[k]
+
+    # --------------------------------------------------
+    # dirty checks : a missing json, or an fbx, meta file or dependency
+    # newer than it, or a dirty mask going into a combo
+    # --------------------------------------------------
+    def needsRebuilding(self, filename):
+        k = graphKey(filename)
+        if k not in self.dirty:
+            # in case of a cycle
+            self.dirty[k] = False
+            self.dirty[k] = self.checkFile(filename)
+        return self.dirty[k]
+
+    def checkFile(self, filename):
+        metafile = getMetaFileName(filename)
+        if filename.lower().endswith(".fbx"):
+            jsonfile = filename.lower().replace(".fbx",".json")
+            jsonmodtime = self.getModTime(jsonfile)
+            # missing json
+            if jsonmodtime is None:
+                return True
+            # fbx modtime
+            if self.isNewer(filename, jsonmodtime):
+                return True
+        else: # .json (combo)
+            jsonmodtime = self.getModTime(filename)
+            # missing json
+            if jsonmodtime is None:
+                return True
+
+        # missing meta, meta modtime
+        if self.isNewer(metafile, jsonmodtime):
+            return True
+
+        # dependencies
+        metadata = peekMetadataFile(filename)
+        if metadata is None:
+            return True
+        for dep in metadata.get("dependencies", list()):
+            if self.isNewer(dep["file"], jsonmodtime):
+                return True
+
+        # masks going into a combo
+        for dep in self.getDepends(filename):
+            if self.needsRebuilding(dep):
+                return True
+
+        return False
+
+    def getDirtyFiles(self, files):
+        return [f for f in files if self.needsRebuilding(f)]
+
+    # --------------------------------------------------
+    # build order
+    # --------------------------------------------------
+
+    # Sorts files so everything comes after the files it depends on,
+    # otherwise keeping the order they were given in. Dependencies that
+    # aren't in files aren't added.
+    #
+    def getBuildOrder(self, files):
+        wanted = dict()
+        for f in files:
+            wanted[graphKey(f)] = f
+        order = list()
+        state = dict()
+
+        def visit(f):
+            k = graphKey(f)
+            if state.get(k) is not None:
+                # done, or a cycle
+                return
+            state[k] = False
+            for d in self.getDepends(f):
+                dk = graphKey(d)
+                if dk in wanted:
+                    visit(wanted[dk])
+            state[k] = True
+            order.append(f)
+
+        for f in files:
+            visit(f)
+        return order
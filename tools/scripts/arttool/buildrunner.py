@@ -0,0 +1,163 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import threading, traceback
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+
+# ==============================================================================
+# BUILD RUNNER
+#
+# Runs a build off the UI thread so the art tool stays usable while it goes.
+#
+# The build function is called on a QThread as func(output, progress, cancel):
+#   output    thread safe stand-in for the output window
+#   progress  progress(done, total, filename), safe to call from the thread
+#   cancel    threading.Event, set when the cancel button is pressed
+# and whatever it returns is passed to onFinished, on the UI thread.
+#
+# Lines written to output are collected and added to the output window a
+# batch at a time by a timer, rather than one signal per line.
+# ==============================================================================
+
+BUILD_FLUSH_MS = 100
+
+
+class BuildLineBuffer(object):
+
+    def __init__(self):
+        self.lines = list()
+        self.lock = threading.Lock()
+
+    def append(self, line):
+        with self.lock:
+            self.lines.append(line)
+
+    def take(self):
+        with self.lock:
+            lines = self.lines
+            self.lines = list()
+        return lines
+
+
+class BuildThread(QThread):
+
+    progress = pyqtSignal(int, int, str)
+
+    def __init__(self, func, output, cancel):
+        super(BuildThread, self).__init__()
+        self.func = func
+        self.output = output
+        self.cancel = cancel
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = self.func(self.output, self.onProgress, self.cancel)
+        except Exception as e:
+            self.output.append("ERROR building : " + str(e))
+            self.output.append(traceback.format_exc())
+
+    def onProgress(self, done, total, filename):
+        self.progress.emit(done, total, filename)
+
+
+class BuildRunner(QObject):
+
+    # progressBar and cancelButton are shown while a build runs
+    #
+    def __init__(self, outputWindow, progressBar, cancelButton, parent=None):
+        super(BuildRunner, self).__init__(parent)
+        self.outputWindow = outputWindow
+        self.progressBar = progressBar
+        self.cancelButton = cancelButton
+        self.cancelButton.pressed.connect(lambda: self.cancel())
+        self.buffer = BuildLineBuffer()
+        self.cancelEvent = threading.Event()
+        self.thread = None
+        self.onFinished = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(BUILD_FLUSH_MS)
+        self.timer.timeout.connect(lambda: self.flush())
+        self.showProgress(False)
+
+    def isRunning(self):
+        return self.thread is not None
+
+    def start(self, func, onFinished=None):
+        if self.isRunning():
+            return False
+        self.cancelEvent.clear()
+        self.onFinished = onFinished
+        self.thread = BuildThread(func, self.buffer, self.cancelEvent)
+        self.thread.progress.connect(lambda d, t, f: self.onProgress(d, t, f))
+        self.thread.finished.connect(lambda: self.onThreadFinished())
+        self.progressBar.setRange(0, 0)
+        self.progressBar.setFormat("Building...")
+        self.cancelButton.setEnabled(True)
+        self.showProgress(True)
+        self.timer.start()
+        self.thread.start()
+        return True
+
+    def cancel(self):
+        if self.isRunning() and not self.cancelEvent.is_set():
+            self.cancelEvent.set()
+            self.cancelButton.setEnabled(False)
+            self.progressBar.setFormat("Cancelling, waiting for running jobs... %v/%m")
+            self.outputWindow.append("Cancelling build, waiting for running jobs to finish.")
+
+    # Cancels the build and waits for it, without calling onFinished. For
+    # shutting down.
+    #
+    def stop(self):
+        if self.isRunning():
+            self.onFinished = None
+            self.cancel()
+            self.thread.wait()
+            self.onThreadFinished()
+
+    def flush(self):
+        lines = self.buffer.take()
+        if len(lines) > 0:
+            self.outputWindow.append("\n".join(lines))
+
+    def showProgress(self, show):
+        self.progressBar.setVisible(show)
+        self.cancelButton.setVisible(show)
+
+    def onProgress(self, done, total, filename):
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(done)
+        if not self.cancelEvent.is_set():
+            self.progressBar.setFormat("%v/%m : " + filename)
+
+    def onThreadFinished(self):
+        if self.thread is None:
+            return
+        thread = self.thread
+        self.thread = None
+        self.timer.stop()
+        self.flush()
+        self.showProgress(False)
+        if self.onFinished is not None:
+            self.onFinished(thread.result)
@@ -0,0 +1,229 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, threading
+
+from .utils import *
+from .fileindex import FileIndex
+from .buildgraph import BuildGraph
+from .builder import buildMasksAndCombos, getBuildWorkers, getBuildBinary
+
+
+# ==============================================================================
+# COMMAND LINE
+#
+# The art tool without the window, for build servers and cron jobs. It works
+# in the art folder, like the tool (see setArtFolder), or --root=folder:
+#
+#   python -m arttool scan                      list the masks and combos
+#   python -m arttool check                     check their meta data
+#   python -m arttool build [-jN] [files...]    build everything, or some files
+#   python -m arttool autobuild [-jN]           build what needs building
+#   python -m arttool release-index index.json  write the release index
+#   python -m arttool upload [index.json]       upload the release to S3
+#   python -m arttool tilesheet ...             make a tile sheet, see tilesheet.py
+#
+# Builds run -j at a time, the number of cpus by default (or build_workers in
+# the config), with each line printed as it comes. --binary/--no-binary
+# override the config's build_binary, --no-cache runs maskmaker for every
+# file instead of restoring unchanged ones from the build cache.
+#
+# svn and maskmaker can be set with $ART_SVN and $ART_MASKMAKER, see utils.py.
+#
+# Nothing in here imports Qt. Commands exit with 0 if everything went fine,
+# 1 if something didn't.
+# ==============================================================================
+
+CLI_STATUS_NAMES = {CHECKMETA_GOOD: "good",
+                    CHECKMETA_ERROR: "error",
+                    CHECKMETA_WARNING: "warning",
+                    CHECKMETA_NORELEASE: "no release",
+                    CHECKMETA_WITHPLUGIN: "with plugin"}
+
+
+# Stands in for the output window, builds write to it from several threads
+class CliOutput(object):
+
+    def __init__(self, stream=None):
+        self.lock = threading.Lock()
+        self.stream = stream
+
+    def append(self, line):
+        with self.lock:
+            print(line, file=self.stream or sys.stdout, flush=True)
+
+
+# Splits the command line into options and files
+# - returns (options dict, files), options like -j4 and --binary come back as
+#   {"-j": "4", "--binary": ""}
+#
+def parseCliArgs(argv):
+    options = dict()
+    files = list()
+    for a in argv:
+        if a.startswith("--"):
+            k, eq, v = a.partition("=")
+            options[k] = v
+        elif a.startswith("-j"):
+            options["-j"] = a[2:]
+        else:
+            files.append(a)
+    return options, files
+
+
+def getCliFiles():
+    index = FileIndex()
+    index.refresh()
+    return index.getFbxFileList(), index.getComboFileList()
+
+
+# --------------------------------------------------
+# commands
+# --------------------------------------------------
+
+def cliScan(options, files):
+    fbxfiles, combofiles = getCliFiles()
+    for f in fbxfiles + combofiles:
+        print(f)
+    print(len(fbxfiles), "masks,", len(combofiles), "combos")
+    return 0
+
+
+def cliCheck(options, files):
+    fbxfiles, combofiles = getCliFiles()
+    graph = BuildGraph()
+    counts = dict()
+    for f in fbxfiles + combofiles:
+        mdc, mt = checkMetaDataFile(f)
+        name = CLI_STATUS_NAMES.get(mdc, str(mdc))
+        counts[name] = counts.get(name, 0) + 1
+        line = "%-12s %s" % (name, f)
+        if graph.needsRebuilding(f):
+            line += " (needs building)"
+        print(line)
+    print(", ".join("%d %s" % (n, name) for name, n in sorted(counts.items())))
+    return 1 if counts.get(CLI_STATUS_NAMES[CHECKMETA_ERROR], 0) > 0 else 0
+
+
+def cliBuild(options, files, onlyIfNeeded=False):
+    config = createGetConfig()
+    workers = getBuildWorkers(config)
+    if len(options.get("-j", "")) > 0:
+        workers = int(options["-j"])
+    binary = getBuildBinary(config)
+    if "--binary" in options:
+        binary = True
+    if "--no-binary" in options:
+        binary = False
+
+    if len(files) > 0:
+        fbxfiles = [f for f in files if f.lower().endswith(".fbx")]
+        combofiles = [f for f in files if not f.lower().endswith(".fbx")]
+    else:
+        fbxfiles, combofiles = getCliFiles()
+
+    output = CliOutput()
+
+    def progress(done, total, filename):
+        output.append("[%d/%d] %s" % (done, total, filename))
+
+    failed = list()
+    usecache = "--no-cache" not in options
+    all_missing = buildMasksAndCombos(fbxfiles, combofiles, output, onlyIfNeeded, workers,
+                                      binary, True, progress, None, failed, usecache)
+    for f, missing in all_missing.items():
+        for m in missing:
+            output.append(f + " depends on " + m + ", which cannot be found.")
+    for f in failed:
+        output.append("FAILED " + f)
+    return 1 if len(failed) > 0 or len(all_missing) > 0 else 0
+
+
+def cliAutobuild(options, files):
+    return cliBuild(options, files, True)
+
+
+def cliReleaseIndex(options, files):
+    if len(files) != 1:
+        print("usage: python -m arttool release-index index.json")
+        return 1
+    from .s3upload import getReleaseIndex
+    metalist, jsonlist = getReleaseIndex(*getCliFiles())
+    writeMetaData(os.path.abspath(files[0]), metalist)
+    print(len(metalist), "masks and combos in", files[0])
+    return 0
+
+
+def cliUpload(options, files):
+    from .s3upload import getReleaseIndex, uploadRelease
+    metalist, jsonlist = getReleaseIndex(*getCliFiles())
+    results = uploadRelease(metalist, jsonlist)
+    if len(files) > 0:
+        writeMetaData(os.path.abspath(files[0]), metalist)
+    return 1 if "failed" in results.values() else 0
+
+
+CLI_COMMANDS = {"scan": cliScan,
+                "check": cliCheck,
+                "build": cliBuild,
+                "autobuild": cliAutobuild,
+                "release-index": cliReleaseIndex,
+                "upload": cliUpload}
+
+
+def cliUsage():
+    print("usage: python -m arttool <command> [options] [files]")
+    print("")
+    print("  scan                      list the masks and combos")
+    print("  check                     check their meta data")
+    print("  build [-jN] [files...]    build everything, or just these files")
+    print("  autobuild [-jN]           build what needs building")
+    print("  release-index index.json  write the release index")
+    print("  upload [index.json]       upload the release to S3")
+    print("  tilesheet ...             make a tile sheet")
+    print("")
+    print("  options: --root=folder, the art folder")
+    print("  build options: -jN, --binary, --no-binary, --no-cache")
+    print("")
+    print("  $ART_FOLDER, $ART_SVN and $ART_MASKMAKER set the art folder, svn and maskmaker")
+
+
+# Runs a command
+# - returns the exit code
+#
+def main(argv):
+    if len(argv) > 0 and argv[0] in ["-h", "--help", "help"]:
+        cliUsage()
+        return 0
+    if len(argv) == 0 or argv[0] not in CLI_COMMANDS and argv[0] != "tilesheet":
+        cliUsage()
+        return 1
+    if argv[0] == "tilesheet":
+        from .tilesheet import tileSheetMain
+        return tileSheetMain(argv[1:], "python -m arttool tilesheet")
+    options, files = parseCliArgs(argv[1:])
+    setArtFolder(options.get("--root") or None)
+    try:
+        return CLI_COMMANDS[argv[0]](options, files)
+    except KeyboardInterrupt:
+        print("interrupted")
+        return 130
@@ -0,0 +1,171 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, json, time
+
+from .utils import *
+
+
+# ==============================================================================
+# FILE INDEX
+#
+# Persistent index of the fbx and combo files in the depot. For every folder
+# we remember its modtime, its sub folders and the fbx/combo files in it.
+# Adding, removing or renaming a file changes the modtime of the folder it
+# lives in, so on refresh we only have to stat each folder and re-list the
+# ones that changed, instead of walking every file in the depot.
+# ==============================================================================
+
+FILEINDEX_VERSION = 1
+
+# folders modified this close to a scan might still be changing, so we
+# don't trust their modtime and re-list them next time
+FILEINDEX_RACY_TIME = 2 * 1000000000
+
+
+def getFileIndexFile():
+    return os.path.join(getConfigFolder(), "fileindex.json")
+
+
+class FileIndex(object):
+
+    def __init__(self, root=".", indexfile=None):
+        self.root = root
+        self.indexfile = indexfile
+        if self.indexfile is None:
+            self.indexfile = getFileIndexFile()
+        self.folders = dict()
+        self.dirty = False
+        self.load()
+
+    # --------------------------------------------------
+    # load/save
+    # --------------------------------------------------
+    def load(self):
+        self.folders = dict()
+        try:
+            f = open(self.indexfile, "r")
+            index = json.loads(f.read())
+            f.close()
+        except:
+            return
+        if index.get("version") != FILEINDEX_VERSION:
+            return
+        if index.get("root") != os.path.abspath(self.root):
+            return
+        self.folders = index["folders"]
+
+    def save(self):
+        if not self.dirty:
+            return
+        index = {"version": FILEINDEX_VERSION,
+                 "root": os.path.abspath(self.root),
+                 "folders": self.folders}
+        try:
+            createMetaFolder(os.path.dirname(self.indexfile))
+            tmpfile = self.indexfile + ".tmp"
+            f = open(tmpfile, "w")
+            f.write(json.dumps(index))
+            f.close()
+            os.replace(tmpfile, self.indexfile)
+        except:
+            print("WRITING", self.indexfile, "FAILED")
+        else:
+            self.dirty = False
+
+    # --------------------------------------------------
+    # refresh
+    # --------------------------------------------------
+    def refresh(self):
+        scantime = int(time.time() * 1000000000)
+        folders = dict()
+        self.refreshFolder(self.root, folders, scantime)
+        if folders.keys() != self.folders.keys():
+            self.dirty = True
+        self.folders = folders
+        self.save()
+
+    def refreshFolder(self, folder, folders, scantime):
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            return
+
+        entry = self.folders.get(folder)
+        if entry is None or entry["mtime"] != mtime:
+            entry = self.scanFolder(folder, mtime, scantime)
+            self.dirty = True
+        folders[folder] = entry
+
+        for subdir in entry["subdirs"]:
+            self.refreshFolder(os.path.join(folder, subdir), folders, scantime)
+
+    def scanFolder(self, folder, mtime, scantime):
+        entry = {"mtime": mtime, "subdirs": list(), "fbx": list(), "combo": list()}
+        if (scantime - mtime) < FILEINDEX_RACY_TIME:
+            entry["mtime"] = -1
+        try:
+            it = os.scandir(folder)
+        except OSError:
+            return entry
+        with it:
+            for e in it:
+                try:
+                    isdir = e.is_dir()
+                except OSError:
+                    isdir = False
+                if isdir:
+                    # os.walk doesn't follow links by default, neither do we
+                    if not e.is_symlink():
+                        entry["subdirs"].append(e.name)
+                elif e.name.lower().endswith(".fbx"):
+                    entry["fbx"].append(e.name)
+                elif e.name.lower().endswith(".combo"):
+                    entry["combo"].append(e.name)
+        return entry
+
+    # --------------------------------------------------
+    # queries : same results as getFbxFileList/getComboFileList
+    # --------------------------------------------------
+    def walk(self, folder):
+        entry = self.folders.get(folder)
+        if entry is None:
+            return
+        yield folder, entry
+        for subdir in entry["subdirs"]:
+            for r in self.walk(os.path.join(folder, subdir)):
+                yield r
+
+    def getFbxFileList(self):
+        fileList = list()
+        for root, entry in self.walk(self.root):
+            for file in entry["fbx"]:
+                fileList.append(os.path.join(root, file).replace("\\", "/"))
+        return fileList
+
+    def getComboFileList(self):
+        fileList = list()
+        for root, entry in self.walk(self.root):
+            for file in entry["combo"]:
+                f = os.path.join(root, file).replace("\\","/").replace("/.art/","/").replace(".combo",".json")
+                fileList.append(f)
+        return fileList
@@ -0,0 +1,245 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, queue, threading, traceback
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QIcon, QBrush, QColor, QFont
+
+from .utils import *
+from .buildgraph import BuildGraph
+
+
+# ==============================================================================
+# FILE LIST MODEL
+#
+# Model for the fbx and combo lists. The color and icon of a file come from
+# its meta data check and whether it needs rebuilding, which means reading
+# its meta file and stat'ing everything it depends on. So they're worked out
+# lazily: only when the view asks for a row, which it only does for the rows
+# it shows, and on a worker thread. Until the answer comes back the row is
+# drawn plain.
+#
+# Answers are cached per file. refreshStatus() marks them all stale: stale
+# rows keep their old color and icon until the new answer comes in.
+# ==============================================================================
+
+STATUS_COLORS = {CHECKMETA_GOOD: "#32CD32",
+                 CHECKMETA_ERROR: "#FF0000",
+                 CHECKMETA_WARNING: "#FF7F50",
+                 CHECKMETA_NORELEASE: "#000000",
+                 CHECKMETA_WITHPLUGIN: "#5070FF"}
+
+LIST_ICONS = dict()
+
+
+def getListIcon(name):
+    if name not in LIST_ICONS:
+        LIST_ICONS[name] = QIcon("arttool/" + name + ".png")
+    return LIST_ICONS[name]
+
+
+# icon for a mask, None for none
+def getMaskIconName(mt, nb):
+    if mt == MASK_UNKNOWN:
+        return "unknownicon"
+    if mt == MASK_NORMAL:
+        return "maskicon_build" if nb else "maskicon"
+    if mt == MASK_MORPH:
+        return "morphicon_build" if nb else "morphicon"
+    return None
+
+
+def getComboIconName(mt, nb):
+    return "comboicon_build" if nb else "comboicon"
+
+
+# (meta data check, mask type, needs rebuilding) of a file
+def getFileStatus(filename, graph):
+    mdc, mt = checkMetaDataFile(filename)
+    return mdc, mt, graph.needsRebuilding(filename)
+
+
+def fileListKey(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+class FileListModel(QAbstractListModel):
+
+    # generation, filename, status
+    statusReady = pyqtSignal(int, str, object)
+
+    # getIconName(mt, nb) picks the icon
+    #
+    def __init__(self, getIconName, parent=None):
+        super(FileListModel, self).__init__(parent)
+        self.getIconName = getIconName
+        self.font = QFont("Arial", 12, QFont.Bold)
+        self.files = list()
+        # row -> index in files, and back
+        self.rows = list()
+        self.rowOf = dict()
+        # key -> index in files
+        self.fileOf = dict()
+        # key -> status, and the keys that need working out again
+        self.status = dict()
+        self.stale = set()
+        self.requested = set()
+        self.generation = 0
+        self.requests = queue.LifoQueue()
+        self.stopping = False
+        self.statusReady.connect(lambda g, f, s: self.onStatusReady(g, f, s))
+        self.thread = threading.Thread(target=self.work, name="FileListModel", daemon=True)
+        self.thread.start()
+
+    # Shows a new list of files, all of them
+    def setFiles(self, files):
+        self.beginResetModel()
+        self.files = list(files)
+        self.fileOf = dict()
+        for idx, f in enumerate(self.files):
+            self.fileOf[fileListKey(f)] = idx
+        self.setRowsInternal(None)
+        self.markStale()
+        self.endResetModel()
+
+    # Shows just some of the files
+    # - rows is a list of indices in files, in the order to show them, or
+    #   None for all of them
+    #
+    def setRows(self, rows):
+        self.beginResetModel()
+        self.setRowsInternal(rows)
+        self.endResetModel()
+
+    def setRowsInternal(self, rows):
+        if rows is None:
+            rows = range(0, len(self.files))
+        self.rows = list(rows)
+        self.rowOf = dict((idx, row) for row, idx in enumerate(self.rows))
+
+    # index in files of a row, -1 if there isn't one
+    def getFileIndex(self, row):
+        if 0 <= row < len(self.rows):
+            return self.rows[row]
+        return -1
+
+    # row of an index in files, -1 if it isn't shown
+    def getRow(self, fileidx):
+        return self.rowOf.get(fileidx, -1)
+
+    # Works out every shown file's status again, as they're looked at
+    def refreshStatus(self):
+        self.markStale()
+        if len(self.rows) > 0:
+            self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1))
+
+    # Sets a file's status now, ie. from the meta data being edited
+    def setStatus(self, fileidx, mdc, mt, nb):
+        key = fileListKey(self.files[fileidx])
+        self.status[key] = (mdc, mt, nb)
+        self.stale.discard(key)
+        row = self.getRow(fileidx)
+        if row >= 0:
+            self.dataChanged.emit(self.index(row), self.index(row))
+
+    def stop(self):
+        self.stopping = True
+        self.requests.put(None)
+
+    def markStale(self):
+        self.generation += 1
+        self.stale = set(self.status.keys())
+        self.requested = set()
+
+    # --------------------------------------------------
+    # QAbstractListModel
+    # --------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        filename = self.files[self.rows[index.row()]]
+        if role == Qt.DisplayRole:
+            return filename[2:]
+        if role == Qt.FontRole:
+            return self.font
+        if role not in [Qt.ForegroundRole, Qt.DecorationRole]:
+            return None
+
+        status = self.getCachedStatus(filename)
+        if status is None:
+            return None
+        mdc, mt, nb = status
+        if role == Qt.ForegroundRole:
+            if mdc in STATUS_COLORS:
+                return QBrush(QColor(STATUS_COLORS[mdc]))
+            return None
+        name = self.getIconName(mt, nb)
+        return getListIcon(name) if name is not None else None
+
+    # the status we have, asking the worker for it if it's missing or stale
+    def getCachedStatus(self, filename):
+        key = fileListKey(filename)
+        if (key not in self.status or key in self.stale) and key not in self.requested:
+            self.requested.add(key)
+            self.requests.put((self.generation, filename))
+        return self.status.get(key)
+
+    def onStatusReady(self, generation, filename, status):
+        if generation != self.generation:
+            return
+        key = fileListKey(filename)
+        self.requested.discard(key)
+        self.stale.discard(key)
+        self.status[key] = status
+        row = self.getRow(self.fileOf.get(key, -1))
+        if row >= 0:
+            self.dataChanged.emit(self.index(row), self.index(row))
+
+    # --------------------------------------------------
+    # worker thread
+    # --------------------------------------------------
+    def work(self):
+        graph = None
+        graphGeneration = -1
+        while not self.stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+            generation, filename = request
+            if generation != self.generation:
+                continue
+            # a new graph for each generation, files have changed since
+            if graph is None or graphGeneration != generation:
+                graph = BuildGraph()
+                graphGeneration = generation
+            try:
+                status = getFileStatus(filename, graph)
+            except Exception:
+                traceback.print_exc()
+                status = (CHECKMETA_ERROR, MASK_UNKNOWN, True)
+            if not self.stopping:
+                self.statusReady.emit(generation, filename, status)
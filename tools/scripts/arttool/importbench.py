@@ -0,0 +1,104 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, subprocess
+
+
+# ==============================================================================
+# IMPORT BENCHMARK
+#
+# How long modules take to import from cold. Each import is done in a new
+# python, so nothing is already in sys.modules:
+#
+#   python -m arttool.importbench [-nN] [module...]
+#
+# For each module it prints the median, best and worst of N runs (5 by
+# default), and which heavy modules (Qt, boto3, numpy, PIL) it pulled in.
+# The command line and scripts only want arttool.utils, which shouldn't pull
+# in any of them.
+# ==============================================================================
+
+IMPORTBENCH_MODULES = ["arttool.utils", "arttool.builder", "arttool.cli", "arttool.additions",
+                       "arttool.arttool"]
+IMPORTBENCH_HEAVY = ["PyQt5", "boto3", "botocore", "numpy", "PIL"]
+IMPORTBENCH_RUNS = 5
+
+
+# Imports a module in a new python
+# - returns (seconds, heavy modules it pulled in), None if it failed
+#
+def timeImport(module):
+    code = "import sys, time\n" \
+           "t = time.perf_counter()\n" \
+           "import " + module + "\n" \
+           "print(time.perf_counter() - t)\n" \
+           "print(' '.join(m for m in " + repr(IMPORTBENCH_HEAVY) + " if m in sys.modules))\n"
+    env = dict(os.environ)
+    scripts = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join([scripts] + [p for p in [env.get("PYTHONPATH")] if p])
+    r = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                       universal_newlines=True, env=env)
+    lines = r.stdout.splitlines()
+    if r.returncode != 0 or len(lines) < 2:
+        return None
+    return float(lines[-2]), lines[-1].split()
+
+
+# Times a module's import runs times
+# - returns a report dict, see getImportReportLine
+#
+def benchImport(module, runs=IMPORTBENCH_RUNS):
+    times = list()
+    heavy = list()
+    for i in range(0, runs):
+        r = timeImport(module)
+        if r is None:
+            return {"module": module, "failed": True}
+        times.append(r[0])
+        heavy = r[1]
+    times.sort()
+    return {"module": module, "failed": False, "median": times[len(times) // 2],
+            "best": times[0], "worst": times[-1], "heavy": heavy}
+
+
+def getImportReportLine(report):
+    if report["failed"]:
+        return "%-20s failed to import" % report["module"]
+    line = "%-20s %7.1fms  (best %.1fms, worst %.1fms)" % \
+           (report["module"], report["median"] * 1000, report["best"] * 1000, report["worst"] * 1000)
+    if len(report["heavy"]) > 0:
+        line += "  pulls in " + ", ".join(report["heavy"])
+    return line
+
+
+if __name__ == "__main__":
+    runs = IMPORTBENCH_RUNS
+    modules = list()
+    for a in sys.argv[1:]:
+        if a.startswith("-n"):
+            runs = max(1, int(a[2:]))
+        else:
+            modules.append(a)
+    if len(modules) == 0:
+        modules = IMPORTBENCH_MODULES
+    for m in modules:
+        print(getImportReportLine(benchImport(m, runs)))
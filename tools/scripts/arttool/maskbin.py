@@ -0,0 +1,338 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, json, mmap, zlib, base64, struct
+
+from .maskjson import load_mask_json, write_mask_json, dump_mask_json, ZLIB_HEADER
+
+
+# ==============================================================================
+# BINARY MASK FILES
+#
+# The mask json with its buffers (vertex-buffer, index-buffer, image data,
+# mip-data-N, animation values) taken out and stored as raw bytes, so they
+# can be used straight out of a memory mapped file.
+#
+# All numbers are little endian.
+#
+#   header      64 bytes
+#     magic       8s   "SLMASKB\0"
+#     version     u32
+#     blob count  u32
+#     json        u64 offset, u64 size
+#     toc         u64 offset, u64 size
+#     blobs       u64 offset, u64 size
+#   json        utf-8 json : {"blobs": [path, ...], "mask": mask json}
+#               the mask json has the index of the blob in place of each
+#               buffer, and paths[index] is the list of keys to get there
+#   toc         blob count x 24 bytes : u64 offset, u64 size, u32 flags, u32 0
+#   blobs       each one starts on an 8 byte boundary
+#
+# Blob flags say how to turn a blob back into the string in the json:
+#   BLOB_ZLIB     raw data, the json has it zlib'd (base64_encodeZ)
+#   BLOB_BASE64   raw data, the json has it as plain base64
+#   BLOB_VERBATIM the decoded base64 from the json, as is. Used for zlib'd
+#                 buffers that don't compress back to the same bytes, so a
+#                 round trip always gives the same json.
+# ==============================================================================
+
+MASKBIN_MAGIC = b"SLMASKB\0"
+MASKBIN_VERSION = 1
+MASKBIN_EXT = ".bmask"
+MASKBIN_ALIGN = 8
+
+MASKBIN_HEADER = struct.Struct("<8sIIQQQQQQ")
+MASKBIN_TOC_ENTRY = struct.Struct("<QQII")
+
+BLOB_ZLIB = 0
+BLOB_BASE64 = 1
+BLOB_VERBATIM = 2
+
+BLOB_KEYS = ["vertex-buffer", "index-buffer", "data", "values"]
+
+
+def isBlobKey(key):
+    return key in BLOB_KEYS or key.startswith("mip-data-")
+
+
+def maskBinFromJson(jsonfile):
+    return os.path.splitext(jsonfile)[0] + MASKBIN_EXT
+
+
+def alignUp(n):
+    return (n + MASKBIN_ALIGN - 1) & ~(MASKBIN_ALIGN - 1)
+
+
+# --------------------------------------------------
+# blobs <-> json strings
+# --------------------------------------------------
+
+# - raises ValueError if s isn't base64 that we'd write back the same way
+#
+def decodeBlob(s):
+    data = base64.b64decode(s, validate=True)
+    if base64.b64encode(data).decode("ascii") != s:
+        raise ValueError("not canonical base64")
+    if data[:2] != ZLIB_HEADER or len(data) < 10:
+        return data, BLOB_BASE64
+    size = struct.unpack("<Q", data[-8:])[0]
+    try:
+        raw = zlib.decompress(data[:-8])
+    except zlib.error:
+        return data, BLOB_BASE64
+    if len(raw) != size or zlib.compress(raw) != data[:-8]:
+        return data, BLOB_VERBATIM
+    return raw, BLOB_ZLIB
+
+
+def encodeBlob(data, flags):
+    data = bytes(data)
+    if flags == BLOB_ZLIB:
+        data = zlib.compress(data) + struct.pack("<Q", len(data))
+    return base64.b64encode(data).decode("ascii")
+
+
+# Takes the buffers out of a mask json
+# - returns (json with blob indexes, paths, list of (data, flags))
+#
+def splitBlobs(j):
+    paths = list()
+    blobs = list()
+
+    def walk(o, path):
+        if isinstance(o, dict):
+            for k, v in o.items():
+                if isinstance(v, str) and isBlobKey(k) and len(v) > 0:
+                    try:
+                        blob = decodeBlob(v)
+                    except ValueError:
+                        # not a buffer after all, leave it in the json
+                        continue
+                    o[k] = len(paths)
+                    paths.append(path + [k])
+                    blobs.append(blob)
+                else:
+                    walk(v, path + [k])
+        elif isinstance(o, list):
+            for i, v in enumerate(o):
+                walk(v, path + [i])
+
+    walk(j.get("resources"), ["resources"])
+    return j, paths, blobs
+
+
+# --------------------------------------------------
+# writing
+# --------------------------------------------------
+
+def writeMaskBin(j, filename):
+    j, paths, blobs = splitBlobs(j)
+    jsondata = json.dumps({"blobs": paths, "mask": j}, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    jsonoffset = MASKBIN_HEADER.size
+    tocoffset = alignUp(jsonoffset + len(jsondata))
+    tocsize = MASKBIN_TOC_ENTRY.size * len(blobs)
+    bloboffset = alignUp(tocoffset + tocsize)
+
+    toc = list()
+    offset = bloboffset
+    for data, flags in blobs:
+        toc.append(MASKBIN_TOC_ENTRY.pack(offset, len(data), flags, 0))
+        offset = alignUp(offset + len(data))
+
+    tmpfile = filename + ".tmp"
+    f = open(tmpfile, "wb")
+    try:
+        f.write(MASKBIN_HEADER.pack(MASKBIN_MAGIC, MASKBIN_VERSION, len(blobs),
+                                    jsonoffset, len(jsondata),
+                                    tocoffset, tocsize,
+                                    bloboffset, offset - bloboffset))
+        f.write(jsondata)
+        f.write(b"\0" * (tocoffset - jsonoffset - len(jsondata)))
+        f.write(b"".join(toc))
+        f.write(b"\0" * (bloboffset - tocoffset - tocsize))
+        for data, flags in blobs:
+            f.write(data)
+            f.write(b"\0" * (alignUp(len(data)) - len(data)))
+    finally:
+        f.close()
+    os.replace(tmpfile, filename)
+
+
+# --------------------------------------------------
+# reading
+# --------------------------------------------------
+
+class MaskBinFile(object):
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            self.file.close()
+            raise ValueError(filename + " is not a binary mask file")
+        self.view = memoryview(self.map)
+
+        if len(self.view) < MASKBIN_HEADER.size:
+            self.close()
+            raise ValueError(filename + " is not a binary mask file")
+        hdr = MASKBIN_HEADER.unpack_from(self.view, 0)
+        if hdr[0] != MASKBIN_MAGIC:
+            self.close()
+            raise ValueError(filename + " is not a binary mask file")
+        if hdr[1] > MASKBIN_VERSION:
+            self.close()
+            raise ValueError(filename + " is version " + str(hdr[1]))
+        count = hdr[2]
+        jsonoffset, jsonsize = hdr[3], hdr[4]
+        tocoffset = hdr[5]
+
+        j = json.loads(bytes(self.view[jsonoffset:jsonoffset + jsonsize]).decode("utf-8"))
+        self.json = j["mask"]
+        self.paths = j["blobs"]
+        self.toc = list()
+        for i in range(count):
+            self.toc.append(MASKBIN_TOC_ENTRY.unpack_from(self.view, tocoffset + i * MASKBIN_TOC_ENTRY.size))
+
+    # Blobs from getBlob() must be released first, or the file stays
+    # mapped until they're garbage collected
+    #
+    def close(self):
+        if self.map is not None:
+            try:
+                self.view.release()
+                self.map.close()
+            except BufferError:
+                pass
+            self.file.close()
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getBlobCount(self):
+        return len(self.toc)
+
+    def getBlobFlags(self, index):
+        return self.toc[index][2]
+
+    # The stored bytes of a blob, without copying
+    # - for BLOB_VERBATIM blobs that's still zlib'd, use getBlobData
+    #
+    def getBlob(self, index):
+        offset, size, flags, pad = self.toc[index]
+        return self.view[offset:offset + size]
+
+    # The raw data of a blob
+    def getBlobData(self, index):
+        blob = self.getBlob(index)
+        if self.getBlobFlags(index) == BLOB_VERBATIM:
+            return zlib.decompress(bytes(blob[:-8]))
+        return blob
+
+    # Blob of a resource, like getResourceBlob("mesh0", "vertex-buffer")
+    # - returns None if there isn't one
+    #
+    def getResourceBlob(self, resname, key):
+        res = self.json.get("resources", dict()).get(resname)
+        if not isinstance(res, dict) or not isinstance(res.get(key), int):
+            return None
+        return self.getBlobData(res[key])
+
+    # The mask json, as it was before it was written
+    def toJson(self):
+        j = json.loads(json.dumps(self.json))
+        for i, path in enumerate(self.paths):
+            o = j
+            for k in path[:-1]:
+                o = o[k]
+            o[path[-1]] = encodeBlob(self.getBlob(i), self.getBlobFlags(i))
+        return j
+
+
+def readMaskBin(filename):
+    f = MaskBinFile(filename)
+    try:
+        return f.toJson()
+    finally:
+        f.close()
+
+
+# ==============================================================================
+# CONVERTING
+# ==============================================================================
+
+def convertJsonToMaskBin(jsonfile, binfile=None):
+    if binfile is None:
+        binfile = maskBinFromJson(jsonfile)
+    writeMaskBin(load_mask_json(jsonfile), binfile)
+    return binfile
+
+
+def convertMaskBinToJson(binfile, jsonfile):
+    write_mask_json(jsonfile, readMaskBin(binfile))
+    return jsonfile
+
+
+# Converts a json to binary and back
+# - returns True if it comes back exactly the same
+#
+def checkMaskBinRoundTrip(jsonfile, binfile):
+    convertJsonToMaskBin(jsonfile, binfile)
+    original = dump_mask_json(load_mask_json(jsonfile))
+    return dump_mask_json(readMaskBin(binfile)) == original
+
+
+# Builds the binary version of a mask json if it's out of date
+# - returns the binary file name
+#
+def packageMaskBin(jsonfile):
+    binfile = maskBinFromJson(jsonfile)
+    if os.path.exists(binfile) and os.path.getmtime(binfile) >= os.path.getmtime(jsonfile):
+        return binfile
+    return convertJsonToMaskBin(jsonfile, binfile)
+
+
+# python -m arttool.maskbin [--check] file.json ...
+#
+if __name__ == "__main__":
+    check = "--check" in sys.argv[1:]
+    failed = False
+    for jsonfile in sys.argv[1:]:
+        if jsonfile == "--check":
+            continue
+        binfile = maskBinFromJson(jsonfile)
+        if check:
+            ok = checkMaskBinRoundTrip(jsonfile, binfile)
+            failed = failed or not ok
+            print(("OK     " if ok else "FAILED ") + jsonfile)
+        else:
+            convertJsonToMaskBin(jsonfile, binfile)
+            print(jsonfile, os.path.getsize(jsonfile), "->", binfile, os.path.getsize(binfile))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,341 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, re, sys, json, base64, struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .maskjson import ZLIB_HEADER
+from .maskbin import isBlobKey
+
+
+# ==============================================================================
+# STREAMING JSON
+#
+# Reads json a chunk at a time and yields events for it, without ever having
+# more than a chunk in memory. Long strings (the base64 buffers) are only
+# measured: we keep their length and a few bytes from each end, which is
+# enough to tell if they're zlib'd and how big they are decoded.
+#
+# Events are (event, path, value, offset), path being the tuple of keys and
+# array indexes to the value:
+#   ("start_map" | "start_array", path, None, offset of the bracket)
+#   ("end_map" | "end_array", path, None, offset just past the bracket)
+#   ("string", path, JsonString, offset of the quote)
+#   ("number" | "boolean" | "null", path, value, offset)
+# ==============================================================================
+
+SCAN_CHUNK_SIZE = 64 * 1024
+STRING_KEEP = 256
+STRING_END = 16
+
+RE_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+RE_STRING_STOP = re.compile(rb'["\\]')
+RE_SCALAR = re.compile(rb"-?[0-9][0-9.eE+\-]*|true|false|null")
+
+
+class JsonString(object):
+
+    __slots__ = ("length", "head", "tail", "raw")
+
+    def __init__(self):
+        self.length = 0
+        self.head = b""
+        self.tail = b""
+        self.raw = b""
+
+    def add(self, seg):
+        self.length += len(seg)
+        if len(self.head) < STRING_END:
+            self.head = (self.head + seg[:STRING_END])[:STRING_END]
+        self.tail = (self.tail + seg[-STRING_END:])[-STRING_END:]
+        if self.raw is not None:
+            self.raw += seg
+            if len(self.raw) > STRING_KEEP:
+                self.raw = None
+
+    # the string, or None if it was too long to keep
+    def text(self):
+        if self.raw is None:
+            return None
+        return json.loads(b'"' + self.raw + b'"')
+
+
+class JsonStream(object):
+
+    def __init__(self, f, chunksize=SCAN_CHUNK_SIZE):
+        self.f = f
+        self.chunksize = chunksize
+        self.buf = b""
+        self.pos = 0
+        self.base = 0
+        self.eof = False
+
+    def offset(self):
+        return self.base + self.pos
+
+    # makes sure there are n bytes past pos, unless we're at the end
+    def fill(self, n):
+        while len(self.buf) - self.pos < n and not self.eof:
+            data = self.f.read(self.chunksize)
+            if len(data) == 0:
+                self.eof = True
+            self.base += self.pos
+            self.buf = self.buf[self.pos:] + data
+            self.pos = 0
+
+    def peek(self):
+        while True:
+            self.fill(1)
+            self.pos = RE_WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+
+    def skip(self):
+        self.pos += 1
+
+    def readString(self):
+        s = JsonString()
+        self.pos += 1
+        while True:
+            self.fill(2)
+            m = RE_STRING_STOP.search(self.buf, self.pos)
+            if m is None:
+                if self.eof:
+                    raise ValueError("unterminated string at " + str(self.offset()))
+                s.add(self.buf[self.pos:])
+                self.pos = len(self.buf)
+                continue
+            if self.buf[m.start():m.start() + 1] == b'"':
+                s.add(self.buf[self.pos:m.start()])
+                self.pos = m.end()
+                return s
+            # escape, take it and the next char
+            self.fill(m.start() - self.pos + 2)
+            m = RE_STRING_STOP.search(self.buf, self.pos)
+            s.add(self.buf[self.pos:m.start() + 2])
+            self.pos = m.start() + 2
+
+    def readScalar(self):
+        self.fill(64)
+        m = RE_SCALAR.match(self.buf, self.pos)
+        if m is None:
+            raise ValueError("bad json at " + str(self.offset()))
+        self.pos = m.end()
+        return json.loads(m.group(0))
+
+
+def iterJsonEvents(f):
+    s = JsonStream(f)
+    # [is_object, key or index, expecting a key]
+    stack = list()
+
+    def path():
+        return tuple(frame[1] for frame in stack)
+
+    while True:
+        c = s.peek()
+        if c == b"":
+            break
+        offset = s.offset()
+        if c == b"{" or c == b"[":
+            s.skip()
+            isobj = c == b"{"
+            yield ("start_map" if isobj else "start_array"), path(), None, offset
+            stack.append([isobj, None if isobj else 0, isobj])
+        elif c == b"}" or c == b"]":
+            s.skip()
+            frame = stack.pop()
+            yield ("end_map" if frame[0] else "end_array"), path(), None, s.offset()
+        elif c == b",":
+            s.skip()
+            frame = stack[-1]
+            if frame[0]:
+                frame[2] = True
+            else:
+                frame[1] += 1
+        elif c == b":":
+            s.skip()
+        elif c == b'"':
+            st = s.readString()
+            if len(stack) > 0 and stack[-1][0] and stack[-1][2]:
+                stack[-1][1] = st.text()
+                stack[-1][2] = False
+            else:
+                yield "string", path(), st, offset
+        else:
+            v = s.readScalar()
+            if v is None:
+                yield "null", path(), v, offset
+            elif type(v) is bool:
+                yield "boolean", path(), v, offset
+            else:
+                yield "number", path(), v, offset
+
+
+# ==============================================================================
+# MASK INSPECTOR
+#
+# Where the bytes in a mask json go. For each resource we get its size in the
+# json and, for each buffer in it, the base64 size, the decoded (usually
+# zlib'd) size and the size of the data once it's uncompressed.
+# ==============================================================================
+
+# (decoded size, uncompressed size) of a base64 buffer
+def getBlobSizes(st):
+    padding = len(st.tail) - len(st.tail.rstrip(b"="))
+    decoded = (st.length // 4) * 3 - padding
+    try:
+        head = base64.b64decode(st.head[:4])
+    except ValueError:
+        return decoded, decoded
+    if head[:2] != ZLIB_HEADER or decoded < 10:
+        return decoded, decoded
+    tail = base64.b64decode(st.tail)
+    return decoded, struct.unpack("<Q", tail[-8:])[0]
+
+
+def newBlobSizes():
+    return [0, 0, 0, 0]
+
+
+# Inspects a mask json
+# - returns {"file", "bytes", "resources": [{"name", "type", "bytes",
+#            "blobs": {key: [count, base64, compressed, uncompressed]}}]}
+#
+def inspectMaskFile(filename):
+    resources = list()
+    res = None
+    f = open(filename, "rb")
+    try:
+        for event, path, value, offset in iterJsonEvents(f):
+            if len(path) == 2 and path[0] == "resources":
+                if event in ["start_map", "start_array"]:
+                    res = {"name": path[1], "type": "", "bytes": offset, "blobs": dict()}
+                elif event in ["end_map", "end_array"]:
+                    res["bytes"] = offset - res["bytes"]
+                    resources.append(res)
+                    res = None
+            elif event == "string" and res is not None and len(path) >= 3:
+                if len(path) == 3 and path[2] == "type":
+                    res["type"] = value.text()
+                elif isBlobKey(str(path[-1])):
+                    decoded, uncompressed = getBlobSizes(value)
+                    sizes = res["blobs"].setdefault(path[-1], newBlobSizes())
+                    sizes[0] += 1
+                    sizes[1] += value.length
+                    sizes[2] += decoded
+                    sizes[3] += uncompressed
+        size = f.tell()
+    finally:
+        f.close()
+    return {"file": filename, "bytes": size, "resources": resources}
+
+
+# Inspects a bunch of files in parallel
+# - returns the reports, in the same order
+#
+def inspectMaskFiles(files, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(files) <= 1:
+        return [inspectMaskFile(f) for f in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(inspectMaskFile, files, chunksize=1))
+
+
+# Totals by resource type and buffer
+# - returns {type: {"count", "bytes", "blobs": {key: [count, base64, compressed, uncompressed]}}}
+#
+def getInspectTotals(reports):
+    totals = dict()
+    for report in reports:
+        for res in report["resources"]:
+            t = totals.setdefault(res["type"], {"count": 0, "bytes": 0, "blobs": dict()})
+            t["count"] += 1
+            t["bytes"] += res["bytes"]
+            for k, sizes in res["blobs"].items():
+                tsizes = t["blobs"].setdefault(k, newBlobSizes())
+                for i in range(len(sizes)):
+                    tsizes[i] += sizes[i]
+    return totals
+
+
+def blobSortKey(k):
+    # mip-data-10 after mip-data-9
+    if k.startswith("mip-data-"):
+        return ("mip-data-", int(k[9:]) if k[9:].isdigit() else 0)
+    return (k, 0)
+
+
+def getInspectReportLines(reports, perResource=True):
+    lines = list()
+    if perResource:
+        for report in reports:
+            lines.append(report["file"] + " : " + str(report["bytes"]) + " bytes")
+            for res in sorted(report["resources"], key=lambda r: -r["bytes"]):
+                compressed = sum(s[2] for s in res["blobs"].values())
+                uncompressed = sum(s[3] for s in res["blobs"].values())
+                lines.append("  %-40s %-14s %10d json %10d compressed %10d decoded" %
+                             (res["name"][:40], res["type"], res["bytes"], compressed, uncompressed))
+            lines.append("")
+
+    totals = getInspectTotals(reports)
+    lines.append("TOTALS : %d files, %d bytes" % (len(reports), sum(r["bytes"] for r in reports)))
+    for tp in sorted(totals, key=lambda t: -totals[t]["bytes"]):
+        t = totals[tp]
+        lines.append("  %-20s %6d resources %12d json" % (tp, t["count"], t["bytes"]))
+        for k in sorted(t["blobs"], key=blobSortKey):
+            count, b64, compressed, uncompressed = t["blobs"][k]
+            lines.append("    %-18s %6d buffers %12d base64 %12d compressed %12d decoded" %
+                         (k, count, b64, compressed, uncompressed))
+    return lines
+
+
+def findMaskJsonFiles(paths):
+    files = list()
+    for p in paths:
+        if os.path.isdir(p):
+            for root, subdirs, names in os.walk(p):
+                subdirs[:] = [d for d in subdirs if d not in [".art", ".svn"]]
+                for name in names:
+                    if name.lower().endswith(".json"):
+                        files.append(os.path.join(root, name))
+        else:
+            files.append(p)
+    return files
+
+
+# python -m arttool.maskinspect [--totals] [--json] [-jN] file.json|folder ...
+#
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("-")]
+    opts = [a for a in sys.argv[1:] if a.startswith("-")]
+    workers = None
+    for o in opts:
+        if o.startswith("-j"):
+            workers = int(o[2:])
+    reports = inspectMaskFiles(findMaskJsonFiles(args), workers)
+    if "--json" in opts:
+        print(json.dumps({"files": reports, "totals": getInspectTotals(reports)}, indent=4))
+    else:
+        for line in getInspectReportLines(reports, "--totals" not in opts):
+            print(line)
@@ -0,0 +1,800 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, re, json, math, time, zlib, base64, struct, hashlib
+
+
+# ==============================================================================
+# MASK JSON FILES
+#
+# Reads and writes mask json exactly the way maskmaker does. maskmaker keeps
+# keys in insertion order, indents by 4 and writes floats with %.15g, which
+# is what json.dumps gives us for any float that went through mm_float().
+# ==============================================================================
+
+def load_mask_json(jsonfile):
+    f = open(jsonfile, "r", encoding="utf-8")
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+
+def dump_mask_json(j):
+    return json.dumps(j, indent=4, ensure_ascii=False) + "\n"
+
+
+def write_mask_json(jsonfile, j):
+    tmpfile = jsonfile + ".tmp"
+    f = open(tmpfile, "w", encoding="utf-8", newline="\n")
+    try:
+        f.write(dump_mask_json(j))
+    finally:
+        f.close()
+    os.replace(tmpfile, jsonfile)
+
+
+# ==============================================================================
+# BASE64 + ZLIB BLOBS
+#
+# Buffers in mask json are zlib compressed, followed by the uncompressed size
+# as a 64 bit little endian integer, then base64 encoded. Blobs that don't
+# start with the zlib header are plain base64.
+# ==============================================================================
+
+ZLIB_HEADER = b"\x78\x9c"
+
+
+# The plugin only inflates blobs that start with ZLIB_HEADER. The level in
+# the header is just a hint, so other levels get the default one.
+#
+def base64_encodeZ(data, level=-1):
+    z = ZLIB_HEADER + zlib.compress(data, level)[2:]
+    return base64.b64encode(z + struct.pack("<Q", len(data))).decode("ascii")
+
+
+def base64_decodeZ(s):
+    data = base64.b64decode(s)
+    if data[:2] != ZLIB_HEADER:
+        return data
+    return zlib.decompress(data[:-8])
+
+
+def zlib_size(s):
+    data = base64.b64decode(s)
+    if data[:2] != ZLIB_HEADER:
+        return 0
+    return struct.unpack("<Q", data[-8:])[0]
+
+
+# ==============================================================================
+# C STYLE VALUES
+#
+# maskmaker gets all its values as strings on the command line and converts
+# them with atoi/atof. These do the same so we end up with the same json.
+# ==============================================================================
+
+RE_C_INT = re.compile(r"\s*[+-]?\d+")
+RE_C_FLOAT = re.compile(r"\s*[+-]?((\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|inf(inity)?|nan)", re.IGNORECASE)
+
+DEFAULT_RESOURCES = ["imageNull", "imageWhite", "imageBlack", "imageRed", "imageGreen",
+                     "imageBlue", "imageYellow", "imageMagenta", "imageCyan",
+                     "meshTriangle", "meshQuad", "meshCube", "meshSphere", "meshCylinder",
+                     "meshPyramid", "meshTorus", "meshCone", "meshHead",
+                     "effectDefault", "effectPhong"]
+
+
+# a float as it comes out of maskmaker's json writer, which writes
+# inf and nan as null
+def mm_float(v):
+    if math.isinf(v) or math.isnan(v):
+        return None
+    return float("%.15g" % v)
+
+
+# float32, like maskmaker's floatValue()
+def mm_float32(v):
+    try:
+        v = struct.unpack("<f", struct.pack("<f", v))[0]
+    except OverflowError:
+        v = math.copysign(float("inf"), v)
+    return mm_float(v)
+
+
+def c_atoi(s):
+    m = RE_C_INT.match(s)
+    if m is None:
+        return 0
+    v = int(m.group(0))
+    # 32 bit int
+    return max(-2147483648, min(2147483647, v))
+
+
+def c_atof(s):
+    m = RE_C_FLOAT.match(s)
+    if m is None:
+        return 0.0
+    return float(m.group(0))
+
+
+# whole string parses, like checking strtol's end pointer
+def c_is_int(s):
+    return s == "" or RE_C_INT.fullmatch(s) is not None
+
+
+def c_is_float(s):
+    return s == "" or RE_C_FLOAT.fullmatch(s) is not None
+
+
+# std::getline split, which drops a trailing empty item
+def c_split(s, delim):
+    bits = s.split(delim)
+    if len(bits) > 0 and bits[-1] == "":
+        bits = bits[:-1]
+    return bits
+
+
+# the value maskmaker sees for a kvpair we'd put on the command line
+def mm_arg(v):
+    v = str(v)
+    if "=" in v:
+        v = v.split("=")[0]
+    return v
+
+
+# ==============================================================================
+# MASKMAKER COMMANDS
+#
+# In process versions of "maskmaker addres", "addpart" and "tweak". They take
+# the same kvpairs as maskmaker() in additions.py, change the json in place,
+# and return the lines maskmaker would have printed. Like maskmaker, a step
+# that fails a check prints why and leaves the json alone.
+# ==============================================================================
+
+class MaskMakerArgs(object):
+
+    def __init__(self, command, j, kvpairs, filename=""):
+        self.command = command
+        self.j = j
+        self.filename = filename
+        self.kvpairs = dict()
+        for k, v in kvpairs.items():
+            self.kvpairs[str(k)] = mm_arg(v)
+
+    def default_value(self, key):
+        if self.command in ["create", "merge"]:
+            defaults = {"description": "Streamlabs facemask description",
+                        "author": "Streamlabs",
+                        "license": "Copyright 2017 - General Workings Inc. - All rights reserved.",
+                        "website": "http://streamlabs.com/",
+                        "version": "1",
+                        "tier": "1",
+                        "texture_max": "256",
+                        "is_intro": "false",
+                        "intro_fade_time": "0.3333",
+                        "intro_duration": "2.1333"}
+            if key in defaults:
+                return defaults[key]
+            if key == "name":
+                return get_filename(self.filename)
+            if key == "modtime":
+                return str(int(time.time()))
+        if self.command == "addres":
+            defaults = {"filter": "min-mag-linear-mip-point",
+                        "technique": "Draw",
+                        "mode": "repeat",
+                        "rate": "4",
+                        "u-wrap": "clamp",
+                        "v-wrap": "clamp",
+                        "w-wrap": "clamp",
+                        "culling": "back",
+                        "depth-test": "less",
+                        "depth-only": "false",
+                        "lifetime": "3",
+                        "friction": "0.9",
+                        "force": "0,100,0",
+                        "initial-velocity": "0,0,5000",
+                        "num-particles": "1000",
+                        "random-start": "false",
+                        "part": "emitter1",
+                        "scale-start": "1.0",
+                        "scale-end": "1.0",
+                        "alpha-start": "1.0",
+                        "alpha-end": "1.0",
+                        "delay": "0.0",
+                        "opaque": "true",
+                        "world-space": "true",
+                        "inverse-rate": "false",
+                        "z-sort-offset": "0",
+                        "alpha-write": "true"}
+            if key in defaults:
+                return defaults[key]
+            finds = {"texture": "image", "effect": "effect", "material": "material",
+                     "mesh": "mesh", "model": "model"}
+            if key in finds:
+                return find_resource(self.j, finds[key])
+        elif self.command == "addpart":
+            defaults = {"parent": "root",
+                        "position": "0,0,0",
+                        "rotation": "0,0,0",
+                        "scale": "1,1,1",
+                        "type": "model"}
+            if key in defaults:
+                return defaults[key]
+            if key in ["model", "sound"]:
+                return find_resource(self.j, key)
+        return ""
+
+    def have_value(self, key):
+        return key in self.kvpairs
+
+    def value(self, key):
+        if key in self.kvpairs:
+            return self.kvpairs[key]
+        return self.default_value(key)
+
+    def float_value(self, key):
+        return mm_float32(c_atof(self.value(key)))
+
+    def int_value(self, key):
+        return c_atoi(self.value(key))
+
+    def longlong_value(self, key):
+        m = RE_C_INT.match(self.value(key))
+        if m is None:
+            return 0
+        return int(m.group(0))
+
+    def bool_value(self, key):
+        return self.value(key) in ["true", "True", "TRUE", "yes", "Yes", "YES", "1"]
+
+    def make_number_array(self, v, isfloat, sidx=0):
+        o = dict()
+        k = "x"
+        for val in c_split(v, ",")[sidx:]:
+            if isfloat:
+                o[k] = mm_float32(c_atof(val))
+            else:
+                o[k] = c_atoi(val)
+            if k == "z":
+                k = "w"
+            elif k == "w":
+                k = "a"
+            else:
+                k = chr(ord(k) + 1)
+        if len(o) == 0:
+            return None
+        return o
+
+    def make_float_array(self, v, sidx=0):
+        return self.make_number_array(v, True, sidx)
+
+    def unique_resource_name(self, name, restype):
+        count = 1
+        while len(name) == 0:
+            name = restype + str(count)
+            if resource_exists(self.j, name, restype):
+                count += 1
+                name = ""
+        return name
+
+
+def find_resource(j, restype):
+    for k, v in j.get("resources", dict()).items():
+        if isinstance(v, dict) and v.get("type") == restype:
+            return k
+    return ""
+
+
+def resource_exists(j, name, restype=None):
+    res = j.get("resources", dict())
+    if name in res:
+        if restype is None:
+            return True
+        if isinstance(res[name], dict) and res[name].get("type") == restype:
+            return True
+    return name in DEFAULT_RESOURCES
+
+
+def part_exists(j, name):
+    return name in j.get("parts", dict())
+
+
+def get_filename(filename):
+    f = c_split(filename, "\\")[-1]
+    return c_split(f, ".")[0]
+
+
+def mm_material_params(args, out):
+    MAT_PARAMS = ["name", "type", "effect", "technique", "u-wrap", "v-wrap", "w-wrap",
+                  "culling", "depth-test", "depth-only", "filter", "opaque", "alpha-write"]
+    params = dict()
+    for k in sorted(args.kvpairs):
+        if k in MAT_PARAMS:
+            continue
+        v = args.kvpairs[k]
+        bits = c_split(v, ",")
+        if len(bits) < 2:
+            out.append("Malformed material parameter '" + k + "'. skipping.")
+            continue
+        parm = {"type": bits[0]}
+        if bits[0] == "texture":
+            if not resource_exists(args.j, bits[1], "image"):
+                out.append("Cannot find image '" + bits[1] + "'. skipping.")
+                continue
+            parm["value"] = bits[1]
+        elif bits[0] == "sequence":
+            if not resource_exists(args.j, bits[1], "sequence"):
+                out.append("Cannot find sequence '" + bits[1] + "'. skipping.")
+                continue
+            parm["value"] = bits[1]
+        elif "float" in bits[0]:
+            parm["value"] = args.make_float_array(v, 1)
+        elif "int" in bits[0]:
+            parm["value"] = args.make_number_array(v, False, 1)
+        elif bits[0] == "matrix":
+            out.append("matrix param types don't quite work yet.")
+            parm["value"] = args.make_float_array(v, 1)
+        params[k] = parm
+    return params
+
+
+def mm_addres(j, kvpairs):
+    out = list()
+    args = MaskMakerArgs("addres", j, kvpairs)
+    restype = args.value("type")
+    name = args.value("name")
+    resources = j.setdefault("resources", dict())
+
+    if restype == "material":
+        effect = args.value("effect")
+        if len(effect) == 0:
+            out.append("You must specify an effect for a material resource.")
+            return out
+        if not resource_exists(j, effect, "effect"):
+            out.append("Cannot find effect " + effect + ".")
+            return out
+        params = mm_material_params(args, out)
+        o = {"type": "material",
+             "effect": effect,
+             "technique": args.value("technique"),
+             "u-wrap": args.value("u-wrap"),
+             "v-wrap": args.value("v-wrap"),
+             "w-wrap": args.value("w-wrap"),
+             "culling": args.value("culling"),
+             "alpha-write": args.bool_value("alpha-write"),
+             "depth-test": args.value("depth-test"),
+             "depth-only": args.bool_value("depth-only"),
+             "filter": args.value("filter"),
+             "opaque": args.bool_value("opaque"),
+             "parameters": params if len(params) > 0 else None}
+        name = args.unique_resource_name(name, restype)
+
+    elif restype == "emitter":
+        model = args.value("model")
+        if len(model) == 0:
+            out.append("You must specify an model for a emitter resource.")
+            return out
+        if not resource_exists(j, model, "model"):
+            out.append("Cannot find model " + model + ".")
+            return out
+        name = args.unique_resource_name(name, restype)
+
+        # hook the emitter up to its part
+        partname = args.value("part")
+        parts = j.setdefault("parts", None)
+        if isinstance(parts, dict) and partname in parts:
+            part = parts[partname]
+            res = part.get("resources")
+            if not isinstance(res, dict):
+                res = dict()
+            idx = 0
+            while str(idx) in res:
+                idx += 1
+            res[str(idx)] = name
+            part["resources"] = res
+
+        o = {"type": restype,
+             "model": model,
+             "lifetime": args.float_value("lifetime"),
+             "scale-start": args.float_value("scale-start"),
+             "scale-end": args.float_value("scale-end"),
+             "alpha-start": args.float_value("alpha-start"),
+             "alpha-end": args.float_value("alpha-end"),
+             "num-particles": args.int_value("num-particles"),
+             "world-space": args.bool_value("world-space"),
+             "inverse-rate": args.bool_value("inverse-rate"),
+             "z-sort-offset": args.float_value("z-sort-offset")}
+        for k in ["rate", "friction"]:
+            if args.have_value(k + "-min") and args.have_value(k + "-max"):
+                o[k + "-min"] = args.float_value(k + "-min")
+                o[k + "-max"] = args.float_value(k + "-max")
+            else:
+                o[k] = args.float_value(k)
+        for k in ["force", "initial-velocity"]:
+            if args.have_value(k + "-min") and args.have_value(k + "-max"):
+                o[k + "-min"] = args.make_float_array(args.value(k + "-min"))
+                o[k + "-max"] = args.make_float_array(args.value(k + "-max"))
+            else:
+                o[k] = args.make_float_array(args.value(k))
+
+    elif restype == "sequence":
+        image = args.value("image")
+        if len(image) == 0:
+            out.append("You must specify an image for a sequence resource.")
+            return out
+        if not resource_exists(j, image, "image"):
+            out.append("Cannot find image " + image + ".")
+            return out
+        name = args.unique_resource_name(name, restype)
+
+        # everything using the image now uses the sequence
+        for k, r in resources.items():
+            if isinstance(r, dict) and r.get("type") == "material":
+                params = r.setdefault("parameters", None)
+                if not isinstance(params, dict):
+                    continue
+                for pk, p in params.items():
+                    if p.get("type") == "texture" and p.get("value") == image:
+                        p["type"] = "sequence"
+                        p["value"] = name
+
+        o = {"type": restype,
+             "image": image,
+             "rows": args.int_value("rows"),
+             "cols": args.int_value("cols"),
+             "first": args.int_value("first"),
+             "last": args.int_value("last"),
+             "rate": args.float_value("rate"),
+             "delay": args.float_value("delay"),
+             "mode": args.value("mode"),
+             "random-start": args.bool_value("random-start")}
+        # atlas frames, "u0,v0,u1,v1" each
+        i = 0
+        while args.have_value("frame-" + str(i)):
+            o["frame-" + str(i)] = args.make_float_array(args.value("frame-" + str(i)))
+            i += 1
+
+    elif restype == "model":
+        mesh = args.value("mesh")
+        material = args.value("material")
+        if not resource_exists(j, mesh, "mesh"):
+            out.append("Cannot find mesh " + mesh + ".")
+            return out
+        if not resource_exists(j, material, "material"):
+            out.append("Cannot find material " + material + ".")
+            return out
+        o = {"type": restype,
+             "mesh": mesh,
+             "material": material}
+        name = args.unique_resource_name(name, restype)
+
+    else:
+        resfile = args.value("file")
+        if len(resfile) == 0:
+            out.append("You must specify a file with addres.")
+            return out
+        o = None
+        filetype = restype
+        try:
+            f = open(resfile, "rb")
+            data = f.read()
+            f.close()
+        except OSError:
+            out.append("Can't load the specified resource file: " + resfile)
+        else:
+            if len(filetype) < 1:
+                filetype = get_resource_type(resfile)
+            o = {"type": filetype,
+                 "data": base64_encodeZ(data)}
+        if len(name) == 0:
+            name = get_filename(resfile)
+
+    resources[name] = o
+    out.append("Added " + restype + " resource " + name)
+    return out
+
+
+def get_resource_type(filename):
+    ext = c_split(filename, ".")[-1].lower()
+    types = {"png": "image", "jpg": "image", "obj": "mesh", "wav": "sound",
+             "aiff": "sound", "mp3": "sound", "effect": "effect"}
+    return types.get(ext, "binary")
+
+
+def mm_addpart(j, kvpairs):
+    out = list()
+    args = MaskMakerArgs("addpart", j, kvpairs)
+    name = args.value("name")
+    parent = args.value("parent")
+    position = args.make_float_array(args.value("position"))
+    rotation = args.make_float_array(args.value("rotation"))
+    scale = args.make_float_array(args.value("scale"))
+    resource = args.value("resource")
+
+    if len(resource) > 0 and not resource_exists(j, resource):
+        out.append("Cannot find resource " + resource + ".")
+        return out
+
+    count = 1
+    while len(name) == 0:
+        name = "part" + str(count)
+        if part_exists(j, name):
+            count += 1
+            name = ""
+
+    o = {"parent": parent,
+         "position": position,
+         "rotation": rotation,
+         "scale": scale}
+    if len(resource) > 0:
+        o["resource"] = resource
+    j.setdefault("parts", dict())[name] = o
+
+    out.append("Added part: " + name)
+    return out
+
+
+def mm_tweak_value(v):
+    if c_is_int(v):
+        return c_atoi(v)
+    if c_is_float(v):
+        return mm_float(c_atof(v))
+    if v in ["true", "True", "TRUE"]:
+        return True
+    if v in ["false", "False", "FALSE"]:
+        return False
+    bits = c_split(v, ",")
+    if len(bits) > 1:
+        o = dict()
+        for k, b in zip(["x", "y", "z", "w"], bits):
+            o[k] = mm_float(c_atof(b))
+        return o
+    return v
+
+
+def mm_tweak(j, kvpairs):
+    out = list()
+    args = MaskMakerArgs("tweak", j, kvpairs)
+
+    # check every path first, maskmaker writes nothing if one is bad
+    for k in sorted(args.kvpairs):
+        path = c_split(k, ".")
+        o = j
+        for p in path[:-1]:
+            if o is None:
+                break
+            if not isinstance(o, dict):
+                raise ValueError("tweak " + k + " : " + p + " is not an object")
+            o = o.get(p)
+        if o is not None and not isinstance(o, dict):
+            raise ValueError("tweak " + k + " : not an object")
+
+    for k in sorted(args.kvpairs):
+        path = c_split(k, ".")
+        o = j
+        for p in path[:-1]:
+            if o.get(p) is None:
+                o[p] = dict()
+            o = o[p]
+        o[path[-1]] = mm_tweak_value(args.kvpairs[k])
+
+    out.append("Done!")
+    out.append("")
+    return out
+
+
+MASKMAKER_COMMANDS = {"addres": mm_addres,
+                      "addpart": mm_addpart,
+                      "tweak": mm_tweak}
+
+
+# ==============================================================================
+# MERGE
+#
+# "maskmaker merge" for combos. Component masks are read one at a time and
+# their resources and parts are added under a "<maskname>_" prefix, the same
+# names maskmaker gives them. Where two components would end up with the same
+# name the later one gets a "_2", "_3"... suffix instead of overwriting.
+# Resources that are only data (images, meshes...) and are identical to one
+# already in the combo aren't added again, references to them point at the
+# first copy.
+# ==============================================================================
+
+MERGE_CREATE_KEYS = ["name", "uuid", "tier", "description", "author", "tags", "category",
+                     "license", "website", "is_intro", "intro_fade_time", "intro_duration",
+                     "modtime"]
+MERGE_DEDUP_TYPES = ["image", "mesh", "effect", "sound", "binary"]
+FACEMASK_JSON_VERSION = 1
+
+
+def is_default_resource(name):
+    return name in DEFAULT_RESOURCES
+
+
+def add_no_dupe(items, a):
+    for s in items:
+        if s not in a:
+            a.append(s)
+
+
+def create_new_json(args):
+    j = dict()
+    for k in MERGE_CREATE_KEYS:
+        if k in ["intro_fade_time", "intro_duration"]:
+            j[k] = args.float_value(k)
+        elif k == "tier":
+            j[k] = args.int_value(k)
+        elif k == "modtime":
+            j[k] = args.longlong_value(k)
+        elif k == "is_intro":
+            j[k] = args.bool_value(k)
+        else:
+            j[k] = args.value(k)
+    j["version"] = FACEMASK_JSON_VERSION
+    j["resources"] = None
+    j["parts"] = None
+    return j
+
+
+class MaskMerger(object):
+
+    def __init__(self, kvpairs, outfile):
+        self.outfile = outfile
+        self.j = create_new_json(MaskMakerArgs("merge", None, kvpairs, outfile))
+        self.authors = list()
+        self.tags = list()
+        add_no_dupe(c_split(self.j["author"], ","), self.authors)
+        add_no_dupe(c_split(self.j["tags"], ","), self.tags)
+        # hash of a data resource -> its name in the combo
+        self.hashes = dict()
+
+    # name, or name_2, name_3... if it's in o or taken
+    def unique_name(self, o, taken, name):
+        if o is None:
+            o = dict()
+        uname = name
+        count = 2
+        while uname in o or uname in taken:
+            uname = name + "_" + str(count)
+            count += 1
+        return uname
+
+    def add_file(self, filename):
+        self.add(load_mask_json(filename), get_filename(filename.replace("/", "\\")))
+
+    def add(self, jm, maskname):
+        j = self.j
+        n = maskname + "_"
+        add_no_dupe(c_split(jm["author"], ","), self.authors)
+        add_no_dupe(c_split(jm["tags"], ","), self.tags)
+
+        res = jm.get("resources")
+        if not isinstance(res, dict):
+            res = dict()
+        pts = jm.get("parts")
+        if not isinstance(pts, dict):
+            pts = dict()
+
+        # new names for everything first, so references can be fixed in one go
+        rnames = dict()
+        taken = set()
+        dupes = set()
+        for k, v in res.items():
+            if k[:5] == "light" or k in ["depth_head_mat", "depth_head_mdl"]:
+                rnames[k] = k
+                continue
+            if isinstance(v, dict) and v.get("type") in MERGE_DEDUP_TYPES:
+                h = hashlib.sha1(json.dumps(v, ensure_ascii=False).encode("utf-8")).hexdigest()
+                if h in self.hashes:
+                    rnames[k] = self.hashes[h]
+                    dupes.add(k)
+                    continue
+            rk = self.unique_name(j["resources"], taken, n + k)
+            rnames[k] = rk
+            taken.add(rk)
+            if isinstance(v, dict) and v.get("type") in MERGE_DEDUP_TYPES:
+                self.hashes[h] = rk
+
+        pnames = dict()
+        taken = set()
+        for k in pts:
+            if "directionalLight" in k or "pointLight" in k or k == "depth_head":
+                continue
+            pk = self.unique_name(j["parts"], taken, n + k)
+            pnames[k] = pk
+            taken.add(pk)
+
+        def resname(r):
+            if is_default_resource(r):
+                return r
+            return rnames.get(r, n + r)
+
+        def partname(p):
+            return pnames.get(p, n + p)
+
+        def partres(r):
+            if r[:5] == "light" or r in ["depth_head_mat", "depth_head_mdl"]:
+                return r
+            return rnames.get(r, n + r)
+
+        # merge resources
+        if j["resources"] is None:
+            j["resources"] = dict()
+        for k, o in res.items():
+            if k in dupes:
+                continue
+            j["resources"][rnames[k]] = o
+            tp = o.get("type")
+            if tp == "model":
+                o["mesh"] = resname(o["mesh"])
+                if o["material"] != "depth_head_mat":
+                    o["material"] = resname(o["material"])
+            elif tp == "skinned-model":
+                o["material"] = resname(o["material"])
+                for b in (o.get("bones") or dict()).values():
+                    b["name"] = partname(b["name"])
+                for sk in (o.get("skins") or dict()).values():
+                    sk["mesh"] = resname(sk["mesh"])
+            elif tp == "emitter":
+                o["model"] = resname(o["model"])
+            elif tp == "sequence":
+                o["image"] = resname(o["image"])
+            elif tp == "material":
+                o["effect"] = resname(o["effect"])
+                for p in (o.get("parameters") or dict()).values():
+                    if p.get("type") in ["texture", "sequence"]:
+                        p["value"] = resname(p["value"])
+            elif tp == "animation":
+                for c in (o.get("channels") or dict()).values():
+                    c["name"] = partname(c["name"])
+
+        # merge parts
+        if j["parts"] is None:
+            j["parts"] = dict()
+        for k, o in pts.items():
+            j["parts"][pnames.get(k, k)] = o
+            parent = o.get("parent", "")
+            if len(parent) > 0 and parent not in ["root", "world", "depth_head"] and \
+                    "directionalLight" not in parent and "pointLight" not in parent:
+                o["parent"] = partname(parent)
+            if "resource" in o:
+                o["resource"] = partres(o["resource"])
+            elif "resources" in o:
+                for rk, r in o["resources"].items():
+                    o["resources"][rk] = partres(r)
+
+    def finish(self):
+        self.j["author"] = ",".join(self.authors)
+        self.j["tags"] = ",".join(self.tags)
+        return self.j
+
+
+# Merges mask json files into a combo
+# - returns the lines maskmaker would print
+#
+def merge_masks(files, kvpairs, outfile):
+    merger = MaskMerger(kvpairs, outfile)
+    for f in files:
+        merger.add_file(f)
+    write_mask_json(outfile, merger.finish())
+    return ["Merged all files into " + outfile]
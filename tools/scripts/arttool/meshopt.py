@@ -0,0 +1,556 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, math, struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .maskjson import load_mask_json, write_mask_json, base64_encodeZ, base64_decodeZ
+
+
+# ==============================================================================
+# VERTEX BUFFERS
+#
+# A mesh's vertex-buffer is the memory image of a gs_vb_data, as written by
+# GSVertexBuffer::get_data in maskmaker's command_import.cpp, with offsets
+# from the start of the buffer in place of the pointers:
+#
+#   gs_vb_data  num, points, normals, tangents, colors, num_tex, tvarray
+#               (7 x u64)
+#   points      num x vec3 (4 floats, w unused)
+#   normals     num x vec3
+#   tangents    num x vec3
+#   colors      num x u32
+#   tvarray     num_tex x (u64 width, u64 offset)
+#   uv layers   num_tex x num x width floats
+#
+# Everything starts on a 16 byte boundary. The index-buffer is u32s, three to
+# a triangle. The plugin loads these as is, so the layout has to stay the
+# same: we can only change which vertices there are and what's in them.
+#
+# Here a vertex buffer is decoded into a (num, lanes) u32 array with a row for
+# each vertex: point, normal, tangent, color, then each uv layer.
+# ==============================================================================
+
+VB_HEADER = struct.Struct("<QQQQQQQ")
+VB_TVARRAY = struct.Struct("<QQ")
+VB_ALIGN = 16
+VB_MAX_LAYERS = 8
+
+COL_POINT = 0
+COL_NORMAL = 4
+COL_TANGENT = 8
+COL_COLOR = 12
+COL_UV = 13
+
+
+def alignVB(n):
+    return (n + VB_ALIGN - 1) & ~(VB_ALIGN - 1)
+
+
+# Column of each uv layer in a vertex row
+# - returns (columns, number of lanes)
+#
+def getVertexLayout(widths):
+    cols = list()
+    c = COL_UV
+    for w in widths:
+        cols.append(c)
+        c += w
+    return cols, c
+
+
+# - returns (rows, uv layer widths)
+# - raises ValueError on a bad or old style buffer
+#
+def decodeVertexBuffer(data):
+    if len(data) < VB_HEADER.size:
+        raise ValueError("vertex buffer is too small")
+    num, points, normals, tangents, colors, numtex, tvarray = VB_HEADER.unpack_from(data, 0)
+    if numtex > VB_MAX_LAYERS:
+        raise ValueError("vertex buffer is old format")
+    layers = list()
+    for i in range(numtex):
+        layers.append(VB_TVARRAY.unpack_from(data, tvarray + i * VB_TVARRAY.size))
+    widths = [w for w, off in layers]
+    cols, lanes = getVertexLayout(widths)
+
+    def take(offset, width):
+        return np.frombuffer(data, np.uint32, num * width, offset).reshape(num, width)
+
+    rows = np.empty((num, lanes), np.uint32)
+    rows[:, COL_POINT:COL_POINT + 4] = take(points, 4)
+    rows[:, COL_NORMAL:COL_NORMAL + 4] = take(normals, 4)
+    rows[:, COL_TANGENT:COL_TANGENT + 4] = take(tangents, 4)
+    rows[:, COL_COLOR] = take(colors, 1)[:, 0]
+    for (w, off), c in zip(layers, cols):
+        rows[:, c:c + w] = take(off, w)
+    return rows, widths
+
+
+def encodeVertexBuffer(rows, widths):
+    num = rows.shape[0]
+    cols, lanes = getVertexLayout(widths)
+    arrays = [(COL_POINT, 4), (COL_NORMAL, 4), (COL_TANGENT, 4), (COL_COLOR, 1)]
+
+    offsets = list()
+    pos = alignVB(VB_HEADER.size)
+    for c, w in arrays:
+        offsets.append(pos)
+        pos = alignVB(pos + 4 * w * num)
+    tvarray = pos
+    pos = alignVB(pos + VB_TVARRAY.size * len(widths))
+    for c, w in zip(cols, widths):
+        arrays.append((c, w))
+        offsets.append(pos)
+        pos = alignVB(pos + 4 * w * num)
+
+    buf = bytearray(pos)
+    VB_HEADER.pack_into(buf, 0, num, offsets[0], offsets[1], offsets[2], offsets[3],
+                        len(widths), tvarray)
+    for i, w in enumerate(widths):
+        VB_TVARRAY.pack_into(buf, tvarray + i * VB_TVARRAY.size, w, offsets[4 + i])
+    for (c, w), off in zip(arrays, offsets):
+        buf[off:off + 4 * w * num] = np.ascontiguousarray(rows[:, c:c + w]).tobytes()
+    return bytes(buf)
+
+
+def decodeIndexBuffer(data):
+    if len(data) % 12 != 0:
+        raise ValueError("index buffer isn't whole triangles")
+    return np.frombuffer(data, np.uint32).astype(np.int64)
+
+
+def encodeIndexBuffer(indices):
+    return indices.astype("<u4").tobytes()
+
+
+# Lanes the shaders read: xyz of the point, normal and tangent, uv of layer 0,
+# and the bone info in layers 1-7 of a skinned mesh. maskmaker never sets the
+# rest, so they hold whatever was in memory at the time.
+#
+def getReadLanes(widths, skinned):
+    cols, lanes = getVertexLayout(widths)
+    read = np.zeros(lanes, bool)
+    read[COL_POINT:COL_POINT + 3] = True
+    read[COL_NORMAL:COL_NORMAL + 3] = True
+    read[COL_TANGENT:COL_TANGENT + 3] = True
+    if len(cols) > 0:
+        read[cols[0]:cols[0] + min(2, widths[0])] = True
+    if skinned:
+        for c, w in zip(cols[1:], widths[1:]):
+            read[c:c + w] = True
+    return read
+
+
+# ==============================================================================
+# QUANTISATION
+#
+# The plugin only takes floats, so quantising here means snapping values to
+# a power of two grid: the low bits of the mantissas go to zero, which zlib
+# likes, and vertices that were only different in the noise get welded.
+# Points get MESH_POINT_BITS of precision across the mesh, normals, tangents
+# and uvs a fixed step. Bone info is left alone.
+# ==============================================================================
+
+MESH_POINT_BITS = 16
+MESH_NORMAL_STEP = 2.0 ** -15
+MESH_UV_STEP = 2.0 ** -16
+
+
+def snapLanes(f, cols, step):
+    v = f[:, cols].astype(np.float64)
+    f[:, cols] = (np.round(v / step) * step + 0.0).astype(np.float32)
+
+
+# Quantises the vertices in place
+# - returns the most each lane can have moved
+#
+def quantizeVertices(rows, widths):
+    cols, lanes = getVertexLayout(widths)
+    tolerance = np.zeros(lanes)
+    f = rows.view(np.float32)
+
+    points = f[:, COL_POINT:COL_POINT + 3]
+    finite = points[np.isfinite(points).all(axis=1)]
+    if len(finite) > 0:
+        extent = float((finite.max(axis=0) - finite.min(axis=0)).max())
+        if extent > 0.0:
+            step = 2.0 ** (math.floor(math.log2(extent)) - MESH_POINT_BITS)
+            snapLanes(f, slice(COL_POINT, COL_POINT + 3), step)
+            tolerance[COL_POINT:COL_POINT + 3] = step
+
+    for c in [COL_NORMAL, COL_TANGENT]:
+        snapLanes(f, slice(c, c + 3), MESH_NORMAL_STEP)
+        tolerance[c:c + 3] = MESH_NORMAL_STEP
+    if len(cols) > 0:
+        uv = slice(cols[0], cols[0] + min(2, widths[0]))
+        snapLanes(f, uv, MESH_UV_STEP)
+        tolerance[uv] = MESH_UV_STEP
+    return tolerance
+
+
+# ==============================================================================
+# WELDING AND ORDERING
+# ==============================================================================
+
+# Merges vertices that are exactly the same
+# - returns (rows, indices)
+#
+def weldVertices(rows, indices):
+    rows = np.ascontiguousarray(rows)
+    keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return rows[first], inverse.ravel()[indices]
+
+
+# Puts the vertices in the order the triangles first use them, and drops
+# any that aren't used
+# - returns (rows, indices)
+#
+def reorderVertices(rows, indices):
+    used, first = np.unique(indices, return_index=True)
+    used = indices[np.sort(first)]
+    remap = np.full(len(rows), -1, np.int64)
+    remap[used] = np.arange(len(used))
+    return rows[used], remap[indices]
+
+
+# --------------------------------------------------
+# Tom Forsyth's "Linear-Speed Vertex Cache Optimisation".
+# Greedily takes the best scoring triangle of the vertices in a
+# simulated LRU cache, scoring vertices on where they are in the cache
+# and how many triangles still need them.
+# --------------------------------------------------
+FORSYTH_CACHE_SIZE = 32
+FORSYTH_CACHE_DECAY = 1.5
+FORSYTH_LAST_TRI_SCORE = 0.75
+FORSYTH_VALENCE_SCALE = 2.0
+FORSYTH_VALENCE_POWER = 0.5
+FORSYTH_MAX_VALENCE = 64
+
+FORSYTH_CACHE_SCORES = [FORSYTH_LAST_TRI_SCORE] * 3 + \
+    [(1.0 - float(i - 3) / (FORSYTH_CACHE_SIZE - 3)) ** FORSYTH_CACHE_DECAY
+     for i in range(3, FORSYTH_CACHE_SIZE)]
+FORSYTH_VALENCE_SCORES = [0.0] + \
+    [FORSYTH_VALENCE_SCALE * i ** -FORSYTH_VALENCE_POWER for i in range(1, FORSYTH_MAX_VALENCE + 1)]
+
+
+def forsythVertexScore(cachepos, valence):
+    if valence == 0:
+        return -1.0
+    score = FORSYTH_VALENCE_SCORES[min(valence, FORSYTH_MAX_VALENCE)]
+    if cachepos >= 0:
+        score += FORSYTH_CACHE_SCORES[cachepos]
+    return score
+
+
+# - returns the triangles' new order, as a list of triangle numbers
+#
+def forsythOrder(tris, numverts):
+    ntris = len(tris)
+    tris = [list(dict.fromkeys(t)) for t in tris]
+    vtris = [list() for v in range(numverts)]
+    for t, tri in enumerate(tris):
+        for v in tri:
+            vtris[v].append(t)
+    cachepos = [-1] * numverts
+    vscore = [forsythVertexScore(-1, len(vtris[v])) for v in range(numverts)]
+    tscore = [sum(vscore[v] for v in tri) for tri in tris]
+    added = [False] * ntris
+
+    order = list()
+    cache = list()
+    cursor = 0
+    best = max(range(ntris), key=tscore.__getitem__) if ntris > 0 else -1
+    while len(order) < ntris:
+        if best < 0:
+            # nothing in the cache has triangles left, take the next one
+            while added[cursor]:
+                cursor += 1
+            best = cursor
+        tri = tris[best]
+        added[best] = True
+        order.append(best)
+        for v in tri:
+            vtris[v].remove(best)
+
+        cache = tri + [v for v in cache if v not in tri]
+        for v in cache[FORSYTH_CACHE_SIZE:]:
+            cachepos[v] = -1
+            vscore[v] = forsythVertexScore(-1, len(vtris[v]))
+        cache = cache[:FORSYTH_CACHE_SIZE]
+        for i, v in enumerate(cache):
+            cachepos[v] = i
+            vscore[v] = forsythVertexScore(i, len(vtris[v]))
+
+        best = -1
+        bestscore = -1.0
+        for v in cache:
+            for t in vtris[v]:
+                s = sum(vscore[u] for u in tris[t])
+                tscore[t] = s
+                if s > bestscore:
+                    best = t
+                    bestscore = s
+    return order
+
+
+# Average cache miss ratio: vertices transformed per triangle, with a FIFO
+# post-transform cache like most GPUs have
+#
+MESH_FIFO_SIZE = 16
+
+
+def getACMR(indices, cachesize=MESH_FIFO_SIZE):
+    cache = deque()
+    incache = set()
+    misses = 0
+    for v in indices.tolist():
+        if v not in incache:
+            misses += 1
+            if len(cache) == cachesize:
+                incache.discard(cache.popleft())
+            cache.append(v)
+            incache.add(v)
+    return float(misses) / max(1, len(indices) // 3)
+
+
+# ==============================================================================
+# MESH OPTIMISER
+#
+# Run on a mask json after it's built. For each mesh: the lanes no shader
+# reads are zeroed, points, normals and uvs are quantised if asked for,
+# identical vertices are welded, the triangles are put in vertex cache
+# order and the vertices in the order they're used. The new buffers are
+# then decoded again and every triangle checked against the one it came
+# from, and the mesh is only changed if they all match.
+# ==============================================================================
+
+MESH_ZLIB_LEVEL = 9
+
+
+def newMeshStats():
+    return {"meshes": 0, "optimized": 0, "failed": 0,
+            "vertices": [0, 0], "triangles": 0, "acmr": [0.0, 0.0], "bytes": [0, 0]}
+
+
+# Names of the meshes used by skinned models
+def getSkinnedMeshes(resources):
+    meshes = set()
+    for res in resources.values():
+        if isinstance(res, dict) and res.get("type") == "skinned-model":
+            skins = res.get("skins")
+            if isinstance(skins, dict):
+                for skin in skins.values():
+                    if isinstance(skin, dict) and "mesh" in skin:
+                        meshes.add(skin["mesh"])
+    return meshes
+
+
+# Checks the triangles of a new mesh against the ones they came from
+# - tolerance is None for an exact match, else the most each lane can be out
+#
+def verifyMesh(rows, indices, newrows, newindices, order, read, tolerance=None):
+    ntris = len(indices) // 3
+    if len(newindices) != len(indices) or len(order) != ntris:
+        return False
+    if not np.array_equal(np.sort(order), np.arange(ntris)):
+        return False
+    if len(newindices) > 0 and (newindices.min() < 0 or newindices.max() >= len(newrows)):
+        return False
+    old = rows[:, read][indices.reshape(-1, 3)[order]]
+    new = newrows[:, read][newindices.reshape(-1, 3)]
+    if tolerance is None:
+        return np.array_equal(old, new)
+    diff = np.abs(new.view(np.float32).astype(np.float64) - old.view(np.float32))
+    ok = (old == new) | (diff <= tolerance[read])
+    return bool(ok.all())
+
+
+# Optimises a mesh resource in place
+# - returns the stats, see newMeshStats
+# - raises ValueError if the buffers can't be read
+#
+def optimizeMesh(res, skinned=False, quantize=False):
+    stats = newMeshStats()
+    stats["meshes"] = 1
+    vbuf = res["vertex-buffer"]
+    ibuf = res["index-buffer"]
+    stats["bytes"] = [len(vbuf) + len(ibuf)] * 2
+
+    rows, widths = decodeVertexBuffer(base64_decodeZ(vbuf))
+    indices = decodeIndexBuffer(base64_decodeZ(ibuf))
+    if len(indices) > 0 and indices.max() >= len(rows):
+        raise ValueError("index out of range")
+    stats["vertices"] = [len(rows)] * 2
+    stats["triangles"] = len(indices) // 3
+    acmr = getACMR(indices)
+    stats["acmr"] = [acmr, acmr]
+
+    read = getReadLanes(widths, skinned)
+    newrows = rows.copy()
+    newrows[:, ~read] = 0
+    tolerance = quantizeVertices(newrows, widths) if quantize else None
+    newrows, newindices = weldVertices(newrows, indices)
+    order = forsythOrder(newindices.reshape(-1, 3).tolist(), len(newrows))
+    newindices = newindices.reshape(-1, 3)[order].ravel()
+    newrows, newindices = reorderVertices(newrows, newindices)
+
+    newvbuf = base64_encodeZ(encodeVertexBuffer(newrows, widths), MESH_ZLIB_LEVEL)
+    newibuf = base64_encodeZ(encodeIndexBuffer(newindices), MESH_ZLIB_LEVEL)
+
+    # check what we're going to write, not what we've got
+    checkrows, checkwidths = decodeVertexBuffer(base64_decodeZ(newvbuf))
+    checkindices = decodeIndexBuffer(base64_decodeZ(newibuf))
+    if checkwidths != widths or \
+            not verifyMesh(rows, indices, checkrows, checkindices, order, read, tolerance):
+        stats["failed"] = 1
+        return stats
+
+    res["vertex-buffer"] = newvbuf
+    res["index-buffer"] = newibuf
+    stats["optimized"] = 1
+    stats["vertices"][1] = len(newrows)
+    stats["acmr"][1] = getACMR(newindices)
+    stats["bytes"][1] = len(newvbuf) + len(newibuf)
+    return stats
+
+
+def addMeshStats(total, stats):
+    for k in ["meshes", "optimized", "failed", "triangles"]:
+        total[k] += stats[k]
+    for k in ["vertices", "bytes"]:
+        total[k][0] += stats[k][0]
+        total[k][1] += stats[k][1]
+    # acmr weighted by triangles
+    for i in range(2):
+        total["acmr"][i] += stats["acmr"][i] * stats["triangles"]
+
+
+# Optimises the meshes in a loaded mask json, the build does this with the
+# additions so the json is only written once
+# - filename is just for the report
+# - returns a report dict, see getMeshReportLine. before and after are the
+#   size of the mesh buffers.
+#
+def optimizeMaskJsonMeshes(j, quantize=False, filename=""):
+    report = {"file": filename, "before": 0, "after": 0, "skipped": np is None}
+    report.update(newMeshStats())
+    if np is None:
+        return report
+
+    resources = j.get("resources")
+    if not isinstance(resources, dict):
+        resources = dict()
+    skinned = getSkinnedMeshes(resources)
+    for name, res in resources.items():
+        if not isinstance(res, dict) or res.get("type") != "mesh":
+            continue
+        if not isinstance(res.get("vertex-buffer"), str) or not isinstance(res.get("index-buffer"), str):
+            continue
+        try:
+            stats = optimizeMesh(res, name in skinned, quantize)
+        except ValueError:
+            stats = newMeshStats()
+            stats["meshes"] = 1
+            stats["failed"] = 1
+        addMeshStats(report, stats)
+    report["before"], report["after"] = report["bytes"]
+    for i in range(2):
+        report["acmr"][i] /= max(1, report["triangles"])
+    return report
+
+
+# Optimises the meshes in a mask json file
+# - returns a report dict, see getMeshReportLine. before and after are the
+#   size of the file.
+#
+def optimizeMaskMeshes(jsonfile, quantize=False):
+    before = os.path.getsize(jsonfile)
+    if np is None:
+        report = optimizeMaskJsonMeshes(None, quantize, jsonfile)
+    else:
+        j = load_mask_json(jsonfile)
+        report = optimizeMaskJsonMeshes(j, quantize, jsonfile)
+        if report["optimized"] > 0:
+            write_mask_json(jsonfile, j)
+    report["before"] = before
+    report["after"] = os.path.getsize(jsonfile)
+    return report
+
+
+def getMeshReportLine(report):
+    if report["skipped"]:
+        return "Meshes : %s skipped, numpy is not installed" % report["file"]
+    saved = report["before"] - report["after"]
+    line = "Meshes : %s %d -> %d bytes, saved %d (%.1f%%)" % \
+           (report["file"], report["before"], report["after"], saved,
+            100.0 * saved / max(1, report["before"]))
+    if report["meshes"] > 0:
+        line += ", %d meshes, vertices %d -> %d, acmr %.2f -> %.2f" % \
+                (report["meshes"], report["vertices"][0], report["vertices"][1],
+                 report["acmr"][0], report["acmr"][1])
+    if report["failed"] > 0:
+        line += ", %d FAILED and left alone" % report["failed"]
+    return line
+
+
+def optimizeMaskMeshesArgs(args):
+    return optimizeMaskMeshes(*args)
+
+
+# Runs optimizeMaskMeshes on a list of (jsonfile, quantize), in parallel
+# - returns the reports, in the same order
+#
+def optimizeMeshFiles(files, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(files) <= 1:
+        return [optimizeMaskMeshes(f, q) for f, q in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(optimizeMaskMeshesArgs, files, chunksize=1))
+
+
+# python -m arttool.meshopt [--quantize] [-jN] file.json ...
+#
+if __name__ == "__main__":
+    quantize = False
+    workers = None
+    files = list()
+    for a in sys.argv[1:]:
+        if a == "--quantize":
+            quantize = True
+        elif a.startswith("-j"):
+            workers = int(a[2:])
+        else:
+            files.append(a)
+    reports = optimizeMeshFiles([(f, quantize) for f in files], workers)
+    for report in reports:
+        print(getMeshReportLine(report))
+    before = sum(r["before"] for r in reports)
+    after = sum(r["after"] for r in reports)
+    print("Total : %d -> %d bytes, saved %d" % (before, after, before - after))
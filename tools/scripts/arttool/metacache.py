@@ -0,0 +1,118 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, json, threading
+from collections import OrderedDict
+
+
+# ==============================================================================
+# META DATA CACHE
+#
+# Parsed .meta/.combo/config json files, keyed on the file name and validated
+# against the file's (modtime, size). A file is only read and parsed again
+# once it changes on disk. Files that fail to parse are remembered too, so a
+# broken meta file doesn't get re-read on every list refresh.
+#
+# The cached objects are shared. Anything that wants to change what it gets
+# back has to copy it first.
+# ==============================================================================
+
+METACACHE_SIZE = 4096
+
+
+def metaCacheKey(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+class MetaDataCache(object):
+
+    def __init__(self, maxsize=METACACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Gets the parsed contents of a json file
+    # - returns None if the file doesn't exist
+    # - raises ValueError if the file is empty or isn't valid json
+    #
+    def get(self, filename):
+        key = metaCacheKey(filename)
+        try:
+            st = os.stat(filename)
+        except OSError:
+            self.forget(filename)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                data = entry[1]
+                if isinstance(data, ValueError):
+                    raise data
+                return data
+            self.misses += 1
+
+        try:
+            f = open(filename, "r")
+            try:
+                data = json.loads(f.read())
+            finally:
+                f.close()
+        except OSError:
+            return None
+        except ValueError as e:
+            data = e
+
+        self.store(key, stamp, data)
+        if isinstance(data, ValueError):
+            raise data
+        return data
+
+    # Write through: remember what was just written to filename
+    #
+    def put(self, filename, data):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            self.forget(filename)
+            return
+        self.store(metaCacheKey(filename), (st.st_mtime_ns, st.st_size), data)
+
+    def forget(self, filename):
+        with self.lock:
+            self.entries.pop(metaCacheKey(filename), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def store(self, key, stamp, data):
+        with self.lock:
+            self.entries[key] = (stamp, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
@@ -0,0 +1,257 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, time, queue, signal, locale, threading, subprocess
+
+
+# ==============================================================================
+# PROCESS RUNNER
+#
+# Every maskmaker and svn command goes through one asyncio event loop, running
+# on its own thread. Any thread can hand it commands:
+#
+#   result = getProcessRunner().run(cmd, timeout)
+#   results = getProcessRunner().runAll([cmd1, cmd2, cmd3])
+#   for line in execute(cmd):
+#       print(line)
+#
+# At most PROC_WORKERS commands run at once, the rest wait their turn.
+# stdout and stderr are read side by side, so a command can't stall on a full
+# stderr pipe. A command that runs past its timeout is killed, along with
+# anything it started, and its result says so.
+#
+# Commands are still shell command lines, since that's how the svn and
+# maskmaker paths are quoted.
+#
+# asyncio is slow to import, so it's only imported when the runner starts.
+# ==============================================================================
+
+# svn mostly waits on the server, so allow a few even on one core
+PROC_WORKERS = max(4, os.cpu_count() or 1)
+PROC_TIMEOUT = 600
+PROC_KILL_WAIT = 5
+PROC_LINE_LIMIT = 1024 * 1024
+
+
+class ProcessResult(object):
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.returncode = None
+        self.stdout = list()
+        self.stderr = ""
+        self.timedout = False
+        self.timeout = None
+        # OSError if it couldn't be started, ValueError if its output
+        # couldn't be read
+        self.error = None
+        self.seconds = 0.0
+
+    def failed(self):
+        return self.timedout or self.error is not None or self.returncode != 0
+
+    def getProgram(self):
+        bits = self.cmd.split()
+        return bits[0] if len(bits) > 0 else self.cmd
+
+    # Lines saying what went wrong, for an output window
+    def getErrorLines(self):
+        if isinstance(self.error, OSError):
+            return ["ERROR " + self.getProgram() + " FAILED TO START : " + str(self.error)]
+        if self.error is not None:
+            return ["ERROR " + self.getProgram() + " FAILED READING OUTPUT : " + str(self.error)]
+        if self.timedout:
+            return ["ERROR " + self.getProgram() + " TIMED OUT after " + str(self.timeout) + " seconds."]
+        if self.returncode != 0:
+            return ["ERROR " + self.getProgram() + " FAILED EXECUTION."]
+        return list()
+
+
+def decodeOutput(data):
+    s = data.decode(locale.getpreferredencoding(False), errors="replace")
+    return s.replace("\r\n", "\n").replace("\r", "\n")
+
+
+asyncio = None
+
+
+def newEventLoop():
+    global asyncio
+    if asyncio is None:
+        import asyncio
+    # subprocesses on windows need the proactor loop
+    if sys.platform == "win32":
+        return asyncio.ProactorEventLoop()
+    return asyncio.new_event_loop()
+
+
+# kills a shell command and whatever it started
+def killProcessTree(proc):
+    try:
+        if sys.platform == "win32":
+            subprocess.call("taskkill /F /T /PID " + str(proc.pid),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class ProcessRunner(object):
+
+    def __init__(self, workers=PROC_WORKERS):
+        self.workers = max(1, workers)
+        self.loop = newEventLoop()
+        self.semaphore = None
+        ready = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(self.loop)
+            self.semaphore = asyncio.Semaphore(self.workers)
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run_loop, name="ProcessRunner", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    async def runProcess(self, cmd, timeout, onLine):
+        result = ProcessResult(cmd)
+        result.timeout = timeout
+        async with self.semaphore:
+            start = time.time()
+            try:
+                proc = await asyncio.create_subprocess_shell(
+                    cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    limit=PROC_LINE_LIMIT, start_new_session=(sys.platform != "win32"))
+            except OSError as e:
+                result.error = e
+                return result
+
+            async def read_stdout():
+                while True:
+                    line = await proc.stdout.readline()
+                    if not line:
+                        break
+                    line = decodeOutput(line)
+                    if not line.endswith("\n"):
+                        line += "\n"
+                    result.stdout.append(line)
+                    if onLine is not None:
+                        onLine(line)
+
+            async def read_stderr():
+                result.stderr = decodeOutput(await proc.stderr.read())
+
+            async def kill():
+                killProcessTree(proc)
+                try:
+                    await asyncio.wait_for(proc.wait(), PROC_KILL_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+
+            try:
+                await asyncio.wait_for(asyncio.gather(read_stdout(), read_stderr(), proc.wait()),
+                                       timeout)
+            except asyncio.TimeoutError:
+                result.timedout = True
+                await kill()
+            except ValueError as e:
+                # a stdout line longer than PROC_LINE_LIMIT, readline gives up on it
+                result.error = e
+                await kill()
+            result.returncode = proc.returncode
+            result.seconds = time.time() - start
+        return result
+
+    # Starts a command
+    # - onLine(line) is called for each line of stdout as it comes, on the
+    #   runner's thread
+    # - returns a concurrent.futures.Future of the ProcessResult
+    #
+    def submit(self, cmd, timeout=PROC_TIMEOUT, onLine=None):
+        return asyncio.run_coroutine_threadsafe(self.runProcess(cmd, timeout, onLine), self.loop)
+
+    def run(self, cmd, timeout=PROC_TIMEOUT, onLine=None):
+        return self.submit(cmd, timeout, onLine).result()
+
+    # Runs a bunch of commands at once
+    # - returns the results, in the same order
+    #
+    def runAll(self, cmds, timeout=PROC_TIMEOUT):
+        futures = [self.submit(cmd, timeout) for cmd in cmds]
+        return [f.result() for f in futures]
+
+    # Yields a command's stdout lines as they come
+    # - returns the ProcessResult, for "result = yield from"
+    #
+    def lines(self, cmd, timeout=PROC_TIMEOUT):
+        q = queue.Queue()
+        future = self.submit(cmd, timeout, q.put)
+        future.add_done_callback(lambda f: q.put(None))
+        while True:
+            line = q.get()
+            if line is None:
+                break
+            yield line
+        return future.result()
+
+
+processRunner = None
+processRunnerLock = threading.Lock()
+
+
+def getProcessRunner():
+    global processRunner
+    with processRunnerLock:
+        if processRunner is None:
+            processRunner = ProcessRunner()
+        return processRunner
+
+
+# Executes a shell command
+# usage:
+#
+# for line in execute(cmd):
+#   print(line)
+#
+# Lines end in a newline. If the command fails, times out or can't be run,
+# the last line starts with ERROR, and its stderr goes to ours.
+#
+def execute(cmd, timeout=PROC_TIMEOUT):
+    result = yield from getProcessRunner().lines(cmd, timeout)
+    if result.failed():
+        if len(result.stderr) > 0:
+            sys.stderr.write(result.stderr)
+        for line in result.getErrorLines():
+            yield line + "\n"
+
+
+# Runs a bunch of commands at once, like execute but all together
+# - returns a list of ProcessResult, in the same order
+#
+def executeAll(cmds, timeout=PROC_TIMEOUT):
+    results = getProcessRunner().runAll(cmds, timeout)
+    for result in results:
+        if result.failed() and len(result.stderr) > 0:
+            sys.stderr.write(result.stderr)
+    return results
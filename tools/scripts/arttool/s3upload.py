@@ -0,0 +1,425 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, json, gzip, hashlib, threading, traceback
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .utils import *
+from .blobstore import BlobStore, storeReleaseFiles, getBlobStoreUploads, getBlobStoreReport
+
+
+# ==============================================================================
+# S3 UPLOADER
+#
+# Uploads release files with one shared client. Files are uploaded by a pool
+# of threads, big ones in parts. What was uploaded is remembered in a
+# manifest of key -> ETag, and a file whose ETag works out the same as the
+# one in the manifest isn't sent again.
+#
+# S3's ETag is the md5 of the file for a single part upload, and the md5 of
+# the parts' md5s plus "-<number of parts>" for a multipart one, so we can
+# work it out locally as long as we always use the same part size.
+#
+# Pass in a client to upload somewhere else, like a moto server:
+#
+#   client = boto3.client("s3", endpoint_url="http://localhost:5000")
+#   S3Uploader("bucket", client=client).upload(files)
+# ==============================================================================
+
+S3_UPLOAD_WORKERS = 8
+S3_PART_CONCURRENCY = 4
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+S3_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+
+S3_ENCODING_EXTS = {"gzip": ".gz",
+                    "br": ".br"}
+
+S3_CONTENT_TYPES = {".gif": "image/gif",
+                    ".png": "image/png",
+                    ".mp4": "video/mp4",
+                    ".json": "application/json"}
+
+
+def getS3ManifestFile():
+    fldr = getConfigFolder()
+    return os.path.join(fldr, "s3manifest.json")
+
+
+def getS3ContentType(filename):
+    for ext in S3_ENCODING_EXTS.values():
+        if filename.endswith(ext):
+            filename = filename[:-len(ext)]
+    for ext, ctype in S3_CONTENT_TYPES.items():
+        if filename.endswith(ext):
+            return ctype
+    return "application/octet-stream"
+
+
+# local ETags, remembered against (modtime, size) like hashFile
+localETags = dict()
+localETagsLock = threading.Lock()
+
+
+def getLocalETag(filename, threshold=S3_MULTIPART_THRESHOLD, chunksize=S3_MULTIPART_CHUNKSIZE):
+    key = os.path.normcase(os.path.abspath(filename))
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size, threshold, chunksize)
+    with localETagsLock:
+        entry = localETags.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+    whole = hashlib.md5()
+    parts = list()
+    try:
+        f = open(filename, "rb")
+        try:
+            for block in iter(lambda: f.read(chunksize), b""):
+                whole.update(block)
+                parts.append(hashlib.md5(block).digest())
+        finally:
+            f.close()
+    except OSError:
+        return None
+    if st.st_size < threshold:
+        etag = whole.hexdigest()
+    else:
+        etag = hashlib.md5(b"".join(parts)).hexdigest() + "-" + str(len(parts))
+
+    with localETagsLock:
+        localETags[key] = (stamp, etag)
+    return etag
+
+
+class S3Uploader(object):
+
+    def __init__(self, bucket=S3_BUCKET, workers=S3_UPLOAD_WORKERS, client=None, manifestfile=None):
+        self.bucket = bucket
+        self.workers = max(1, workers)
+        # boto3 takes a while to import, only when there's uploading to do
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+        if client is None:
+            config = Config(max_pool_connections=self.workers * S3_PART_CONCURRENCY)
+            client = boto3.client("s3", config=config)
+        self.client = client
+        self.transfer = TransferConfig(multipart_threshold=S3_MULTIPART_THRESHOLD,
+                                       multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+                                       max_concurrency=S3_PART_CONCURRENCY)
+        if manifestfile is None:
+            manifestfile = getS3ManifestFile()
+        self.manifestfile = manifestfile
+        self.manifest = dict()
+        self.lock = threading.Lock()
+        self.loadManifest()
+
+    # --------------------------------------------------
+    # manifest : { bucket : { key : etag } }
+    # --------------------------------------------------
+    def loadManifest(self):
+        try:
+            f = open(self.manifestfile, "r")
+            m = json.load(f)
+            f.close()
+        except (OSError, ValueError):
+            m = dict()
+        self.manifest = m.get(self.bucket, dict())
+
+    def saveManifest(self):
+        try:
+            f = open(self.manifestfile, "r")
+            m = json.load(f)
+            f.close()
+        except (OSError, ValueError):
+            m = dict()
+        with self.lock:
+            m[self.bucket] = dict(self.manifest)
+        writeMetaData(self.manifestfile, m)
+
+    def needsUpload(self, filename, key):
+        etag = getLocalETag(filename)
+        with self.lock:
+            return etag is None or self.manifest.get(key) != etag
+
+    # --------------------------------------------------
+    # uploading
+    # --------------------------------------------------
+
+    # returns "uploaded", "skipped", "missing" or "failed"
+    def uploadFile(self, filename, key, encoding=None, cachecontrol=None):
+        if not os.path.exists(filename):
+            return "missing"
+        if not self.needsUpload(filename, key):
+            return "skipped"
+        extra = {"ACL": "public-read", "ContentType": getS3ContentType(filename)}
+        if encoding is not None:
+            extra["ContentEncoding"] = encoding
+        if cachecontrol is not None:
+            extra["CacheControl"] = cachecontrol
+        try:
+            self.client.upload_file(filename, self.bucket, key, ExtraArgs=extra, Config=self.transfer)
+            r = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception:
+            traceback.print_exc()
+            return "failed"
+        etag = r["ETag"].strip('"')
+        localetag = getLocalETag(filename)
+        with self.lock:
+            if etag == localetag:
+                self.manifest[key] = etag
+            else:
+                # uploaded some other way than we'd expect, always re-send it
+                self.manifest.pop(key, None)
+        return "uploaded"
+
+    # Uploads a list of (filename, key), (filename, key, encoding) or
+    # (filename, key, encoding, cachecontrol)
+    # - returns a dict of key -> result, see uploadFile
+    #
+    def upload(self, files):
+        results = dict()
+
+        def work(fk):
+            key = fk[1]
+            r = self.uploadFile(*fk)
+            print("  ", key, r)
+            return key, r
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for key, r in pool.map(work, files):
+                    results[key] = r
+        finally:
+            self.saveManifest()
+        return results
+
+
+# ==============================================================================
+# COMPRESSED JSON
+#
+# Mask jsons are mostly base64 and compress well. Each release json also goes
+# up gzip'd as <uuid>.json.gz, and brotli'd as <uuid>.json.br if the brotli
+# module is installed, with Content-Encoding set so they can be served as
+# is. The compressed files live in the config folder and are only remade when
+# the json changes. gzip files are written with no timestamp so the same json
+# always gives the same file, and the same ETag.
+# ==============================================================================
+
+S3_GZIP_LEVEL = 9
+S3_BROTLI_QUALITY = 11
+
+
+def getReleaseFolder():
+    fldr = getConfigFolder()
+    return os.path.join(fldr, "release")
+
+
+def getCompressedFileName(key, encoding):
+    return os.path.join(getReleaseFolder(), key + S3_ENCODING_EXTS[encoding])
+
+
+def getReleaseEncodings():
+    if brotli is None:
+        return ["gzip"]
+    return ["gzip", "br"]
+
+
+def compressData(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, S3_GZIP_LEVEL, mtime=0)
+    return brotli.compress(data, quality=S3_BROTLI_QUALITY)
+
+
+# Makes the compressed versions of a release json
+# - returns a dict of encoding -> compressed file name
+#
+def compressReleaseFile(filename, key):
+    files = dict()
+    data = None
+    for encoding in getReleaseEncodings():
+        cfile = getCompressedFileName(key, encoding)
+        files[encoding] = cfile
+        if os.path.exists(cfile) and os.path.getmtime(cfile) >= os.path.getmtime(filename):
+            continue
+        if data is None:
+            f = open(filename, "rb")
+            data = f.read()
+            f.close()
+        tmp = cfile + "." + str(threading.get_ident()) + ".tmp"
+        f = open(tmp, "wb")
+        f.write(compressData(data, encoding))
+        f.close()
+        os.replace(tmp, cfile)
+    return files
+
+
+# Compresses a list of (jsonfile, key) in parallel
+# - returns a list of (jsonfile, key, { encoding : file }), missing jsons left out
+#
+def compressReleaseFiles(files, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    os.makedirs(getReleaseFolder(), exist_ok=True)
+    files = [(f, k) for f, k in files if os.path.exists(f)]
+
+    def work(fk):
+        return compressReleaseFile(*fk)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        compressed = list(pool.map(work, files))
+    return [(f, k, c) for (f, k), c in zip(files, compressed)]
+
+
+# Size report for compressReleaseFiles() results
+# - returns the lines
+#
+def getCompressionReport(compressed):
+    encodings = getReleaseEncodings()
+    lines = list()
+    header = "%-40s %12s" % ("mask", "json")
+    for encoding in encodings:
+        header += " %12s %6s" % (encoding, "%")
+    lines.append(header)
+    totals = [0] * (len(encodings) + 1)
+    for filename, key, files in compressed:
+        size = os.path.getsize(filename)
+        totals[0] += size
+        line = "%-40s %12d" % (os.path.basename(filename)[:40], size)
+        for i, encoding in enumerate(encodings):
+            csize = os.path.getsize(files[encoding])
+            totals[i + 1] += csize
+            line += " %12d %5.1f%%" % (csize, 100.0 * csize / max(1, size))
+        lines.append(line)
+    line = "%-40s %12d" % ("TOTAL", totals[0])
+    for i in range(len(encodings)):
+        line += " %12d %5.1f%%" % (totals[i + 1], 100.0 * totals[i + 1] / max(1, totals[0]))
+    lines.append(line)
+    return lines
+
+
+# ==============================================================================
+# RELEASES
+#
+# The release index is the list of masks and combos that are good to go, with
+# the meta data the app shows for them. Uploading a release sends each one's
+# json (plain, compressed and as shared blobs), png, gif and mp4, keyed by
+# uuid.
+# ==============================================================================
+
+RELEASE_FIELDS = ["name", "uuid", "description", "author", "tags", "category", "tier", "is_vip", "is_intro"]
+RELEASE_EXTS = [".json", ".png", ".gif", ".mp4"]
+
+
+# Release index entry of a mask or combo
+# - returns (entry, json file), None if its meta data isn't good
+#
+def getReleaseEntry(filename):
+    mdc, mt = checkMetaDataFile(filename)
+    if mdc != CHECKMETA_GOOD:
+        return None
+    metadata = peekMetadataFile(filename)
+    d = dict()
+    for k in RELEASE_FIELDS:
+        d[k] = metadata[k]
+        if type(d[k]) is str:
+            d[k] = d[k].replace("\n", "").replace("\r", "")
+
+    if filename.lower().endswith(".fbx"):
+        jsonfile = jsonFromFbx(filename)
+    else:
+        md = getCombinedComboMeta(metadata)
+        d["tags"] = md["tags"]
+        d["author"] = md["author"]
+        jsonfile = filename
+
+    d["category"] = d["category"].lower()
+    d["tags"] = d["tags"].lower().replace(", ", ",")
+    d["modtime"] = int(os.path.getmtime(jsonfile))
+    d["author"] = d["author"].replace(", ", ",")
+    if d["tags"].endswith(" "):
+        d["tags"] = d["tags"][:-1]
+    d["name"] = d["name"].strip()
+    d["author"] = d["author"].strip()
+    return d, jsonfile
+
+
+# Release index of some masks and combos
+# - returns (index entries, their json files)
+#
+def getReleaseIndex(fbxfiles, combofiles):
+    metalist = list()
+    jsonlist = list()
+    for filename in list(fbxfiles) + list(combofiles):
+        entry = getReleaseEntry(filename)
+        if entry is not None:
+            metalist.append(entry[0])
+            jsonlist.append(entry[1])
+    return metalist, jsonlist
+
+
+# (file, key) of everything in a release
+def getReleaseFiles(metalist, jsonlist):
+    uploads = list()
+    for d, jsonfile in zip(metalist, jsonlist):
+        for ext in RELEASE_EXTS:
+            uploads.append((os.path.abspath(jsonfile.replace(".json", ext)), d["uuid"] + ext))
+    return uploads
+
+
+# Uploads a release to S3
+# - log(line) is called with what's happening
+# - returns a dict of key -> result, see S3Uploader.upload
+#
+def uploadRelease(metalist, jsonlist, log=print, uploader=None):
+    uploads = getReleaseFiles(metalist, jsonlist)
+
+    # pre-compressed jsons
+    jsonuploads = [(f, k) for f, k in uploads if k.endswith(".json")]
+    compressed = compressReleaseFiles(jsonuploads)
+    for line in getCompressionReport(compressed):
+        log(line)
+    for f, k, files in compressed:
+        for encoding, cfile in files.items():
+            uploads.append((cfile, k + S3_ENCODING_EXTS[encoding], encoding))
+
+    # shared blobs, each one uploaded once
+    store = BlobStore()
+    stored = storeReleaseFiles(jsonuploads, store)
+    for line in getBlobStoreReport(stored):
+        log(line)
+    uploads += getBlobStoreUploads(stored, store)
+
+    log("Uploading " + str(len(uploads)) + " files")
+    if uploader is None:
+        uploader = S3Uploader()
+    results = uploader.upload(uploads)
+    for r in ["uploaded", "skipped", "missing", "failed"]:
+        log("   " + r + " : " + str(list(results.values()).count(r)))
+    return results
@@ -0,0 +1,204 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import re, bisect, threading
+
+from .utils import *
+
+
+# ==============================================================================
+# SEARCH INDEX
+#
+# Inverted index for the fbx filter box: token -> { file index : weight },
+# over the words in each file's path and in its meta data fields. Each token
+# is also indexed as "field:token", so a search can be limited to a field:
+#
+#   dragon            anything with a word starting with dragon
+#   tag:xmas red      tagged xmas*, and red* anywhere
+#   author:bob        by bob*
+#
+# Every word in the search has to match. Files are ranked by where the words
+# matched (a name beats a tag beats a path...), whole words beating
+# prefixes. Files whose path has the search text in it still match, like the
+# old filter, at the bottom.
+#
+# The index is built on a background thread when the file list changes, and
+# updated a file at a time when meta data is saved. Searching doesn't wait
+# for it, until it's ready files are only matched by path.
+# ==============================================================================
+
+SEARCH_FIELDS = {"name": 8, "uuid": 8, "tags": 6, "author": 4, "category": 3}
+SEARCH_PATH_WEIGHT = 2
+SEARCH_ALIASES = {"tag": "tags", "by": "author", "cat": "category"}
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def getSearchTokens(s):
+    return SEARCH_TOKEN_RE.findall(s.lower())
+
+
+# { token : weight } of a file
+def getFileSearchTokens(filename, metadata):
+    tokens = dict()
+
+    def add(token, weight):
+        if tokens.get(token, 0) < weight:
+            tokens[token] = weight
+
+    for t in getSearchTokens(filename):
+        add(t, SEARCH_PATH_WEIGHT)
+        add("path:" + t, SEARCH_PATH_WEIGHT)
+    if metadata is not None:
+        for field, weight in SEARCH_FIELDS.items():
+            value = metadata.get(field)
+            if not isinstance(value, str):
+                continue
+            for t in getSearchTokens(value):
+                add(t, weight)
+                add(field + ":" + t, weight)
+    return tokens
+
+
+# Splits a search into the tokens to look up, "field:token" for field:value
+def parseSearch(text):
+    terms = list()
+    for word in text.lower().split():
+        field = None
+        if ":" in word:
+            f, value = word.split(":", 1)
+            f = SEARCH_ALIASES.get(f, f)
+            if f in SEARCH_FIELDS or f == "path":
+                field = f
+                word = value
+        for t in getSearchTokens(word):
+            terms.append(field + ":" + t if field else t)
+    return terms
+
+
+class SearchIndex(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = list()
+        self.fileOf = dict()
+        self.postings = dict()
+        self.fileTokens = list()
+        # sorted tokens, for prefix matches. None when it needs sorting again
+        self.tokens = None
+        # the files being indexed, searched by path until they are
+        self.pendingFiles = list()
+        self.ready = threading.Event()
+        self.ready.set()
+
+    # Indexes a new list of files, in the background
+    def setFiles(self, files):
+        files = list(files)
+        ready = threading.Event()
+        with self.lock:
+            self.pendingFiles = files
+            self.ready = ready
+
+        def build():
+            postings = dict()
+            fileTokens = list()
+            for idx, f in enumerate(files):
+                tokens = getFileSearchTokens(f, peekMetadataFile(f))
+                fileTokens.append(tokens)
+                for t, w in tokens.items():
+                    postings.setdefault(t, dict())[idx] = w
+            with self.lock:
+                if self.ready is ready:
+                    self.files = files
+                    self.fileOf = dict((f, idx) for idx, f in enumerate(files))
+                    self.postings = postings
+                    self.fileTokens = fileTokens
+                    self.tokens = None
+            ready.set()
+
+        threading.Thread(target=build, name="SearchIndex", daemon=True).start()
+
+    # Indexes a file's meta data again, after it's been changed
+    def update(self, filename, metadata):
+        self.ready.wait()
+        with self.lock:
+            idx = self.fileOf.get(filename)
+            if idx is None:
+                return
+            for t in self.fileTokens[idx]:
+                p = self.postings.get(t)
+                if p is not None:
+                    p.pop(idx, None)
+                    if len(p) == 0:
+                        del self.postings[t]
+                        self.tokens = None
+            tokens = getFileSearchTokens(filename, metadata)
+            self.fileTokens[idx] = tokens
+            for t, w in tokens.items():
+                if t not in self.postings:
+                    self.postings[t] = dict()
+                    self.tokens = None
+                self.postings[t][idx] = w
+
+    def isReady(self):
+        return self.ready.is_set()
+
+    # Finds files
+    # - returns their indices in the file list, best first
+    # - only matches the path while the index is being built, see isReady
+    #
+    def search(self, text):
+        with self.lock:
+            if not self.ready.is_set():
+                text = text.lower().strip()
+                return [idx for idx, f in enumerate(self.pendingFiles) if text in f.lower()]
+            if self.tokens is None:
+                self.tokens = sorted(self.postings.keys())
+            scores = None
+            for term in parseSearch(text):
+                matches = dict()
+                i = bisect.bisect_left(self.tokens, term)
+                while i < len(self.tokens) and self.tokens[i].startswith(term):
+                    token = self.tokens[i]
+                    i += 1
+                    # a word with no field mustn't match field names, cat
+                    # isn't category:...
+                    if ":" in token and ":" not in term:
+                        continue
+                    bonus = 2 if token == term else 1
+                    for idx, w in self.postings[token].items():
+                        if matches.get(idx, 0) < w * bonus:
+                            matches[idx] = w * bonus
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = dict((idx, s + matches[idx]) for idx, s in scores.items() if idx in matches)
+            if scores is None:
+                scores = dict()
+
+            # plain substring of the path, like the filter always did
+            text = text.lower().strip()
+            if len(text) > 0:
+                for idx, f in enumerate(self.files):
+                    if idx not in scores and text in f.lower():
+                        scores[idx] = 0
+
+        return sorted(scores.keys(), key=lambda idx: (-scores[idx], idx))
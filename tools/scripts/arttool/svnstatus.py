@@ -0,0 +1,232 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, threading
+import xml.etree.ElementTree as ElementTree
+
+from .procrunner import getProcessRunner
+
+
+# ==============================================================================
+# SVN STATUS CACHE
+#
+# Working copy status from one "svn status -v --no-ignore --xml", instead of
+# an svn status per file. That lists every versioned and ignored file, so a
+# file it doesn't list is unversioned - including files made after the status
+# was read, like the jsons a build writes.
+#
+# During a batch (a build), files to add are queued instead of added one at a
+# time, and added with a single "svn add --parents --force" when the batch
+# ends, --force so files already added with their folder are skipped.
+# Batches nest, and can be fed from any thread.
+# ==============================================================================
+
+SVN_STATUS_TIMEOUT = 300
+SVN_ADD_TIMEOUT = 300
+# cmd.exe can't take much more than 8k
+SVN_ADD_MAX_CMD = 7000
+
+# the one letter codes svn status prints
+SVN_STATUS_CODES = {"unversioned": "?", "added": "A", "modified": "M", "deleted": "D",
+                    "missing": "!", "incomplete": "!", "conflicted": "C", "replaced": "R",
+                    "ignored": "I", "obstructed": "~", "external": "X", "merged": "G",
+                    "normal": "", "none": ""}
+
+
+def svnStatusKey(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+# Parses svn status --xml
+# - returns { key : status code }
+# - raises ElementTree.ParseError if it isn't xml
+#
+def parseSvnStatusXml(text):
+    status = dict()
+    root = ElementTree.fromstring(text)
+    for entry in root.iter("entry"):
+        wcstatus = entry.find("wc-status")
+        if wcstatus is None:
+            continue
+        code = SVN_STATUS_CODES.get(wcstatus.get("item", ""), "")
+        status[svnStatusKey(entry.get("path"))] = code
+    return status
+
+
+class SvnStatusCache(object):
+
+    def __init__(self, svnbin, root=None):
+        self.svnbin = svnbin
+        # working copy, the current folder if None
+        self.root = root
+        self.status = None
+        # False if svn status failed, we know nothing then
+        self.statusOk = False
+        self.pending = list()
+        self.pendingKeys = set()
+        self.batches = 0
+        self.lock = threading.RLock()
+        # held while svn status runs, so it runs once for everyone waiting.
+        # svn never runs with self.lock held.
+        self.refreshLock = threading.Lock()
+        # svn runs, for reports
+        self.refreshes = 0
+        self.addruns = 0
+
+    def getRoot(self):
+        return os.path.abspath(self.root if self.root is not None else ".")
+
+    # Runs svn status on the whole working copy
+    # - returns False if svn failed, everything is unmodified then
+    #
+    def refresh(self):
+        cmd = self.svnbin + ' status -v --no-ignore --xml "' + self.getRoot() + '"'
+        result = getProcessRunner().run(cmd, SVN_STATUS_TIMEOUT)
+        status = dict()
+        ok = not result.failed()
+        if ok:
+            try:
+                status = parseSvnStatusXml("".join(result.stdout))
+            except ElementTree.ParseError:
+                ok = False
+        if not ok:
+            sys.stderr.write(result.stderr)
+        with self.lock:
+            self.status = status
+            self.statusOk = ok
+            self.refreshes += 1
+        return ok
+
+    def invalidate(self):
+        with self.lock:
+            self.status = None
+
+    # Reads the status if it hasn't been yet
+    def ensureStatus(self):
+        with self.lock:
+            if self.status is not None:
+                return
+        with self.refreshLock:
+            with self.lock:
+                if self.status is not None:
+                    return
+            self.refresh()
+
+    # svn status code of a file, "" if it's unmodified
+    def getStatus(self, filename):
+        self.ensureStatus()
+        with self.lock:
+            if self.status is None or not self.statusOk:
+                return ""
+            key = svnStatusKey(filename)
+            if key in self.status:
+                return self.status[key]
+            # inside an ignored folder?
+            root = svnStatusKey(self.getRoot())
+            parent = os.path.dirname(key)
+            while len(parent) >= len(root) and parent != os.path.dirname(parent):
+                if self.status.get(parent) == "I":
+                    return "I"
+                parent = os.path.dirname(parent)
+            # svn lists everything it knows of, this is new or in a new folder
+            return "?"
+
+    def isNew(self, filename):
+        return self.getStatus(filename) == "?"
+
+    def inBatch(self):
+        with self.lock:
+            return self.batches > 0
+
+    # Starts a batch. The first one reads the status again, it may have
+    # changed since the last build.
+    #
+    def begin(self):
+        with self.lock:
+            self.batches += 1
+            if self.batches == 1:
+                self.status = None
+
+    # Ends a batch, the last one adds the queued files
+    # - returns the svn output lines
+    #
+    def end(self):
+        with self.lock:
+            self.batches = max(0, self.batches - 1)
+            if self.batches > 0:
+                return list()
+        return self.flush()
+
+    # Queues a file to be added, if it isn't already in svn
+    def queueAdd(self, filename):
+        new = self.isNew(filename)
+        with self.lock:
+            key = svnStatusKey(filename)
+            if key not in self.pendingKeys and new:
+                self.pending.append(os.path.abspath(filename))
+                self.pendingKeys.add(key)
+
+    # Adds the queued files, in as few svn runs as the command line allows
+    # - returns the svn output lines
+    #
+    def flush(self):
+        with self.lock:
+            files = self.pending
+            self.pending = list()
+            self.pendingKeys = set()
+
+        # svn add on a folder adds what's in it too
+        folders = set(svnStatusKey(f) for f in files if os.path.isdir(f))
+        def in_folder(f):
+            parent = os.path.dirname(svnStatusKey(f))
+            while parent != os.path.dirname(parent):
+                if parent in folders:
+                    return True
+                parent = os.path.dirname(parent)
+            return False
+        files = [f for f in files if not in_folder(f)]
+
+        cmds = list()
+        cmdfiles = list()
+        for f in files:
+            arg = ' "' + f + '"'
+            if len(cmds) == 0 or len(cmds[-1]) + len(arg) > SVN_ADD_MAX_CMD:
+                cmds.append(self.svnbin + " add --parents --force")
+                cmdfiles.append(list())
+            cmds[-1] += arg
+            cmdfiles[-1].append(f)
+
+        lines = list()
+        for cmd, added in zip(cmds, cmdfiles):
+            result = getProcessRunner().run(cmd, SVN_ADD_TIMEOUT)
+            lines.extend(line[:-1] for line in result.stdout)
+            with self.lock:
+                self.addruns += 1
+                if result.failed():
+                    lines.extend(result.stderr.splitlines())
+                    lines.extend(result.getErrorLines())
+                    # don't know what made it in
+                    self.status = None
+                elif self.status is not None:
+                    for f in added:
+                        self.status[svnStatusKey(f)] = "A"
+        return lines
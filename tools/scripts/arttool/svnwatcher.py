@@ -0,0 +1,94 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import time, threading, traceback
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .utils import svnNeedsUpdate
+
+
+# ==============================================================================
+# SVN WATCHER
+#
+# Checks whether the working copy is behind HEAD (or missing files) on a
+# background thread, every SVN_POLL_TIME seconds, and keeps the answer. The
+# outOfDate signal is sent when a check finds a sync is needed, so the UI
+# thread never has to wait on svn itself.
+#
+# The thread is a daemon so quitting never waits on an svn that's hung on the
+# network.
+# ==============================================================================
+
+SVN_POLL_TIME = 60 * 2
+# give the tool a moment to start up before the first check
+SVN_POLL_DELAY = 5
+
+
+class SvnWatcher(QObject):
+
+    outOfDate = pyqtSignal()
+
+    def __init__(self, interval=SVN_POLL_TIME, parent=None):
+        super(SvnWatcher, self).__init__(parent)
+        self.interval = interval
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.stopping = False
+        self.thread = None
+        self.needsUpdate = False
+        self.lastCheck = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="SvnWatcher", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+        self.wake.set()
+
+    def run(self):
+        self.wake.wait(SVN_POLL_DELAY)
+        while not self.stopping:
+            self.wake.clear()
+            try:
+                needsup = svnNeedsUpdate()
+            except Exception:
+                traceback.print_exc()
+                needsup = False
+            with self.lock:
+                self.needsUpdate = needsup
+                self.lastCheck = time.time()
+            if needsup and not self.stopping:
+                self.outOfDate.emit()
+            self.wake.wait(self.interval)
+
+    # What the last check found
+    def isOutOfDate(self):
+        with self.lock:
+            return self.needsUpdate
+
+    # Forgets the last answer and checks again now, ie. after a sync
+    def checkNow(self):
+        with self.lock:
+            self.needsUpdate = False
+        self.wake.set()
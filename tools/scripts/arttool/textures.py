@@ -0,0 +1,209 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, base64
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .maskjson import load_mask_json, write_mask_json, base64_encodeZ, base64_decodeZ, \
+    ZLIB_HEADER
+from .maskbin import isBlobKey
+
+
+# ==============================================================================
+# TEXTURE BUDGET
+#
+# Run on a mask json after it's built. Images bigger than the mask's
+# texture_max are brought down to size: by dropping their top mip levels if
+# they have them, otherwise by scaling mip-data-0 down (needs Pillow). Then
+# every image buffer is zlib'd again at the best compression level, and kept
+# if that made it smaller.
+# ==============================================================================
+
+TEXTURE_ZLIB_LEVEL = 9
+TEXTURE_MAX_DEFAULT = 256
+
+
+def isZlibBlob(s):
+    return base64.b64decode(s[:4])[:2] == ZLIB_HEADER
+
+
+# the size maskmaker would scale an image to
+def getBudgetSize(width, height, texmax):
+    if width > height:
+        if width > texmax:
+            return texmax, int(float(texmax) * float(height) / float(width))
+    elif height > texmax:
+        return int(float(texmax) * float(width) / float(height)), texmax
+    return width, height
+
+
+# Drops the top mip levels of an image until it fits in texmax
+# - returns the number of levels dropped
+#
+def dropImageMips(res, texmax):
+    width = res["width"]
+    height = res["height"]
+    levels = res.get("mip-levels", 1)
+    drop = 0
+    while max(width, height) > texmax and drop < levels - 1:
+        width = max(1, width // 2)
+        height = max(1, height // 2)
+        drop += 1
+    if drop == 0:
+        return 0
+    for i in range(levels - drop):
+        res["mip-data-" + str(i)] = res["mip-data-" + str(i + drop)]
+    for i in range(levels - drop, levels):
+        del res["mip-data-" + str(i)]
+    res["width"] = width
+    res["height"] = height
+    res["mip-levels"] = levels - drop
+    return drop
+
+
+# Scales an image with no mips down to fit in texmax
+# - returns True if it did
+#
+def scaleImage(res, texmax):
+    width = res["width"]
+    height = res["height"]
+    nwidth, nheight = getBudgetSize(width, height, texmax)
+    if Image is None or res.get("mip-levels", 1) != 1 or res.get("bpp", 4) != 4:
+        return False
+    if nwidth == width and nheight == height:
+        return False
+    img = Image.frombytes("RGBA", (width, height), base64_decodeZ(res["mip-data-0"]))
+    img = img.resize((max(1, nwidth), max(1, nheight)), Image.LANCZOS)
+    res["mip-data-0"] = base64_encodeZ(img.tobytes(), TEXTURE_ZLIB_LEVEL)
+    res["width"] = img.size[0]
+    res["height"] = img.size[1]
+    return True
+
+
+# zlib's an image's buffers again at TEXTURE_ZLIB_LEVEL
+# - returns the bytes saved
+#
+def recompressImage(res):
+    saved = 0
+    for k, v in res.items():
+        if isBlobKey(k) and isinstance(v, str) and len(v) > 0 and isZlibBlob(v):
+            nv = base64_encodeZ(base64_decodeZ(v), TEXTURE_ZLIB_LEVEL)
+            if len(nv) < len(v):
+                res[k] = nv
+                saved += len(v) - len(nv)
+    return saved
+
+
+def getImageBytes(res):
+    return sum(len(v) for k, v in res.items() if isBlobKey(k) and isinstance(v, str))
+
+
+# Enforces the texture budget on a loaded mask json, the build does this
+# with the additions so the json is only written once
+# - filename is just for the report
+# - returns a report dict, see getTextureReportLine. before and after are the
+#   size of the image buffers.
+#
+def optimizeMaskJsonTextures(j, texmax=TEXTURE_MAX_DEFAULT, filename=""):
+    report = {"file": filename, "before": 0, "after": 0, "images": 0, "dropped": 0, "scaled": 0}
+    resources = j.get("resources")
+    if not isinstance(resources, dict):
+        resources = dict()
+    for name, res in resources.items():
+        if not isinstance(res, dict) or res.get("type") != "image":
+            continue
+        report["images"] += 1
+        report["before"] += getImageBytes(res)
+        if "width" in res and "height" in res and "mip-data-0" in res:
+            report["dropped"] += dropImageMips(res, texmax)
+            if scaleImage(res, texmax):
+                report["scaled"] += 1
+        recompressImage(res)
+        report["after"] += getImageBytes(res)
+    return report
+
+
+# Enforces the texture budget on a mask json file
+# - returns a report dict, see getTextureReportLine. before and after are the
+#   size of the file.
+#
+def optimizeMaskTextures(jsonfile, texmax=TEXTURE_MAX_DEFAULT):
+    before = os.path.getsize(jsonfile)
+    j = load_mask_json(jsonfile)
+    report = optimizeMaskJsonTextures(j, texmax, jsonfile)
+    write_mask_json(jsonfile, j)
+    report["before"] = before
+    report["after"] = os.path.getsize(jsonfile)
+    return report
+
+
+def getTextureReportLine(report):
+    saved = report["before"] - report["after"]
+    line = "Textures : %s %d -> %d bytes, saved %d (%.1f%%)" % \
+           (report["file"], report["before"], report["after"], saved,
+            100.0 * saved / max(1, report["before"]))
+    if report["dropped"] > 0:
+        line += ", dropped %d mip levels" % report["dropped"]
+    if report["scaled"] > 0:
+        line += ", scaled %d images" % report["scaled"]
+    return line
+
+
+def optimizeMaskTexturesArgs(args):
+    return optimizeMaskTextures(*args)
+
+
+# Runs optimizeMaskTextures on a list of (jsonfile, texmax), in parallel
+# - returns the reports, in the same order
+#
+def optimizeTextureFiles(files, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(files) <= 1:
+        return [optimizeMaskTextures(f, t) for f, t in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(optimizeMaskTexturesArgs, files, chunksize=1))
+
+
+# python -m arttool.textures [--max=256] [-jN] file.json ...
+#
+if __name__ == "__main__":
+    texmax = TEXTURE_MAX_DEFAULT
+    workers = None
+    files = list()
+    for a in sys.argv[1:]:
+        if a.startswith("--max="):
+            texmax = int(a[6:])
+        elif a.startswith("-j"):
+            workers = int(a[2:])
+        else:
+            files.append(a)
+    reports = optimizeTextureFiles([(f, texmax) for f in files], workers)
+    for report in reports:
+        print(getTextureReportLine(report))
+    before = sum(r["before"] for r in reports)
+    after = sum(r["after"] for r in reports)
+    print("Total : %d -> %d bytes, saved %d" % (before, after, before - after))
@@ -20,7 +20,7 @@
 # ==============================================================================
 # IMPORTS
 # ==============================================================================
-import sys, os
+import sys, os, threading
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QListWidget, QVBoxLayout, QTabWidget
 from PyQt5.QtWidgets import QPushButton, QComboBox, QDateTimeEdit, QDialogButtonBox, QMessageBox
 from PyQt5.QtWidgets import QScrollArea, QMainWindow, QCheckBox, QHBoxLayout, QTextEdit
@@ -28,7 +28,8 @@ from PyQt5.QtWidgets import QLineEdit, QFrame, QDialog, QFrame, QSplitter
 from PyQt5.QtGui import QIcon, QBrush, QColor, QFont, QPixmap, QMovie
 from PyQt5.QtCore import QDateTime, Qt
 from arttool.utils import *
-from PIL import Image
+from arttool.tilesheet import buildTileSheet, getTileSheetReportLine
+from arttool.buildrunner import BuildThread, BuildLineBuffer
 
 FW = 180
 PW = 600
@@ -57,7 +58,9 @@ class TileMakerWindow(QMainWindow):
                          "width": 256,
                          "height": 256,
                          "rows": 8,
-                         "cols": 8}
+                         "cols": 8,
+                         "dedup": False,
+                         "threshold": 0.0}
 
         x = 10
         y = 10
@@ -70,58 +73,49 @@ class TileMakerWindow(QMainWindow):
         b.setParent(mainWidget)
         b.setGeometry(200, y + 20, 200, 30)
         b.setFocus()
+        self.doItButton = b
+        self.thread = None
 
         # Show the window
         self.setCentralWidget(mainWidget)
         self.setWindowTitle('Tile Maker Tool')
-        self.setGeometry(50, 50, 640, 400)
+        self.setGeometry(50, 50, 640, 480)
         self.setWindowIcon(QIcon('arttool/tilemaker.png'))
 
     # called before exit
     def finalCleanup(self):
         print("do final cleanup")
+        if self.thread is not None:
+            self.thread.wait()
 
+    # Makes the tile sheet in the background, see tilesheet.py
     def onDoIt(self):
+        if self.thread is not None:
+            return
 
         # get values
-        src = self.tiledata["src"]
-        dst = self.tiledata["dst"]
-        startFrame = self.tiledata["startFrame"]
-        endFrame = self.tiledata["endFrame"]
-        w = self.tiledata["width"]
-        h = self.tiledata["height"]
-        size = w, h
-        rows = self.tiledata["rows"]
-        cols = self.tiledata["cols"]
-
-        # make new image for the tile sheet
-        sheetw = w * cols
-        sheeth = h * rows
-        print("sheet size", sheetw, sheeth)
-        sheet = Image.new("RGBA", (sheetw, sheeth))
-
-        # paste images into it
-        frame = startFrame
-        for row in range(0, rows):
-            if frame > endFrame:
-                break
-            for col in range(0, cols):
-                if frame > endFrame:
-                    break
-                fname = (src % frame)
-                if os.path.exists(fname):
-                    print("loading", fname)
-                    tile = Image.open(src % frame)
-                    tile = tile.resize(size, Image.LANCZOS)
-                    x = w * col
-                    y = h * row
-                    sheet.paste(tile, (x, y))
-                    frame += 1
-                else:
-                    print(fname, "does not exist!")
-
-        # write it out
-        sheet.save(dst)
+        tiledata = dict(self.tiledata)
+
+        def work(output, progress, cancel):
+            return buildTileSheet(tiledata["src"], tiledata["dst"],
+                                  tiledata["startFrame"], tiledata["endFrame"],
+                                  tiledata["width"], tiledata["height"],
+                                  tiledata["rows"], tiledata["cols"],
+                                  tiledata["dedup"], tiledata["threshold"], log=output.append)
+
+        self.doItButton.setEnabled(False)
+        self.thread = BuildThread(work, BuildLineBuffer(), threading.Event())
+        self.thread.finished.connect(lambda: self.onDoItDone())
+        self.thread.start()
+
+    def onDoItDone(self):
+        thread = self.thread
+        self.thread = None
+        self.doItButton.setEnabled(True)
+        for line in thread.output.take():
+            print(line)
+        if thread.result is not None:
+            print(getTileSheetReportLine(thread.result))
 
     # --------------------------------------------------
     # Create generic widget
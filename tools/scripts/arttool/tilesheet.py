@@ -0,0 +1,295 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, time, hashlib
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .atlas import getAtlasTableFile, writeAtlasTable
+
+
+# ==============================================================================
+# TILE SHEETS
+#
+# Makes a tile sheet (sprite sheet) out of numbered frames: src % frame for
+# each frame from startFrame to endFrame, resized to width x height and laid
+# out left to right, top to bottom, in rows x cols cells.
+#
+# Frames are opened and resized in a pool of processes, and copied into one
+# sheet buffer made up front. Frame n always goes in cell n - startFrame, so
+# a missing frame leaves its cell empty rather than shifting the rest.
+#
+# With dedup on, frames that are the same as an earlier one (holds, loops)
+# share its cell instead, and the sheet only gets as many rows as it needs.
+# A threshold also merges frames that are nearly the same. Frames no longer
+# go in order then, so <dst>.atlas.json (see atlas.py) says which cell each
+# one plays from: point the sequence addition's atlas at it.
+#
+# No Qt in here, the tile maker window and the command line both use it.
+# ==============================================================================
+
+TILESHEET_DEFAULTS = {"startFrame": 1,
+                      "endFrame": 60,
+                      "width": 256,
+                      "height": 256,
+                      "rows": 8,
+                      "cols": 8,
+                      "dedup": False,
+                      "threshold": 0.0}
+
+# frames are compared at this size when there's a threshold
+TILE_SIGNATURE_SIZE = 16
+
+
+# Opens a frame and resizes it
+# - returns the RGBA bytes, None if the file doesn't exist
+#
+def loadTile(fname, width, height):
+    if not os.path.exists(fname):
+        return None
+    tile = Image.open(fname)
+    tile = tile.convert("RGBA").resize((width, height), Image.LANCZOS)
+    return tile.tobytes()
+
+
+def loadTileArgs(args):
+    return loadTile(*args)
+
+
+# (cell, frame, file name) of each frame that fits in the sheet
+def getTileFrames(src, startFrame, endFrame, rows, cols):
+    frames = list()
+    for cell in range(0, rows * cols):
+        frame = startFrame + cell
+        if frame > endFrame:
+            break
+        frames.append((cell, frame, src % frame))
+    return frames
+
+
+def loadTiles(fnames, width, height, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    args = [(f, width, height) for f in fnames]
+    if workers <= 1 or len(args) <= 1:
+        return [loadTileArgs(a) for a in args]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(loadTileArgs, args, chunksize=1))
+
+
+# Puts tiles in a sheet
+# - tiles is a list of (x, y, RGBA bytes)
+# - returns the sheet Image
+#
+def assembleSheet(sheetw, sheeth, width, height, tiles):
+    if np is None:
+        sheet = Image.new("RGBA", (sheetw, sheeth))
+        for x, y, data in tiles:
+            sheet.paste(Image.frombytes("RGBA", (width, height), data), (x, y))
+        return sheet
+    buf = np.zeros((sheeth, sheetw, 4), dtype=np.uint8)
+    for x, y, data in tiles:
+        buf[y:y + height, x:x + width] = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+    return Image.fromarray(buf, "RGBA")
+
+
+# Small version of a tile, for comparing frames that are nearly the same
+def getTileSignature(data, width, height):
+    tile = Image.frombytes("RGBA", (width, height), data)
+    return tile.resize((TILE_SIGNATURE_SIZE, TILE_SIGNATURE_SIZE), Image.BOX).tobytes()
+
+
+# mean difference of two signatures per channel, 0 to 255
+def getSignatureDifference(a, b):
+    if np is not None:
+        a = np.frombuffer(a, dtype=np.uint8).astype(np.int16)
+        b = np.frombuffer(b, dtype=np.uint8).astype(np.int16)
+        return float(np.abs(a - b).mean())
+    return sum(abs(x - y) for x, y in zip(a, b)) / float(len(a))
+
+
+# Finds frames that can share a cell
+# - tiles is a list of RGBA bytes, None for a missing frame
+# - threshold is how different (see getSignatureDifference) a frame can be
+#   from an earlier one and still use its cell, 0 for only identical frames
+# - returns the index in tiles of the frame whose cell each frame uses
+#
+def dedupTiles(tiles, width, height, threshold=0.0):
+    same = list()
+    hashes = dict()
+    kept = list()
+    for i, data in enumerate(tiles):
+        # missing frames all share one empty cell
+        h = hashlib.sha1(data).digest() if data is not None else None
+        if h in hashes:
+            same.append(hashes[h])
+            continue
+        match = i
+        if threshold > 0 and data is not None:
+            sig = getTileSignature(data, width, height)
+            best = threshold
+            for k, ksig in kept:
+                diff = getSignatureDifference(sig, ksig)
+                if diff <= best:
+                    match = k
+                    best = diff
+            if match == i:
+                kept.append((i, sig))
+        hashes[h] = match
+        same.append(match)
+    return same
+
+
+# uv table of a deduped sheet, like an atlas's
+def getTileSheetTable(dst, width, height, sheetw, sheeth, cols, frames):
+    table = {"image": os.path.basename(dst), "width": sheetw, "height": sheeth,
+             "frame-width": width, "frame-height": height, "trim": "none", "frames": list()}
+    for cell, frame, fname in frames:
+        x = width * (cell % cols)
+        y = height * (cell // cols)
+        table["frames"].append({"frame": frame,
+                                "file": os.path.basename(fname),
+                                "cell": cell,
+                                "rect": [x, y, width, height],
+                                "trim": [0, 0, width, height],
+                                "uv": [float(x) / sheetw, float(y) / sheeth,
+                                       float(x + width) / sheetw, float(y + height) / sheeth]})
+    return table
+
+
+# Makes a tile sheet
+# - dedup and threshold, see dedupTiles
+# - log(line) is called with what's happening
+# - returns a report dict, see getTileSheetReportLine
+#
+def buildTileSheet(src, dst, startFrame, endFrame, width, height, rows, cols,
+                   dedup=False, threshold=0.0, workers=None, log=print):
+    start = time.time()
+    if dedup:
+        frames = [(None, frame, src % frame) for frame in range(startFrame, endFrame + 1)]
+    else:
+        frames = getTileFrames(src, startFrame, endFrame, rows, cols)
+    loaded = loadTiles([f for cell, frame, f in frames], width, height, workers)
+
+    table = None
+    cells = len(frames)
+    if dedup:
+        # cells go to the first of each set of frames that are the same
+        same = dedupTiles(loaded, width, height, threshold)
+        cellOf = dict()
+        for i in range(0, len(frames)):
+            if same[i] == i:
+                cellOf[i] = len(cellOf)
+        dedupFrames = list()
+        for i, (cell, frame, fname) in enumerate(frames):
+            if cellOf[same[i]] >= rows * cols:
+                log("no room for frame %d on, the sheet is full" % frame)
+                loaded = loaded[:i]
+                break
+            dedupFrames.append((cellOf[same[i]], frame, fname))
+        frames = dedupFrames
+        cells = len(set(cell for cell, frame, fname in frames))
+        rows = min(rows, (cells + cols - 1) // cols)
+
+    sheetw = width * cols
+    sheeth = height * rows
+    log("sheet size %d %d" % (sheetw, sheeth))
+
+    tiles = list()
+    missing = list()
+    used = set()
+    for (cell, frame, fname), data in zip(frames, loaded):
+        if data is None:
+            log(fname + " does not exist!")
+            missing.append(fname)
+            continue
+        if cell not in used:
+            used.add(cell)
+            tiles.append((width * (cell % cols), height * (cell // cols), data))
+
+    sheet = assembleSheet(sheetw, sheeth, width, height, tiles)
+    sheet.save(dst)
+    if dedup:
+        table = getAtlasTableFile(dst)
+        writeAtlasTable(table, getTileSheetTable(dst, width, height, sheetw, sheeth, cols, frames))
+        log("sequence : atlas=%s (first=0 last=%d)" % (table, len(frames) - 1))
+    return {"file": dst, "width": sheetw, "height": sheeth, "frames": len(frames) - len(missing),
+            "cells": cells, "table": table, "missing": missing, "seconds": time.time() - start}
+
+
+def getTileSheetReportLine(report):
+    line = "Tile sheet : %s %dx%d, %d frames" % \
+           (report["file"], report["width"], report["height"], report["frames"])
+    if report["table"] is not None:
+        line += " in %d cells" % report["cells"]
+    line += " in %.2fs" % report["seconds"]
+    if len(report["missing"]) > 0:
+        line += ", %d missing" % len(report["missing"])
+    return line
+
+
+# python -m arttool.tilesheet [--start=1] [--end=60] [--width=256] [--height=256]
+#                             [--rows=8] [--cols=8] [--dedup] [--threshold=0.0] [-jN]
+#                             src%02d.png dst.png
+# - returns the exit code
+#
+def tileSheetMain(argv, prog="python -m arttool.tilesheet"):
+    args = dict(TILESHEET_DEFAULTS)
+    options = {"--start=": "startFrame", "--end=": "endFrame", "--width=": "width",
+               "--height=": "height", "--rows=": "rows", "--cols=": "cols"}
+    workers = None
+    files = list()
+    for a in argv:
+        opt = [o for o in options if a.startswith(o)]
+        if len(opt) > 0:
+            args[options[opt[0]]] = int(a[len(opt[0]):])
+        elif a == "--dedup":
+            args["dedup"] = True
+        elif a.startswith("--threshold="):
+            args["threshold"] = float(a[12:])
+            args["dedup"] = True
+        elif a.startswith("-j"):
+            workers = int(a[2:])
+        else:
+            files.append(a)
+    if len(files) != 2 or Image is None:
+        usage = "usage: " + prog
+        print(usage + " [--start=1] [--end=60] [--width=256] [--height=256]")
+        print(" " * len(usage) + " [--rows=8] [--cols=8] [--dedup] [--threshold=0.0] [-jN]")
+        print(" " * len(usage) + " src%02d.png dst.png")
+        if Image is None:
+            print("needs Pillow")
+        return 1
+    report = buildTileSheet(files[0], files[1], workers=workers, **args)
+    print(getTileSheetReportLine(report))
+    return 1 if len(report["missing"]) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(tileSheetMain(sys.argv[1:]))
@@ -20,37 +20,95 @@
 # ==============================================================================
 # IMPORTS
 # ==============================================================================
-import sys, subprocess, os, json, uuid, boto3
+import sys, os, json, uuid, hashlib, threading
 from copy import deepcopy
-from .additions import perform_addition
-
-def fixpath(p):
-    p = p.replace("\\", "/")
-    b = p.split("/")
-    for i in range(0, len(b)):
-        if " " in b[i]:
-            b[i] = '"' + b[i] + '"'
-    return "\\".join(b)
+from .additionsteps import perform_addition, perform_additions, fixpath, shellpath, get_maskmaker_bin
+from .additionsteps import maskmaker_command
+from .metacache import MetaDataCache
+from .buildcache import BuildCache, hashFile
+from .maskjson import merge_masks
+from .procrunner import execute, executeAll, PROC_TIMEOUT
+from .svnstatus import SvnStatusCache
 
 
 # ==============================================================================
 # FILE LOCATIONS
+#
+# Everything is found relative to the art folder (the svn working copy),
+# which is the current folder. Importing this module doesn't change folder:
+# the tool and the command line call setArtFolder() when they start, which
+# goes to the folder they're given, $ART_FOLDER, or whichever artist's art
+# folder is on this machine.
+#
+# Heavy modules (boto3, numpy, PIL) aren't imported until they're needed, so
+# this stays quick to import and works headless.
+#
+# svn is TortoiseSVN's on Windows and whatever svn is on the path elsewhere,
+# maskmaker is the one in the art folder. $ART_SVN and $ART_MASKMAKER
+# override them, for build machines.
 # ==============================================================================
 
-# Make sure we are in the right place. Clyde has issues.
+# Clyde has issues.
 CLYDE_HOME = "F:\\\\Work\\StreamLabs\\SLOBS\\SLART"
-if os.path.exists(CLYDE_HOME):
-    os.chdir(CLYDE_HOME)
 JAKE_HOME = "G:\\\\STREAMLABS\\slart"
-if os.path.exists(JAKE_HOME):
-    os.chdir(JAKE_HOME)
 ROSS_HOME = "C:\\\\STREAMLABS\\slart"
-if os.path.exists(ROSS_HOME):
-    os.chdir(ROSS_HOME)
+ART_HOMES = [CLYDE_HOME, JAKE_HOME, ROSS_HOME]
+ART_FOLDER_ENV = "ART_FOLDER"
+ART_SVN_ENV = "ART_SVN"
+
+
+def findSvnPath():
+    svn = os.environ.get(ART_SVN_ENV)
+    if svn:
+        return svn
+    if os.name == "nt":
+        return os.path.join("c:\\", "Program Files", "TortoiseSVN", "bin", "svn.exe")
+    return "svn"
+
+
+# svn, and how it goes on a command line
+SVNPATH = findSvnPath()
+SVNBIN = shellpath(SVNPATH)
+
+
+# The art folder to use
+# - returns None if there's nothing to go on, and we should stay put
+#
+def findArtFolder():
+    folder = os.environ.get(ART_FOLDER_ENV)
+    if folder:
+        return folder
+    # the last one that exists, like it always was
+    found = None
+    for home in ART_HOMES:
+        if os.path.exists(home):
+            found = home
+    return found
+
+
+# Goes to the art folder, see findArtFolder
+# - returns the art folder
+#
+def setArtFolder(folder=None):
+    if folder is None:
+        folder = findArtFolder()
+    if folder is not None:
+        os.chdir(folder)
+    return os.getcwd()
+
+
+def getMaskmakerBin():
+    return get_maskmaker_bin()
+
+
+def getMorphRestFile():
+    return fixpath(os.path.abspath("./morphs/morph_rest.fbx"))
 
-SVNBIN = os.path.abspath(os.path.join("c:\\", '"Program Files"', "TortoiseSVN", "bin", "svn.exe"))
-MASKMAKERBIN = fixpath(os.path.abspath("./maskmaker/maskmaker.exe"))
-MORPHRESTFILE = fixpath(os.path.abspath("./morphs/morph_rest.fbx"))
+
+# seconds before a hung command is killed
+MASKMAKER_TIMEOUT = PROC_TIMEOUT
+SVN_TIMEOUT = 120
+SVN_UPDATE_TIMEOUT = 3600
 
 
 
@@ -60,6 +118,7 @@ MORPHRESTFILE = fixpath(os.path.abspath("./morphs/morph_rest.fbx"))
 S3_BUCKET = "facemasks-cdn.streamlabs.com"
 
 def s3_upload(filename, key):
+    import boto3
     f = open(fixpath(os.path.abspath(filename)), "rb")
     s3 = boto3.resource("s3")
     cunt_type = "application/octet-stream"
@@ -79,23 +138,6 @@ def s3_upload(filename, key):
 # SYSTEM STUFF
 # ==============================================================================
 
-# Executes a shell command
-# usage:
-# 
-# for line in execute(cmd):
-#   print(line)
-#
-def execute(cmd):
-    popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True, shell=True)
-    for stdout_line in iter(popen.stdout.readline, ""):
-        yield stdout_line
-    popen.stdout.close()
-    return_code = popen.wait()
-    if return_code:
-        # raise subprocess.CalledProcessError(return_code, cmd)
-        yield "ERROR " + cmd.split()[0] + " FAILED EXECUTION."
-
-
 # Gets a list of fbx files
 def getFbxFileList(folder):
     fileList = list()
@@ -145,7 +187,7 @@ def make_path_relative(base, path):
 def svnFileMissing():
     # run status and look for !
     cmd = SVNBIN + ' status -uq'
-    for line in execute(cmd):
+    for line in execute(cmd, SVN_TIMEOUT):
         if line.split()[0] in ["!"]:
             return True
     return False
@@ -155,7 +197,7 @@ def svnUpdate(outputWindow=None):
     # run update
     cmd = SVNBIN + ' update'
     arttoolUpdated = False
-    for line in execute(cmd):
+    for line in execute(cmd, SVN_UPDATE_TIMEOUT):
         if outputWindow:
             if "arttool" in line:
                 arttoolUpdated = True
@@ -165,35 +207,34 @@ def svnUpdate(outputWindow=None):
     return arttoolUpdated
 
 
-def svnNeedsUpdate():
-    # have
-    cmd = SVNBIN + ' info'
-    revHave = 0
-    for line in execute(cmd):
+def getSvnLastChangedRev(lines):
+    for line in lines:
         if "Last Changed Rev" in line:
-            revHave = int(line.split()[-1])
+            return int(line.split()[-1])
+    return 0
 
-    # head
-    cmd = SVNBIN + ' info -r HEAD'
-    revHead = 0
-    for line in execute(cmd):
-        if "Last Changed Rev" in line:
-            revHead = int(line.split()[-1])
 
-    return (revHead > revHave) or svnFileMissing()
+def svnNeedsUpdate():
+    # have, head and missing files, all at once
+    have, head, status = executeAll([SVNBIN + ' info', SVNBIN + ' info -r HEAD',
+                                     SVNBIN + ' status -uq'], SVN_TIMEOUT)
+    revHave = getSvnLastChangedRev(have.stdout)
+    revHead = getSvnLastChangedRev(head.stdout)
+    missing = any(len(line.split()) > 0 and line.split()[0] in ["!"] for line in status.stdout)
+    return (revHead > revHave) or missing
 
 
 def svnNeedsCommit():
     cmd = SVNBIN + ' status -uq'
-    for line in execute(cmd):
+    for line in execute(cmd, SVN_TIMEOUT):
         if line.split()[0] in ["A", "M", "D"]:
             return True
     return False
 
 
 def svnGetFileStatus(filename):
-    cmd = SVNBIN + ' status ' + os.path.abspath(filename)
-    for line in execute(cmd):
+    cmd = SVNBIN + ' status ' + shellpath(os.path.abspath(filename))
+    for line in execute(cmd, SVN_TIMEOUT):
         return line.split()[0]
     return ""
 
@@ -202,32 +243,48 @@ def svnIsFileNew(filename):
     return svnGetFileStatus(filename) == "?"
 
 
+# Working copy status for batches, see svnstatus.py
+SVN_STATUS = SvnStatusCache(SVNBIN)
+
+
+# one svn status and add at a time outside a batch, svn locks the working
+# copy and a second one fails while it's held
+SVN_ADD_LOCK = threading.Lock()
+
+
+# In a batch the add is queued for svnEndBatch, otherwise it's done now
 def svnAddFile(filename):
-    if svnIsFileNew(filename):
-        cmd = SVNBIN + " add " + fixpath(filename)
-        for line in execute(cmd):
-            pass
+    if SVN_STATUS.inBatch():
+        SVN_STATUS.queueAdd(filename)
+        return
+    with SVN_ADD_LOCK:
+        if svnIsFileNew(filename):
+            cmd = SVNBIN + " add " + shellpath(fixpath(filename))
+            for line in execute(cmd, SVN_TIMEOUT):
+                pass
+
+
+def svnBeginBatch():
+    SVN_STATUS.begin()
+
+
+# Adds the files queued since svnBeginBatch
+def svnEndBatch(outputWindow=None):
+    for line in SVN_STATUS.end():
+        if outputWindow:
+            outputWindow.append(line)
+        else:
+            print(line)
 
 
 # ==============================================================================
 # MASKMAKER
 # ==============================================================================
 def maskmaker(command, kvpairs, files):
-    cmd = MASKMAKERBIN + " " + command
-    for k, v in kvpairs.items():
-        if command == "tweak":
-            cmd += ' "' + k + '=' + v + '"'
-        elif type(v) is str:
-            cmd += " " + k + '="' + v + '"'
-        else:
-            cmd += " " + k + '=' + str(v)
-
-    for f in files:
-        cmd += " " + f
-
+    cmd = maskmaker_command(command, kvpairs, files)
     print("---maskmaker-------")
     print(cmd)
-    for line in execute(cmd):
+    for line in execute(cmd, MASKMAKER_TIMEOUT):
         yield line[:-1]
     print(" ")
 
@@ -247,7 +304,7 @@ def mmImport(fbxfile, metadatain):
     d = mmGetCreateKeys(metadata)
     jsonfile = jsonFromFbx(fbxfile)
     if metadata["is_morph"]:
-        d["restfile"] = MORPHRESTFILE
+        d["restfile"] = getMorphRestFile()
         d["posefile"] = os.path.abspath(fbxfile)
         for line in maskmaker("morphimport", d, [jsonfile]):
             yield line
@@ -257,22 +314,27 @@ def mmImport(fbxfile, metadatain):
             yield line
 
 
+# Same as "maskmaker merge", without the maskmaker. See maskjson.py
+#
 def mmMerge(jsonfile, metadatain):
     files = list()
     metadata = cleanMetadata(metadatain)
     for f in metadata["additions"]:
         if len(f) > 0:
-            files.append(fixpath(os.path.abspath(f.lower().replace(".fbx",".json"))))
-    files.append(fixpath(os.path.abspath(jsonfile)))
+            files.append(os.path.abspath(f.lower().replace(".fbx",".json")))
     d = mmGetCreateKeys(metadata)
-    for line in maskmaker("merge", d, files):
+    try:
+        lines = merge_masks(files, d, os.path.abspath(jsonfile))
+    except Exception as e:
+        lines = ["ERROR merging " + jsonfile + " : " + str(e)]
+    for line in lines:
         yield line
 
 
 def mmDepends(fbxfile):
-    cmd = MASKMAKERBIN + " depends " + '"' + os.path.abspath(fbxfile) + '"'
+    cmd = shellpath(getMaskmakerBin()) + " depends " + shellpath(os.path.abspath(fbxfile))
     deps = list()
-    for line in execute(cmd):
+    for line in execute(cmd, MASKMAKER_TIMEOUT):
         deps.append(line[:-1])
     return deps
 
@@ -281,6 +343,10 @@ def mmDepends(fbxfile):
 # META DATA
 # ==============================================================================
 
+# All meta data/config reads go through here, see metacache.py
+METADATA_CACHE = MetaDataCache()
+
+
 def newMetaData(fbxfile):
     # create new metadata
     metadata = dict()
@@ -297,6 +363,7 @@ def newMetaData(fbxfile):
     metadata["is_vip"] = False
     metadata["is_intro"] = False
     metadata["texture_max"] = 256
+    metadata["quantize_meshes"] = False
     metadata["release_with_plugin"] = False
     metadata["do_not_release"] = False
     metadata["intro_fade_time"] = 0.333333
@@ -342,7 +409,9 @@ def writeMetaData(metafile, metadata, dosvn=False):
     except:
         print("WRITING", metafile, "FAILED")
         print("WHAT THE HELL MAN")
+        METADATA_CACHE.forget(metafile)
     else:
+        METADATA_CACHE.put(metafile, deepcopy(metadata))
         if dosvn:
             svnAddFile(metafile)
 
@@ -354,17 +423,20 @@ def createGetMetaData(fbxfile):
     metadata = dict()
     if os.path.exists(metafile):
         # read existing metadata
-        f = open(metafile, "r")
-        contents = f.read()
-        f.close()
-        if len(contents) < 1:
+        try:
+            metadata = METADATA_CACHE.get(metafile)
+        except ValueError:
+            if os.path.getsize(metafile) > 0:
+                raise
+            metadata = None
+        if metadata is None:
             print("EMPTY META FILE:", metafile)
             # make new metadata and write it
             metadata = newMetaData(fbxfile)
             writeMetaData(metafile, metadata, True)
 
         else:
-            metadata = json.loads(contents)
+            metadata = deepcopy(metadata)
 
             # Fix missing/incorrect fields
             #
@@ -380,6 +452,8 @@ def createGetMetaData(fbxfile):
                 metadata["intro_duration"] = 2.13333
             if "release_with_plugin" not in metadata:
                 metadata["release_with_plugin"] = False
+            if "quantize_meshes" not in metadata:
+                metadata["quantize_meshes"] = False
     else:
         # make new metadata and write it
         metadata = newMetaData(fbxfile)
@@ -476,44 +550,37 @@ def checkMetaDataFile(fbxfile):
         return CHECKMETA_ERROR, masktype
 
     # read existing metadata
-    metadata = dict()
-    f = open(metafile, "r")
-    fc = f.read()
-    f.close()
-
-    if len(fc) > 0:
-        try:
-            metadata = json.loads(fc)
-        except:
+    try:
+        metadata = METADATA_CACHE.get(metafile)
+    except ValueError:
+        if os.path.getsize(metafile) > 0:
             print("FUCKED UP META DATA!", metafile)
-            return CHECKMETA_ERROR, MASK_UNKNOWN
-    else:
-        print("EMPTY META DATA FILE", metafile)
+        else:
+            print("EMPTY META DATA FILE", metafile)
         return CHECKMETA_ERROR, MASK_UNKNOWN
+    if metadata is None:
+        return CHECKMETA_ERROR, masktype
 
     # check it
     return checkMetaData(metadata)
 
 
 # No error checking
-def loadMetadataFile(fbxfile):
+# - returns the cached metadata, don't modify it
+def peekMetadataFile(fbxfile):
     metafile = getMetaFileName(fbxfile)
-    if not os.path.exists(metafile):
+    try:
+        return METADATA_CACHE.get(metafile)
+    except ValueError:
         return None
 
-    # read metafile
-    f = open(metafile, "r")
-    fc = f.read()
-    f.close()
-
-    metadata = None
-    if len(fc) > 0:
-        try:
-            metadata = json.loads(fc)
-        except:
-            metadata = None
 
-    return metadata
+# No error checking
+def loadMetadataFile(fbxfile):
+    metadata = peekMetadataFile(fbxfile)
+    if metadata is None:
+        return None
+    return deepcopy(metadata)
 
 
 
@@ -524,7 +591,7 @@ def getCombinedComboMeta(metadata):
     if metadata["fbx"].lower().endswith(".json"):
         for f in metadata["additions"]:
             if len(f) > 0:
-                md = loadMetadataFile(f)
+                md = peekMetadataFile(f)
                 tt = md["tags"].split(",")
                 for ttt in tt:
                     ttt = ttt.strip()
@@ -549,55 +616,6 @@ def getCombinedComboMeta(metadata):
 # DEPENDENCIES
 # ==============================================================================
 
-def doesFileNeedRebuilding(filename, metadata=None):
-    if metadata is None:
-        metadata = loadMetadataFile(filename)
-    metafile = getMetaFileName(filename)
-    if filename.lower().endswith(".fbx"):
-        jsonfile = filename.lower().replace(".fbx",".json")
-        fbxmodtime = os.path.getmtime(filename)
-        # missing json
-        if not os.path.exists(jsonfile):
-            return True
-        jsonmodtime = os.path.getmtime(jsonfile)
-        # fbx modtime
-        if fbxmodtime > jsonmodtime:
-            return True
-        # missing meta
-        if not os.path.exists(metafile):
-            return True
-        # meta modtime
-        if os.path.getmtime(metafile) > jsonmodtime:
-            return True
-        # dependencies
-        for dep in metadata["dependencies"]:
-            f = os.path.abspath(dep["file"])
-            if os.path.exists(f):
-                if os.path.getmtime(f) > jsonmodtime:
-                    return True
-            else:
-                return True
-
-    else: # .json (combo)
-        # missing json
-        if not os.path.exists(filename):
-            return True
-        jsonmodtime = os.path.getmtime(filename)
-        # meta modtime
-        if os.path.getmtime(metafile) > jsonmodtime:
-            return True
-        # dependencies
-        for dep in metadata["dependencies"]:
-            f = os.path.abspath(dep["file"])
-            if os.path.exists(f):
-                if os.path.getmtime(f) > jsonmodtime:
-                    return True
-            else:
-                return True
-
-    return False
-
-
 def getComboDependencies(metadata):
     # save mod times of dependent jsons
     combodeps = list()
@@ -640,16 +658,132 @@ def getDependencies(metadata):
         return getComboDependencies(metadata)
 
 
+# ==============================================================================
+# BUILD CACHE
+# ==============================================================================
+
+# bump this to invalidate every cached build
+BUILD_CACHE_VERSION = 3
+
+buildCache = None
+
+def getBuildCache():
+    global buildCache
+    if buildCache is None:
+        buildCache = BuildCache(getBuildCacheFolder())
+    return buildCache
+
+
+# Hash of everything maskmaker reads to build a mask or combo
+# - returns None if we can't tell, ie. it's never been built or an input is missing
+#
+def getBuildInputHash(filename, metadata):
+    if metadata is None or "dependencies" not in metadata:
+        return None
+
+    h = hashlib.sha1()
+    def add(s):
+        h.update(s.encode("utf-8"))
+        h.update(b"\0")
+    def addFile(f):
+        fh = hashFile(f)
+        if fh is None:
+            return False
+        add(fh)
+        return True
+
+    add(str(BUILD_CACHE_VERSION))
+    # maskmaker itself, by content so a fresh checkout doesn't empty the cache
+    mmhash = hashFile(getMaskmakerBin())
+    if mmhash is not None:
+        add(mmhash)
+
+    # meta data
+    md = cleanMetadata(metadata)
+    d = mmGetCreateKeys(md)
+    for k in ["is_morph", "depth_head", "additions", "quantize_meshes"]:
+        if k in md:
+            d[k] = md[k]
+    add(json.dumps(d, sort_keys=True))
+
+    # input files
+    if filename.lower().endswith(".fbx"):
+        if not addFile(filename):
+            return None
+        if md["is_morph"] and not addFile(getMorphRestFile()):
+            return None
+        for addn in md.get("additions", list()):
+            if "file" in addn and not addFile(addn["file"]):
+                return None
+            if len(addn.get("atlas", "")) > 0 and not addFile(addn["atlas"]):
+                return None
+    for dep in md["dependencies"]:
+        add(dep["file"])
+        if not addFile(dep["file"]):
+            return None
+
+    return h.hexdigest()
+
+
+# Restores a build from the cache if its inputs haven't changed
+# - returns (deps, missing) like a build, or None if there was nothing cached
+#
+def restoreBuild(filename, jsonfile, outputWindow, metadata):
+    inhash = getBuildInputHash(filename, metadata)
+    if inhash is None or not getBuildCache().contains(inhash):
+        return None
+
+    # the recorded dependencies are still right, just refresh their mod times
+    deps = list()
+    for dep in metadata["dependencies"]:
+        deps.append({"file": dep["file"], "modtime": os.path.getmtime(dep["file"])})
+    metadata["dependencies"] = deps
+    metafile = getMetaFileName(filename)
+    writeMetaData(metafile, metadata, True)
+
+    # json last, so it is newer than the meta file
+    if not getBuildCache().restore(inhash, jsonfile):
+        return None
+    outputWindow.append("Restored " + jsonfile + " from build cache.")
+    svnAddFile(jsonfile)
+    return deps, list()
+
+
+# Passes lines on to the output window, noting any errors
+class BuildOutputCheck(object):
+
+    def __init__(self, outputWindow):
+        self.outputWindow = outputWindow
+        self.failed = False
+
+    def append(self, line):
+        if line.startswith("ERROR"):
+            self.failed = True
+        self.outputWindow.append(line)
+
+
+def storeBuild(filename, jsonfile, metadata):
+    inhash = getBuildInputHash(filename, metadata)
+    if inhash is not None and os.path.exists(jsonfile):
+        getBuildCache().store(inhash, jsonfile)
+
+
 # ==============================================================================
 # BUILD
 # ==============================================================================
 
 
-def buildCombo(combofile, outputWindow, metadata=None):
+def buildCombo(combofile, outputWindow, metadata=None, usecache=True):
 
     if metadata is None:
         metadata = loadMetadataFile(combofile)
 
+    # unchanged since it was last built?
+    if usecache:
+        r = restoreBuild(combofile, combofile, outputWindow, metadata)
+        if r is not None:
+            return r
+
     # save dependencies
     deps, missing = getDependencies(metadata)
     metadata["dependencies"] = deps
@@ -657,18 +791,29 @@ def buildCombo(combofile, outputWindow, metadata=None):
     writeMetaData(metafile, metadata, True)
 
     # run maskmaker merge, add json to svn
+    output = BuildOutputCheck(outputWindow)
     for line in mmMerge(combofile, metadata):
-        outputWindow.append(line)
+        output.append(line)
     svnAddFile(combofile)
 
+    if len(missing) == 0 and not output.failed:
+        storeBuild(combofile, combofile, metadata)
+
     return deps,missing
 
 
-def buildMask(fbxfile, outputWindow, metadata=None):
+def buildMask(fbxfile, outputWindow, metadata=None, usecache=True):
 
     if metadata is None:
         metadata = loadMetadataFile(fbxfile)
 
+    # unchanged since it was last built?
+    if usecache:
+        r = restoreBuild(fbxfile, jsonFromFbx(fbxfile), outputWindow, metadata)
+        if r is not None:
+            return r
+    outputWindow = BuildOutputCheck(outputWindow)
+
     # save dependencies
     deps, missing = getDependencies(metadata)
     metadata["dependencies"] = deps
@@ -683,33 +828,24 @@ def buildMask(fbxfile, outputWindow, metadata=None):
     jsonfile = jsonFromFbx(fbxfile)
     svnAddFile(jsonfile)
 
-    # add depth head
-    if metadata["depth_head"]:
-        # material
-        kvp = {"type": "material",
-               "name": "depth_head_mat",
-               "effect": "effectDefault",
-               "depth-only": True}
-        for line in maskmaker("addres", kvp, [jsonfile]):
-            outputWindow.append(line)
-        # model
-        kvp = {"type": "model",
-               "name": "depth_head_mdl",
-               "mesh": "meshHead",
-               "material": "depth_head_mat"}
-        for line in maskmaker("addres", kvp, [jsonfile]):
-            outputWindow.append(line)
-        # part
-        kvp = {"type": "model",
-               "name": "depth_head",
-               "resource": "depth_head_mdl"}
-        for line in maskmaker("addpart", kvp, [jsonfile]):
-            outputWindow.append(line)
+    # depth head, additions, the texture budget and the mesh optimiser (weld,
+    # reorder and maybe quantise), all in one pass over the json
+    from .textures import optimizeMaskJsonTextures, getTextureReportLine
+    from .meshopt import optimizeMaskJsonMeshes, getMeshReportLine
+    texmax = int(metadata["texture_max"])
+    quantize = metadata.get("quantize_meshes", False)
 
-    # additions
-    if "additions" in metadata:
-        for addn in metadata["additions"]:
-            perform_addition(addn, jsonfile, outputWindow)
+    def textures(j):
+        return [getTextureReportLine(optimizeMaskJsonTextures(j, texmax, jsonfile))]
+
+    def meshes(j):
+        return [getMeshReportLine(optimizeMaskJsonMeshes(j, quantize, jsonfile))]
+
+    perform_additions(metadata.get("additions", list()), jsonfile, outputWindow,
+                      metadata["depth_head"], [textures, meshes])
+
+    if len(missing) == 0 and not outputWindow.failed:
+        storeBuild(fbxfile, jsonfile, metadata)
 
     return deps,missing
 
@@ -748,17 +884,21 @@ def getConfigFile():
     return os.path.join(fldr, "config.json")
 
 
+def getBuildCacheFolder():
+    fldr = getConfigFolder()
+    return os.path.join(fldr, "buildcache")
+
+
 def createGetConfig():
     try:
         fldr = getConfigFolder()
         createMetaFolder(fldr)
         metafile = getConfigFile()
-        config = dict()
-        if os.path.exists(metafile):
-            f = open(metafile, "r")
-            config = json.loads(f.read())
-            f.close()
+        config = METADATA_CACHE.get(metafile)
+        if config is not None:
+            config = deepcopy(config)
         else:
+            config = dict()
             config["x"] = 50
             config["y"] = 50
         writeMetaData(metafile, config)
@@ -66,15 +66,16 @@ def installPipModule(modname):
 # ==============================================================================
 # IMPORTS
 # ==============================================================================
-import sys, os, subprocess
+import sys, os, subprocess, importlib.util
 try:
 	from PyQt5.QtWidgets import QApplication
 except:
 	installPipModule("PyQt5")
-try:
-	import boto3
-except:
+# just check they're there, they're only imported when they're needed
+if importlib.util.find_spec("boto3") is None:
 	installPipModule("boto3")
+if importlib.util.find_spec("numpy") is None:
+	installPipModule("numpy")
 
 """
 try:
@@ -89,12 +90,16 @@ except:
 
 
 from arttool import arttool
+from arttool.utils import setArtFolder
 
 # ==============================================================================
 # MAIN ENTRY POINT
 # ==============================================================================
 if __name__ == '__main__':
 
+    # Work in the art folder
+    setArtFolder()
+
     # We're a Qt App
     app = QApplication(sys.argv)
 
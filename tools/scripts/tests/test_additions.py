@@ -0,0 +1,144 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, sys, shutil
+from copy import deepcopy
+
+import pytest
+
+from arttool.additionsteps import *
+
+
+# ==============================================================================
+# ADDITIONS PARITY TESTS
+#
+# perform_additions applies every step in process, and has to write the same
+# json byte for byte as running maskmaker once per step. fixtures/additions
+# has a base mask made with maskmaker, and maskmaker's output for each case
+# below applied to it. To make them again after changing maskmaker:
+#
+#   cd tools/scripts
+#   ART_MASKMAKER=path/to/maskmaker PYTHONPATH=. python tests/test_additions.py
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "additions")
+
+
+def addition(kind, **fields):
+    a = deepcopy(ADDITIONS[kind])
+    for k, v in fields.items():
+        a[k.replace("_", "-")] = v
+    return a
+
+
+# name : (additions, depth head)
+ADDITION_CASES = {
+    "depth_head": ([], True),
+    "image": ([addition("image", name="extra", file="extra.png")], False),
+    "sequence": ([addition("sequence", name="seq", image="diffuse", rows=2, cols=2, last=3,
+                           rate=8.0, random_start=True)], False),
+    "material": ([addition("material", name="mat2", image="texture,diffuse", culling="none",
+                           opaque=False)], False),
+    "model": ([addition("model", name="mdl2", mesh="mesh1", material="mat")], False),
+    "emitter": ([addition("emitter", name="sparks", model="mdl", part="emitter1",
+                          rate_min=2.0, rate_max=5.0, lifetime=0.75,
+                          force_max=[1.0, 12.5, -3.0])], False),
+    "tweak": ([addition("tweak", tweak1="parts.face.position.y=2.5",
+                        tweak2="resources.mat.opaque=false",
+                        tweak3="tier=2", tweak4="parts.face.scale=2,2,2")], False),
+    "all": ([addition("image", name="extra", file="extra.png"),
+             addition("sequence", name="seq", image="extra", rows=1, cols=2, last=1),
+             addition("material", name="mat2", image="texture,extra"),
+             addition("model", name="mdl2", mesh="mesh1", material="mat2"),
+             addition("emitter", name="sparks", model="mdl2", part="emitter1"),
+             addition("tweak", tweak1="resources.sparks.lifetime=4")], True),
+}
+
+
+class Output(object):
+
+    def __init__(self):
+        self.lines = list()
+
+    def append(self, line):
+        self.lines.append(line)
+
+
+def readFixture(name):
+    f = open(os.path.join(FIXTURES, name), "rb")
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+# Applies a case to a copy of the base mask, in the fixtures folder so the
+# additions' files are found
+# - returns the json file's bytes
+#
+def applyCase(name, tmpdir, perform):
+    additions, depth_head = ADDITION_CASES[name]
+    jsonfile = os.path.join(str(tmpdir), name + ".json")
+    shutil.copyfile(os.path.join(FIXTURES, "base.json"), jsonfile)
+    cwd = os.getcwd()
+    os.chdir(FIXTURES)
+    try:
+        perform(additions, jsonfile, depth_head)
+    finally:
+        os.chdir(cwd)
+    f = open(jsonfile, "rb")
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+def performInProcess(additions, jsonfile, depth_head):
+    output = Output()
+    perform_additions(additions, jsonfile, output, depth_head)
+    assert not any("running maskmaker" in line for line in output.lines)
+
+
+def performWithMaskmaker(additions, jsonfile, depth_head):
+    steps = get_depth_head_steps() if depth_head else list()
+    for a in additions:
+        steps += get_addition_steps(a)
+    perform_steps_maskmaker(steps, jsonfile, Output())
+
+
+@pytest.mark.parametrize("name", sorted(ADDITION_CASES.keys()))
+def test_additions_match_maskmaker(name, tmpdir):
+    assert applyCase(name, tmpdir, performInProcess) == readFixture(name + ".json")
+
+
+if __name__ == "__main__":
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    for name in sorted(ADDITION_CASES.keys()):
+        data = applyCase(name, tmpdir, performWithMaskmaker)
+        f = open(os.path.join(FIXTURES, name + ".json"), "wb")
+        f.write(data)
+        f.close()
+        print("wrote", name + ".json")
+    shutil.rmtree(tmpdir)
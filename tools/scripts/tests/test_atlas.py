@@ -0,0 +1,152 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, random
+
+import pytest
+
+from arttool.atlas import *
+
+
+# ==============================================================================
+# ATLAS TESTS
+#
+# The max-rects packer and packAtlas: nothing overlaps, there's padding
+# between rects, and the atlas is the smallest power of two size they fit in.
+# buildAtlas is run on a few frames made here, for the uv table.
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+def checkPacking(sizes, aw, ah, placed, padding):
+    assert len(placed) == len(sizes)
+    rects = list()
+    for (w, h), (x, y) in zip(sizes, placed):
+        assert x >= 0 and y >= 0
+        assert x + w <= aw and y + h <= ah
+        rects.append((x, y, w, h))
+    # grown by the padding, no two rects may touch
+    for i, a in enumerate(rects):
+        for b in rects[i + 1:]:
+            assert not rectsOverlap((a[0], a[1], a[2] + padding, a[3] + padding), b)
+            assert not rectsOverlap((b[0], b[1], b[2] + padding, b[3] + padding), a)
+
+
+def test_packer_fills_and_overflows():
+    packer = MaxRectsPacker(4, 4)
+    placed = [packer.insert(1, 1) for i in range(16)]
+    assert None not in placed
+    assert len(set(placed)) == 16
+    assert packer.insert(1, 1) is None
+
+    packer = MaxRectsPacker(10, 10)
+    assert packer.insert(11, 1) is None
+    assert packer.insert(10, 4) == (0, 0)
+    assert packer.insert(10, 6) == (0, 4)
+    assert packer.insert(1, 1) is None
+
+
+@pytest.mark.parametrize("padding", [0, 2, 5])
+def test_random_rects_dont_overlap(padding):
+    rnd = random.Random(1234 + padding)
+    sizes = [(rnd.randint(1, 90), rnd.randint(1, 90)) for i in range(60)]
+    aw, ah, placed = packAtlas(sizes, 2048, padding)
+    checkPacking(sizes, aw, ah, placed, padding)
+
+
+# Whether sizes pack into one w x h atlas, the way packAtlas tries each size
+def fitsIn(sizes, w, h, padding):
+    packer = MaxRectsPacker(w + padding, h + padding)
+    padded = sorted([(sw + padding, sh + padding) for sw, sh in sizes],
+                    key=lambda wh: (-max(wh), -wh[0] * wh[1]))
+    return all(packer.insert(pw, ph) is not None for pw, ph in padded)
+
+
+def test_smallest_power_of_two():
+    assert packAtlas([(32, 32)] * 4, 2048, 0)[:2] == (64, 64)
+    # with padding two 32s don't fit in 64, so it's all in a row
+    assert packAtlas([(32, 32)] * 4, 2048, 2)[:2] == (256, 32)
+    assert packAtlas([(100, 20)], 2048, 2)[:2] == (128, 32)
+    assert packAtlas([(1, 1)], 2048, 2)[:2] == (1, 1)
+
+    # none of the sizes before it hold them
+    sizes = [(30, 50), (60, 20), (20, 20), (45, 45), (10, 70)]
+    aw, ah, placed = packAtlas(sizes, 2048, 2)
+    checkPacking(sizes, aw, ah, placed, 2)
+    atlasSizes = getAtlasSizes(2048)
+    for w, h in atlasSizes[:atlasSizes.index((aw, ah))]:
+        assert not fitsIn(sizes, w, h, 2)
+
+
+def test_too_big_raises():
+    with pytest.raises(ValueError):
+        packAtlas([(64, 64)] * 5, 128, 0)
+    with pytest.raises(ValueError):
+        packAtlas([(300, 10)], 256, 0)
+    # fits exactly with no padding, not with
+    assert packAtlas([(64, 64)] * 4, 128, 0)[:2] == (128, 128)
+    with pytest.raises(ValueError):
+        packAtlas([(64, 64)] * 4, 128, 2)
+
+
+def makeFrame(fname, size, box, colour):
+    img = Image.new("RGBA", size)
+    img.paste(Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), colour), box[:2])
+    img.save(fname)
+
+
+@pytest.mark.skipif(Image is None, reason="needs Pillow")
+@pytest.mark.parametrize("trim", ATLAS_TRIMS)
+def test_build_atlas_table(tmpdir, trim):
+    src = os.path.join(str(tmpdir), "frame%02d.png")
+    boxes = {1: (4, 4, 20, 12), 2: (8, 2, 24, 30), 3: (0, 0, 1, 1)}
+    for n, box in boxes.items():
+        makeFrame(src % n, (32, 32), box, (255, 0, n * 50, 255))
+    dst = os.path.join(str(tmpdir), "atlas.png")
+    report = buildAtlas(src, dst, 1, 4, trim=trim, workers=1, log=lambda line: None)
+
+    assert report["frames"] == 3
+    assert report["missing"] == [src % 4]
+    table = loadAtlasTable(getAtlasTableFile(dst))
+    assert table["trim"] == trim
+    assert [f["frame"] for f in table["frames"]] == [1, 2, 3]
+    atlas = Image.open(dst)
+    assert atlas.size == (table["width"], table["height"]) == (report["width"], report["height"])
+
+    for f in table["frames"]:
+        x, y, w, h = f["rect"]
+        l, t = f["trim"][:2]
+        if trim == ATLAS_TRIM_NONE:
+            assert (l, t, w, h) == (0, 0, 32, 32)
+        elif trim == ATLAS_TRIM_FRAME:
+            box = boxes[f["frame"]]
+            assert (l, t, w, h) == (box[0], box[1], box[2] - box[0], box[3] - box[1])
+        else:
+            assert (l, t, w, h) == (0, 0, 24, 30)
+        assert f["uv"] == [float(x) / atlas.size[0], float(y) / atlas.size[1],
+                           float(x + w) / atlas.size[0], float(y + h) / atlas.size[1]]
+        # the frame's colour is where the table says
+        box = boxes[f["frame"]]
+        assert atlas.getpixel((x + box[0] - l, y + box[1] - t)) == (255, 0, f["frame"] * 50, 255)
+    assert getAtlasFrameUVs(table) == [tuple(f["uv"]) for f in table["frames"]]
+    checkPacking([tuple(f["rect"][2:]) for f in table["frames"]], atlas.size[0], atlas.size[1],
+                 [tuple(f["rect"][:2]) for f in table["frames"]], ATLAS_PADDING)
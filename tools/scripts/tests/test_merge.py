@@ -0,0 +1,161 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os
+
+from arttool.maskjson import merge_masks, load_mask_json, write_mask_json
+
+
+# ==============================================================================
+# MERGE TESTS
+#
+# Combos made by merge_masks: "<mask>_" names, _2 suffixes where two
+# components clash, references following the renames, lights and the depth
+# head kept as they are, and data resources stored once.
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+MERGE_KVPAIRS = {"name": "combo", "uuid": "1234", "tier": 1, "description": "a combo",
+                 "author": "ann", "tags": "hats", "category": "fun", "modtime": 1500000000}
+
+
+def makeComponent(author="bob", tags="hat", mesh="AAAA"):
+    return {"name": "hat", "author": author, "tags": tags,
+            "resources": {
+                "diffuse": {"type": "image", "data": "iVBORw0KGgo="},
+                "mesh1": {"type": "mesh", "data": mesh},
+                "mat": {"type": "material", "effect": "effectDefault",
+                        "parameters": {"diffuse-0": {"type": "texture", "value": "diffuse"}}},
+                "mdl": {"type": "model", "mesh": "mesh1", "material": "mat"},
+                "seq": {"type": "sequence", "image": "diffuse", "rows": 2, "cols": 2},
+                "sparks": {"type": "emitter", "model": "mdl"},
+                "light1": {"type": "light", "light-type": "directional"},
+                "depth_head_mat": {"type": "material", "effect": "effectDefault",
+                                   "depth-only": True},
+                "depth_head_mdl": {"type": "model", "mesh": "meshHead",
+                                   "material": "depth_head_mat"}},
+            "parts": {
+                "face": {"parent": "root", "resource": "mdl"},
+                "brim": {"parent": "face", "resource": "mdl"},
+                "emitter1": {"parent": "face", "resources": {"0": "sparks", "1": "seq"}},
+                "directionalLight1": {"parent": "root", "resource": "light1"},
+                "depth_head": {"parent": "root", "resource": "depth_head_mdl"}}}
+
+
+# Merges components saved as json files
+# - components is a list of (relative file name, mask json)
+# - returns the combo json
+#
+def mergeFiles(tmpdir, components):
+    files = list()
+    for name, j in components:
+        f = os.path.join(str(tmpdir), name)
+        if not os.path.exists(os.path.dirname(f)):
+            os.makedirs(os.path.dirname(f))
+        write_mask_json(f, j)
+        files.append(f)
+    outfile = os.path.join(str(tmpdir), "combo.json")
+    lines = merge_masks(files, MERGE_KVPAIRS, outfile)
+    assert lines == ["Merged all files into " + outfile]
+    return load_mask_json(outfile)
+
+
+def test_single_component_names_and_references(tmpdir):
+    j = mergeFiles(tmpdir, [("hat.json", makeComponent())])
+    res = j["resources"]
+    assert sorted(res.keys()) == sorted(["hat_diffuse", "hat_mesh1", "hat_mat", "hat_mdl", "hat_seq",
+                                         "hat_sparks", "light1", "depth_head_mat",
+                                         "depth_head_mdl"])
+    assert res["hat_mat"]["parameters"]["diffuse-0"]["value"] == "hat_diffuse"
+    assert res["hat_mat"]["effect"] == "effectDefault"
+    assert res["hat_mdl"] == {"type": "model", "mesh": "hat_mesh1", "material": "hat_mat"}
+    assert res["hat_seq"]["image"] == "hat_diffuse"
+    assert res["hat_sparks"]["model"] == "hat_mdl"
+    assert res["depth_head_mdl"] == {"type": "model", "mesh": "meshHead",
+                                     "material": "depth_head_mat"}
+
+    parts = j["parts"]
+    assert sorted(parts.keys()) == sorted(["hat_face", "hat_brim", "hat_emitter1",
+                                           "directionalLight1", "depth_head"])
+    assert parts["hat_face"] == {"parent": "root", "resource": "hat_mdl"}
+    assert parts["hat_brim"]["parent"] == "hat_face"
+    assert parts["hat_emitter1"]["resources"] == {"0": "hat_sparks", "1": "hat_seq"}
+    assert parts["directionalLight1"]["resource"] == "light1"
+    assert parts["depth_head"]["resource"] == "depth_head_mdl"
+
+
+def test_same_file_name_gets_suffixes_and_shares_data(tmpdir):
+    j = mergeFiles(tmpdir, [(os.path.join("a", "hat.json"), makeComponent()),
+                            (os.path.join("b", "hat.json"), makeComponent())])
+    res = j["resources"]
+
+    # the image and mesh are stored once, under the first copy's names
+    images = [k for k, v in res.items() if v["type"] == "image"]
+    meshes = [k for k, v in res.items() if v["type"] == "mesh"]
+    assert images == ["hat_diffuse"]
+    assert meshes == ["hat_mesh1"]
+
+    # everything else is there twice
+    for k in ["hat_mat", "hat_mdl", "hat_seq", "hat_sparks"]:
+        assert k in res
+        assert k + "_2" in res
+    assert res["hat_seq_2"]["type"] == "sequence"
+    assert res["hat_sparks_2"]["type"] == "emitter"
+    assert res["hat_mdl_2"]["type"] == "model"
+
+    # and every reference points at the first copy of the shared data
+    assert res["hat_mat_2"]["parameters"]["diffuse-0"]["value"] == "hat_diffuse"
+    assert res["hat_mdl_2"] == {"type": "model", "mesh": "hat_mesh1", "material": "hat_mat_2"}
+    assert res["hat_seq_2"]["image"] == "hat_diffuse"
+    assert res["hat_sparks_2"]["model"] == "hat_mdl_2"
+
+    parts = j["parts"]
+    assert parts["hat_face_2"] == {"parent": "root", "resource": "hat_mdl_2"}
+    assert parts["hat_brim_2"]["parent"] == "hat_face_2"
+    assert parts["hat_emitter1_2"]["resources"] == {"0": "hat_sparks_2", "1": "hat_seq_2"}
+
+    # lights and the depth head aren't renamed, the last one in wins
+    assert "light1_2" not in res and "depth_head_mdl_2" not in res
+    assert "directionalLight1_2" not in parts and "depth_head_2" not in parts
+    assert parts["directionalLight1"]["resource"] == "light1"
+
+
+def test_different_data_is_not_shared(tmpdir):
+    j = mergeFiles(tmpdir, [(os.path.join("a", "hat.json"), makeComponent()),
+                            (os.path.join("b", "hat.json"), makeComponent(mesh="BBBB"))])
+    res = j["resources"]
+    assert res["hat_mesh1"]["data"] == "AAAA"
+    assert res["hat_mesh1_2"]["data"] == "BBBB"
+    assert res["hat_mdl_2"]["mesh"] == "hat_mesh1_2"
+    assert res["hat_mdl_2"]["material"] == "hat_mat_2"
+
+
+def test_authors_and_tags(tmpdir):
+    j = mergeFiles(tmpdir, [("hat.json", makeComponent()),
+                            ("cap.json", makeComponent(author="bob,cat", tags="hat,cap"))])
+    assert j["author"] == "ann,bob,cat"
+    assert j["tags"] == "hats,hat,cap"
+    assert j["name"] == "combo"
+    assert "cap_mat" in j["resources"] and "hat_mat" in j["resources"]
+    # the image is the same in both, so cap's material uses hat's
+    assert j["resources"]["cap_mat"]["parameters"]["diffuse-0"]["value"] == "hat_diffuse"
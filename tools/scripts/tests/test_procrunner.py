@@ -0,0 +1,55 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import sys, time
+
+from arttool.procrunner import getProcessRunner, execute, PROC_LINE_LIMIT
+
+
+# ==============================================================================
+# PROCESS RUNNER TESTS
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+def pythonCommand(code):
+    return '"' + sys.executable + '" -c "' + code + '"'
+
+
+def test_lines_come_in_order():
+    result = getProcessRunner().run(pythonCommand("print(1); print(2)"))
+    assert result.stdout == ["1\n", "2\n"]
+    assert not result.failed()
+
+
+def test_too_long_line_kills_the_process():
+    code = "import sys, time; sys.stdout.write('x' * %d); sys.stdout.flush(); time.sleep(60)"
+    start = time.time()
+    result = getProcessRunner().run(pythonCommand(code % (PROC_LINE_LIMIT * 2)), timeout=30)
+    assert time.time() - start < 20
+    assert isinstance(result.error, ValueError)
+    assert not result.timedout
+    assert result.failed()
+    assert result.getErrorLines()[0].startswith("ERROR ")
+
+    lines = list(execute(pythonCommand(code % (PROC_LINE_LIMIT * 2)), timeout=30))
+    assert lines[-1].startswith("ERROR ")
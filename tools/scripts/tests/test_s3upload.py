@@ -0,0 +1,171 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, json, hashlib
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from arttool.s3upload import S3Uploader, getLocalETag, S3_MULTIPART_THRESHOLD, S3_MULTIPART_CHUNKSIZE
+
+
+# ==============================================================================
+# S3 UPLOADER TESTS
+#
+# S3Uploader against moto's S3: files in the manifest with the same ETag are
+# skipped, the local ETag of a multipart upload is worked out the way S3 does
+# it, and an ETag only goes in the manifest once head_object has agreed.
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+S3_TEST_BUCKET = "art-test"
+
+
+# Passes everything on to a client, except head_object, which can be changed
+class HeadClient(object):
+
+    def __init__(self, client, head=None):
+        self.client = client
+        self.head = head
+        self.heads = 0
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def head_object(self, **kwargs):
+        self.heads += 1
+        if self.head is not None:
+            return self.head(**kwargs)
+        return self.client.head_object(**kwargs)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=S3_TEST_BUCKET)
+        yield client
+
+
+def makeFile(tmpdir, name, size):
+    f = os.path.join(str(tmpdir), name)
+    fp = open(f, "wb")
+    # not all the same bytes, so the parts have different md5s
+    block = bytes(range(256)) * 4096
+    while size > 0:
+        fp.write(block[:size])
+        size -= len(block)
+    fp.close()
+    return f
+
+
+def makeUploader(tmpdir, client):
+    return S3Uploader(S3_TEST_BUCKET, workers=2, client=client,
+                      manifestfile=os.path.join(str(tmpdir), "s3manifest.json"))
+
+
+def readManifest(tmpdir):
+    f = open(os.path.join(str(tmpdir), "s3manifest.json"), "r")
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+
+def test_manifest_skips_unchanged_files(tmpdir, s3):
+    a = makeFile(tmpdir, "a.json", 1000)
+    b = makeFile(tmpdir, "b.png", 2000)
+    files = [(a, "a.json"), (b, "b.png"), (os.path.join(str(tmpdir), "c.gif"), "c.gif")]
+
+    client = HeadClient(s3)
+    results = makeUploader(tmpdir, client).upload(files)
+    assert results == {"a.json": "uploaded", "b.png": "uploaded", "c.gif": "missing"}
+    assert client.heads == 2
+    assert readManifest(tmpdir)[S3_TEST_BUCKET] == {"a.json": getLocalETag(a),
+                                                    "b.png": getLocalETag(b)}
+    head = s3.head_object(Bucket=S3_TEST_BUCKET, Key="a.json")
+    assert head["ContentType"] == "application/json"
+
+    # a new uploader reads the manifest, and only sends what changed
+    makeFile(tmpdir, "b.png", 3000)
+    client = HeadClient(s3)
+    results = makeUploader(tmpdir, client).upload(files)
+    assert results == {"a.json": "skipped", "b.png": "uploaded", "c.gif": "missing"}
+    assert client.heads == 1
+    assert readManifest(tmpdir)[S3_TEST_BUCKET]["b.png"] == getLocalETag(b)
+
+
+@pytest.mark.parametrize("size", [S3_MULTIPART_THRESHOLD - 1,
+                                  S3_MULTIPART_THRESHOLD,
+                                  S3_MULTIPART_CHUNKSIZE * 2 + 12345])
+def test_local_etag_matches_s3(tmpdir, s3, size):
+    f = makeFile(tmpdir, "big.mp4", size)
+    fp = open(f, "rb")
+    data = fp.read()
+    fp.close()
+    if size < S3_MULTIPART_THRESHOLD:
+        expected = hashlib.md5(data).hexdigest()
+    else:
+        chunks = [data[i:i + S3_MULTIPART_CHUNKSIZE] for i in range(0, size, S3_MULTIPART_CHUNKSIZE)]
+        expected = hashlib.md5(b"".join([hashlib.md5(c).digest() for c in chunks])).hexdigest()
+        expected += "-" + str(len(chunks))
+    assert getLocalETag(f) == expected
+
+    uploader = makeUploader(tmpdir, s3)
+    assert uploader.uploadFile(f, "big.mp4") == "uploaded"
+    head = s3.head_object(Bucket=S3_TEST_BUCKET, Key="big.mp4")
+    assert head["ETag"].strip('"') == expected
+    assert uploader.manifest["big.mp4"] == expected
+    assert uploader.uploadFile(f, "big.mp4") == "skipped"
+
+
+def test_etag_recorded_only_when_head_agrees(tmpdir, s3):
+    f = makeFile(tmpdir, "a.json", 1000)
+
+    # S3 says something else, so it's uploaded but not remembered
+    client = HeadClient(s3, head=lambda **kwargs: {"ETag": '"0123456789abcdef"'})
+    uploader = makeUploader(tmpdir, client)
+    uploader.manifest["a.json"] = "stale"
+    assert uploader.uploadFile(f, "a.json") == "uploaded"
+    assert client.heads == 1
+    assert "a.json" not in uploader.manifest
+    assert uploader.uploadFile(f, "a.json") == "uploaded"
+
+    # head_object fails, so nothing is remembered either
+    def failed(**kwargs):
+        raise RuntimeError("no head")
+    client = HeadClient(s3, head=failed)
+    uploader = makeUploader(tmpdir, client)
+    assert uploader.uploadFile(f, "a.json") == "failed"
+    assert "a.json" not in uploader.manifest
+
+    # and when it agrees, it is
+    client = HeadClient(s3)
+    uploader = makeUploader(tmpdir, client)
+    assert uploader.uploadFile(f, "a.json") == "uploaded"
+    assert uploader.manifest["a.json"] == getLocalETag(f)
@@ -0,0 +1,94 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import threading
+
+from arttool import searchindex
+from arttool.searchindex import SearchIndex
+
+
+# ==============================================================================
+# SEARCH INDEX TESTS
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+SEARCH_TEST_FILES = {"masks/dragon.fbx": {"name": "Dragon", "tags": "fire", "author": "bob",
+                                          "category": "fantasy"},
+                     "masks/venetian_cat.fbx": {"name": "Venetian Cat", "tags": "carnival",
+                                                "author": "ann", "category": "animals"},
+                     "masks/pumpkin.fbx": {"name": "Pumpkin", "tags": "halloween",
+                                           "author": "bob", "category": "holidays"}}
+
+
+def makeSearchIndex():
+    index = SearchIndex()
+    files = sorted(SEARCH_TEST_FILES.keys())
+    index.setFiles(files)
+    for f in files:
+        index.update(f, SEARCH_TEST_FILES[f])
+    return index, files
+
+
+def searchFiles(text):
+    index, files = makeSearchIndex()
+    return [files[idx] for idx in index.search(text)]
+
+
+def test_plain_word_does_not_match_field_names():
+    assert searchFiles("cat") == ["masks/venetian_cat.fbx"]
+    for field in ["name", "tags", "path", "author", "category"]:
+        assert searchFiles(field) == []
+
+
+def test_field_search():
+    assert searchFiles("cat:fan") == ["masks/dragon.fbx"]
+    assert searchFiles("by:bob") == ["masks/dragon.fbx", "masks/pumpkin.fbx"]
+    assert searchFiles("tag:hallo bob") == ["masks/pumpkin.fbx"]
+
+
+def test_prefix_and_path():
+    assert searchFiles("drag") == ["masks/dragon.fbx"]
+    assert searchFiles("path:pump") == ["masks/pumpkin.fbx"]
+
+
+def test_search_does_not_wait_for_the_index(monkeypatch):
+    release = threading.Event()
+
+    def slowPeek(filename):
+        release.wait(10)
+        return SEARCH_TEST_FILES[filename]
+
+    monkeypatch.setattr(searchindex, "peekMetadataFile", slowPeek)
+    index = SearchIndex()
+    files = sorted(SEARCH_TEST_FILES.keys())
+    index.setFiles(files)
+
+    # only paths match until it's built
+    assert not index.isReady()
+    assert [files[idx] for idx in index.search("DRAG")] == ["masks/dragon.fbx"]
+    assert index.search("bob") == []
+
+    release.set()
+    index.ready.wait(10)
+    assert index.isReady()
+    assert [files[idx] for idx in index.search("bob")] == ["masks/dragon.fbx", "masks/pumpkin.fbx"]
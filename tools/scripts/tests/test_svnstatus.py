@@ -0,0 +1,176 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os, threading
+
+import pytest
+
+from arttool import utils, svnstatus
+from arttool.svnstatus import SvnStatusCache
+
+
+# ==============================================================================
+# SVN BATCH TESTS
+#
+# Builds queue their svn adds, see svnstatus.py. These run a batch against
+# fixtures/svn/fakesvn, set as $ART_SVN, which logs how it was run: a batch
+# should read the status once, and add everything in one "svn add --parents"
+# unless the command line would get too long. Outside a batch, adds run one
+# at a time.
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+FAKE_SVN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "svn", "fakesvn")
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="fakesvn is a shell script")
+
+
+class Output(object):
+
+    def __init__(self):
+        self.lines = list()
+
+    def append(self, line):
+        self.lines.append(line)
+
+
+# A working copy with masks/old.json in svn and ignored/ ignored
+# - returns (working copy, svn log file)
+#
+@pytest.fixture
+def workingCopy(tmpdir, monkeypatch):
+    wc = os.path.join(str(tmpdir), "wc")
+    os.makedirs(os.path.join(wc, "masks"))
+    os.makedirs(os.path.join(wc, "ignored"))
+    open(os.path.join(wc, "masks", "old.json"), "w").close()
+
+    status = os.path.join(str(tmpdir), "status.xml")
+    f = open(status, "w")
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<status>\n<target path="%s">\n' % wc)
+    for path, item in [("", "normal"), ("masks", "normal"), ("masks/old.json", "normal"),
+                       ("ignored", "ignored")]:
+        f.write('<entry path="%s"><wc-status item="%s" props="none"/></entry>\n' %
+                (os.path.join(wc, path) if path else wc, item))
+    f.write('</target>\n</status>\n')
+    f.close()
+
+    log = os.path.join(str(tmpdir), "svn.log")
+    open(log, "w").close()
+    monkeypatch.setenv("FAKE_SVN_LOG", log)
+    monkeypatch.setenv("FAKE_SVN_STATUS", status)
+    monkeypatch.setenv(utils.ART_SVN_ENV, FAKE_SVN)
+
+    # the batch the build uses, on the fake svn
+    cache = SvnStatusCache(utils.shellpath(utils.findSvnPath()), wc)
+    monkeypatch.setattr(utils, "SVN_STATUS", cache)
+    return wc, log
+
+
+def readSvnLog(log):
+    f = open(log, "r")
+    try:
+        return [line.split() for line in f.read().splitlines()]
+    finally:
+        f.close()
+
+
+def newFile(wc, name):
+    f = os.path.join(wc, name)
+    if not os.path.exists(os.path.dirname(f)):
+        os.makedirs(os.path.dirname(f))
+    open(f, "w").close()
+    return f
+
+
+def test_batch_reads_status_once_and_adds_once(workingCopy):
+    wc, log = workingCopy
+    utils.svnBeginBatch()
+    utils.svnAddFile(os.path.join(wc, "masks", "old.json"))
+    # made after the status was read, like a build's jsons
+    new = [newFile(wc, os.path.join("masks", "new%d.json" % i)) for i in range(8)]
+    newmeta = newFile(wc, os.path.join("masks", ".art", "new.meta"))
+    threads = [threading.Thread(target=utils.svnAddFile, args=(f,)) for f in new + [newmeta]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    utils.svnAddFile(newFile(wc, os.path.join("ignored", "junk.json")))
+    utils.svnEndBatch(Output())
+
+    runs = readSvnLog(log)
+    assert [r[0] for r in runs] == ["status", "add"]
+    assert runs[0][:4] == ["status", "-v", "--no-ignore", "--xml"]
+    assert runs[1][:3] == ["add", "--parents", "--force"]
+    added = [a.strip('"') for a in runs[1][3:]]
+    assert sorted(added) == sorted(new + [newmeta])
+    assert utils.SVN_STATUS.refreshes == 1
+    assert utils.SVN_STATUS.addruns == 1
+    assert utils.SVN_STATUS.getStatus(new[0]) == "A"
+
+
+def test_long_adds_are_split(workingCopy, monkeypatch):
+    wc, log = workingCopy
+    monkeypatch.setattr(svnstatus, "SVN_ADD_MAX_CMD", 300)
+    new = [newFile(wc, os.path.join("masks", "a_long_mask_name_%02d.json" % i)) for i in range(20)]
+    utils.svnBeginBatch()
+    for f in new:
+        utils.svnAddFile(f)
+    utils.svnEndBatch(Output())
+
+    runs = readSvnLog(log)
+    adds = [r for r in runs if r[0] == "add"]
+    assert len([r for r in runs if r[0] == "status"]) == 1
+    assert len(adds) > 1
+    added = list()
+    for r in adds:
+        assert r[:3] == ["add", "--parents", "--force"]
+        files = [a.strip('"') for a in r[3:]]
+        cmd = utils.SVN_STATUS.svnbin + " add --parents --force" + "".join(' "' + f + '"' for f in files)
+        assert len(cmd) <= 300
+        added += files
+    assert added == new
+
+
+def test_nothing_to_add(workingCopy):
+    wc, log = workingCopy
+    utils.svnBeginBatch()
+    utils.svnAddFile(os.path.join(wc, "masks", "old.json"))
+    utils.svnEndBatch(Output())
+    assert [r[0] for r in readSvnLog(log)] == ["status"]
+
+
+def test_adds_outside_a_batch_run_one_at_a_time(workingCopy, tmpdir, monkeypatch):
+    wc, log = workingCopy
+    monkeypatch.setenv("FAKE_SVN_LOCK", os.path.join(str(tmpdir), "svnlock"))
+    monkeypatch.setattr(utils, "SVNBIN", utils.SVN_STATUS.svnbin)
+    new = [newFile(wc, os.path.join("masks", "new%d.json" % i)) for i in range(4)]
+    threads = [threading.Thread(target=utils.svnAddFile, args=(f,)) for f in new]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    runs = readSvnLog(log)
+    assert ["locked"] not in runs
+    assert [r[0] for r in runs] == ["status", "add"] * len(new)
+    assert sorted(r[1].strip("'\"") for r in runs if r[0] == "add") == sorted(new)
@@ -0,0 +1,142 @@
+# ==============================================================================
+# Copyright (C) 2017 General Workings Inc
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ==============================================================================
+
+
+# ==============================================================================
+# IMPORTS
+# ==============================================================================
+import os
+
+import pytest
+
+from arttool.atlas import loadAtlasTable
+from arttool.tilesheet import *
+
+
+# ==============================================================================
+# TILE SHEET TESTS
+#
+# dedupTiles, and sheets made by buildTileSheet out of small frames made
+# here: frames in their own cells, or deduped with the uv table saying which
+# cell each frame plays from.
+#
+#   cd tools/scripts && python -m pytest tests
+# ==============================================================================
+
+pytestmark = pytest.mark.skipif(Image is None, reason="needs Pillow")
+
+TILE_SIZE = 8
+
+RED = (255, 0, 0, 255)
+NEARLY_RED = (250, 2, 0, 255)
+BLUE = (0, 0, 255, 255)
+GREEN = (0, 255, 0, 255)
+
+
+def tileBytes(colour):
+    return Image.new("RGBA", (TILE_SIZE, TILE_SIZE), colour).tobytes()
+
+
+# Saves frames src % n, one colour each, None for a missing frame
+def makeFrames(tmpdir, colours, start=1):
+    src = os.path.join(str(tmpdir), "frame%02d.png")
+    for n, colour in enumerate(colours, start):
+        if colour is not None:
+            Image.new("RGBA", (TILE_SIZE, TILE_SIZE), colour).save(src % n)
+    return src
+
+
+def makeSheet(tmpdir, colours, **kwargs):
+    src = makeFrames(tmpdir, colours)
+    dst = os.path.join(str(tmpdir), "sheet.png")
+    args = {"startFrame": 1, "endFrame": len(colours), "width": TILE_SIZE, "height": TILE_SIZE,
+            "rows": 4, "cols": 2, "workers": 1, "log": lambda line: None}
+    args.update(kwargs)
+    report = buildTileSheet(src, dst, **args)
+    return report, Image.open(dst).convert("RGBA")
+
+
+def cellColour(sheet, cell, cols=2):
+    return sheet.getpixel((TILE_SIZE * (cell % cols) + TILE_SIZE // 2,
+                           TILE_SIZE * (cell // cols) + TILE_SIZE // 2))
+
+
+def test_dedup_identical_frames():
+    red, blue = tileBytes(RED), tileBytes(BLUE)
+    assert dedupTiles([red, red, blue, red, blue], TILE_SIZE, TILE_SIZE) == [0, 0, 2, 0, 2]
+    # missing frames share one cell
+    assert dedupTiles([None, red, None], TILE_SIZE, TILE_SIZE) == [0, 1, 0]
+    assert dedupTiles([red, tileBytes(NEARLY_RED)], TILE_SIZE, TILE_SIZE) == [0, 1]
+
+
+def test_dedup_threshold_merges_near_frames():
+    tiles = [tileBytes(RED), tileBytes(NEARLY_RED), tileBytes(BLUE), tileBytes(NEARLY_RED)]
+    # red and nearly red are 7/4 apart per channel on average
+    assert dedupTiles(tiles, TILE_SIZE, TILE_SIZE, 1.0) == [0, 1, 2, 1]
+    assert dedupTiles(tiles, TILE_SIZE, TILE_SIZE, 2.0) == [0, 0, 2, 0]
+    assert dedupTiles(tiles, TILE_SIZE, TILE_SIZE, 255.0) == [0, 0, 0, 0]
+
+
+def test_sheet_without_dedup(tmpdir):
+    report, sheet = makeSheet(tmpdir, [RED, BLUE, None, RED, GREEN])
+    assert sheet.size == (TILE_SIZE * 2, TILE_SIZE * 4)
+    assert report["table"] is None
+    assert report["frames"] == 4
+    assert len(report["missing"]) == 1
+    # a frame's cell is its number, a missing one leaves a gap
+    assert [cellColour(sheet, c) for c in range(6)] == [RED, BLUE, (0, 0, 0, 0), RED, GREEN,
+                                                        (0, 0, 0, 0)]
+
+
+def test_dedup_sheet_table(tmpdir):
+    colours = [RED, RED, BLUE, RED, NEARLY_RED, GREEN, BLUE]
+    report, sheet = makeSheet(tmpdir, colours, dedup=True)
+    table = loadAtlasTable(report["table"])
+    cells = [f["cell"] for f in table["frames"]]
+    assert [f["frame"] for f in table["frames"]] == list(range(1, 8))
+    assert cells == [0, 0, 1, 0, 2, 3, 1]
+    assert report["cells"] == 4
+    # only the rows it needs
+    assert sheet.size == (TILE_SIZE * 2, TILE_SIZE * 2)
+    assert (table["width"], table["height"]) == sheet.size
+    for f, colour in zip(table["frames"], colours):
+        x, y, w, h = f["rect"]
+        assert (w, h) == (TILE_SIZE, TILE_SIZE)
+        assert (x, y) == (TILE_SIZE * (f["cell"] % 2), TILE_SIZE * (f["cell"] // 2))
+        assert f["uv"] == [float(x) / sheet.size[0], float(y) / sheet.size[1],
+                           float(x + w) / sheet.size[0], float(y + h) / sheet.size[1]]
+        assert sheet.getpixel((x, y)) == colour
+
+    # with a threshold, nearly red plays from red's cell
+    report, sheet = makeSheet(tmpdir, colours, dedup=True, threshold=2.0)
+    table = loadAtlasTable(report["table"])
+    assert [f["cell"] for f in table["frames"]] == [0, 0, 1, 0, 0, 2, 1]
+    assert report["cells"] == 3
+    assert cellColour(sheet, 0) == RED
+
+
+def test_dedup_sheet_full(tmpdir):
+    colours = [RED, BLUE, GREEN, RED, NEARLY_RED, (0, 0, 0, 255)]
+    lines = list()
+    report, sheet = makeSheet(tmpdir, colours, rows=2, cols=2, dedup=True, log=lines.append)
+    table = loadAtlasTable(report["table"])
+    # the 5th different frame has no cell, it and everything after are left out
+    assert [f["cell"] for f in table["frames"]] == [0, 1, 2, 0, 3]
+    assert report["frames"] == 5
+    assert any("sheet is full" in line for line in lines)
+    assert sheet.size == (TILE_SIZE * 2, TILE_SIZE * 2)
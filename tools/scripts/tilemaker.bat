@@ -70,12 +70,16 @@ except:
 	
 	
 from arttool import tilemaker
+from arttool.utils import setArtFolder
 
 # ==============================================================================
 # MAIN ENTRY POINT
 # ==============================================================================
 if __name__ == '__main__':
 	
+	# Work in the art folder
+	setArtFolder()
+	
 	# We're a Qt App
 	app = QApplication(sys.argv)
 		